@@ -4,7 +4,11 @@ Script to add cluster attributes to blueprint elements.
 Modifies the Henrike blueprint to mark elements as part of the "Mensch" cluster.
 """
 
-import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from blueprint_writer import BlueprintDocument
 
 # List of element IDs to add to "Mensch" cluster
 MENSCH_CLUSTER_ELEMENTS = [
@@ -35,37 +39,36 @@ MENSCH_CLUSTER_ELEMENTS = [
 BLUEPRINT_FILE = "models/main_model/wirkmechanismen-main-model-blueprint-Henrike.json"
 
 
-def add_cluster_attributes():
-    """Load blueprint, add cluster attributes to specified elements, and save."""
-    
-    # Load the blueprint
-    with open(BLUEPRINT_FILE, 'r', encoding='utf-8') as f:
-        blueprint = json.load(f)
+def assign_cluster(graph, element_ids=MENSCH_CLUSTER_ELEMENTS, cluster="Mensch"):
+    """Set the ``cluster`` attribute of ``element_ids``; return (modified count, ids not found)."""
     
     # Counter for tracking changes
     modified_count = 0
     not_found = []
     
-    # Iterate through elements and add cluster attribute
-    for element in blueprint.get('elements', []):
-        elem_id = element.get('_id')
-        
-        if elem_id in MENSCH_CLUSTER_ELEMENTS:
-            # Add cluster attribute
-            element['attributes']['cluster'] = "Mensch"
-            modified_count += 1
-        
-        # Track elements not found
-        if elem_id in MENSCH_CLUSTER_ELEMENTS:
-            MENSCH_CLUSTER_ELEMENTS.remove(elem_id)
+    # Look up each cluster element by id instead of scanning all elements
+    for elem_id in element_ids:
+        element = graph.element(elem_id)
+        if element is None:
+            # Track elements not found
+            not_found.append(elem_id)
+            continue
+        # Add cluster attribute
+        element.setdefault('attributes', {})['cluster'] = cluster
+        modified_count += 1
     
-    # Check for elements that weren't found
-    if MENSCH_CLUSTER_ELEMENTS:
-        not_found = MENSCH_CLUSTER_ELEMENTS
+    return modified_count, not_found
+
+
+def add_cluster_attributes():
+    """Load blueprint, add cluster attributes to specified elements, and save."""
+    
+    # Load the blueprint
+    document = BlueprintDocument.open(BLUEPRINT_FILE)
+    modified_count, not_found = assign_cluster(document.graph)
     
-    # Save the modified blueprint
-    with open(BLUEPRINT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(blueprint, f, indent=2, ensure_ascii=False)
+    # Save the modified blueprint (only the changed elements are rewritten)
+    document.save()
     
     # Print results
     print(f"✅ Modified {modified_count} elements")
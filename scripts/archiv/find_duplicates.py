@@ -1,47 +1,30 @@
-import json
+import sys
+from pathlib import Path
 
-with open('models/main_model/wirkmechanismen-main-model-blueprint.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from blueprint_graph import read_blueprint_data
+from blueprint_validation import validate_blueprint_data
+
+data = read_blueprint_data(Path('models/main_model/wirkmechanismen-main-model-blueprint.json'))
 
 connections = data.get("connections", [])
 
-# Finde Duplikate
-connection_ids = {}
-duplicates = {}
+# Finde Duplikate (ein Durchlauf über die Validierungs-Engine)
+duplicate_ids = validate_blueprint_data(data).duplicate_connection_ids
 
+# Instanzen der Duplikate in einem zweiten Durchlauf sammeln
+dup_info = {conn_id: {"count": count, "instances": []} for conn_id, count in duplicate_ids.items()}
 for conn in connections:
-    conn_id = conn.get("_id")
-    if conn_id in connection_ids:
-        if conn_id not in duplicates:
-            duplicates[conn_id] = []
-        duplicates[conn_id].append({
-            "index": len(connection_ids[conn_id]),
+    if not isinstance(conn, dict):
+        continue
+    info = dup_info.get(conn.get("_id"))
+    if info is not None:
+        info["instances"].append({
             "from": conn.get("from"),
             "to": conn.get("to")
         })
-    else:
-        connection_ids[conn_id] = [conn]
-        
-    if conn_id in connection_ids and len(connection_ids[conn_id]) < len([c for c in connections if c.get("_id") == conn_id]):
-        pass
-    else:
-        if conn_id not in connection_ids:
-            connection_ids[conn_id] = []
-        connection_ids[conn_id].append(conn)
-
-# Neu zählen
-dup_info = {}
-for conn in connections:
-    conn_id = conn.get("_id")
-    if conn_id not in dup_info:
-        dup_info[conn_id] = {"count": 0, "instances": []}
-    dup_info[conn_id]["count"] += 1
-    dup_info[conn_id]["instances"].append({
-        "from": conn.get("from"),
-        "to": conn.get("to")
-    })
 
-duplicates = {k: v for k, v in dup_info.items() if v["count"] > 1}
+duplicates = dup_info
 
 print("Duplikat-Verbindungen:")
 for dup_id, info in duplicates.items():
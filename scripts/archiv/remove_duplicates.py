@@ -1,8 +1,12 @@
-import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from blueprint_writer import BlueprintDocument
 
 # Load blueprint
-with open('models/main_model/wirkmechanismen-main-model-blueprint.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+document = BlueprintDocument.open('models/main_model/wirkmechanismen-main-model-blueprint.json')
+data = document.data
 
 connections = data.get("connections", [])
 
@@ -25,8 +29,7 @@ data["connections"] = unique_connections
 print(f"Nach Bereinigung: {len(unique_connections)} Verbindungen")
 print(f"Removed: {len(connections) - len(unique_connections)} Duplikate")
 
-# Save
-with open('models/main_model/wirkmechanismen-main-model-blueprint.json', 'w', encoding='utf-8') as f:
-    json.dump(data, f, indent=2, ensure_ascii=False)
+# Save (only the removed connections disappear from the file)
+document.save()
 
 print("\nDatei aktualisiert!")
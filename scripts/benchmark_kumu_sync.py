@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Benchmark the KUMU sync against the local stand-in server (kumu_standin.py).
+
+For generated blueprints of increasing size it measures these scenarios:
+
+* ``full``         - the single-POST upload of sync_to_kumu(),
+* ``stream``       - the same upload streamed from disk (stream_to_kumu()),
+* ``stream-gzip``  - the streamed upload with gzip content-encoding,
+* ``delta-init``   - a delta sync without previous state (everything is new),
+* ``delta-edit``   - a delta sync after editing ~1% of the elements.
+
+The delta scenarios use the stand-in's own ``elements/upsert`` and
+``elements/delete`` routes (KUMU documents no such endpoints); they show what
+a delta API would save, not a mode the sync command offers. Every scenario
+sends through the same pooled, retrying session as the sync.
+
+Per scenario the wall time, the number of HTTP requests the server saw
+(retries included), the bytes on the wire (request + response bodies) and
+whether the sync succeeded are reported. Fault injection options are passed
+to the stand-in, so batching and retry settings can be compared under
+latency, rate limits and 5xx errors.
+
+Example::
+
+    python scripts/benchmark_kumu_sync.py --sizes 200 2000 20000 --latency-ms 20 --error-rate 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from kumu_standin import Faults, start_server
+from kumu_upload import DEFAULT_BACKOFF, DEFAULT_RETRIES, make_session, post_with_retry
+from sync_blueprint_to_kumu import stream_to_kumu, sync_to_kumu
+
+ACCOUNT = "bench"
+PROJECT = "sync"
+API_KEY = "benchmark"
+DEFAULT_SIZES = (200, 1000, 5000)
+CONNECTIONS_PER_ELEMENT = 3
+EDIT_SHARE = 0.01
+DEFAULT_MAX_BATCH_ITEMS = 500
+KINDS = ("elements", "connections")
+
+_WORDS = (
+    "Koordination Abstimmung Team Wissen Transparenz Feedback Planung Qualität "
+    "Kommunikation Abhängigkeit Risiko Entscheidung Prozess Verantwortung Lernen"
+).split()
+
+
+@dataclass
+class BenchmarkRow:
+    elements: int
+    connections: int
+    scenario: str
+    seconds: float
+    requests: int
+    bytes_on_wire: int
+    ok: bool
+
+
+def generate_blueprint(elements: int, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+
+    def text(words: int) -> str:
+        return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+    element_ids = [f"elem-bench{i:06d}" for i in range(elements)]
+    blueprint: Dict[str, Any] = {
+        "elements": [
+            {
+                "_id": elem_id,
+                "attributes": {
+                    "label": text(4),
+                    "element type": "Einflussfaktoren",
+                    "description": text(30),
+                    "tags": [rng.choice(_WORDS)],
+                },
+            }
+            for elem_id in element_ids
+        ],
+        "connections": [],
+    }
+    for index in range(elements * CONNECTIONS_PER_ELEMENT):
+        blueprint["connections"].append({
+            "_id": f"conn-bench{index:07d}",
+            "from": rng.choice(element_ids),
+            "to": rng.choice(element_ids),
+            "direction": "directed",
+            "attributes": {"label": "[X]", "connection type": rng.choice(("++", "+-", "--", "-+"))},
+        })
+    return blueprint
+
+
+def edit_blueprint(blueprint: Dict[str, Any], share: float = EDIT_SHARE, seed: int = 1) -> None:
+    rng = random.Random(seed)
+    elements = blueprint["elements"]
+    for elem in rng.sample(elements, max(1, int(len(elements) * share))):
+        elem["attributes"]["description"] += " (überarbeitet)"
+
+
+class DeltaClient:
+    """Minimal delta sync against the stand-in's per-item routes.
+
+    Remembers a content hash per ``_id`` of the last acknowledged state and
+    sends added/changed items to ``elements/upsert`` and removed ids to
+    ``elements/delete`` in batches of ``max_items``.
+    """
+
+    def __init__(self, session: Any, base_url: str, max_items: int = DEFAULT_MAX_BATCH_ITEMS,
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF) -> None:
+        self.session = session
+        self.base_url = base_url
+        self.max_items = max_items
+        self.retries = retries
+        self.backoff = backoff
+        self.hashes: Dict[str, Dict[str, str]] = {kind: {} for kind in KINDS}
+
+    def _post(self, route: str, kind: str, items: List[Any]) -> bool:
+        for start in range(0, len(items), self.max_items):
+            payload = json.dumps({kind: items[start:start + self.max_items]}, ensure_ascii=False).encode("utf-8")
+            response = post_with_retry(self.session, f"{self.base_url}/{route}", lambda: (payload, {}),
+                                       self.retries, self.backoff)
+            if response.status_code != 200:
+                return False
+        return True
+
+    def run(self, blueprint: Dict[str, Any]) -> bool:
+        current: Dict[str, Dict[str, str]] = {}
+        for kind in KINDS:
+            hashes = current[kind] = {}
+            changed = []
+            for item in blueprint.get(kind) or []:
+                digest = hashlib.sha256(json.dumps(item, sort_keys=True).encode("utf-8")).hexdigest()
+                hashes[item["_id"]] = digest
+                if self.hashes[kind].get(item["_id"]) != digest:
+                    changed.append(item)
+            if not self._post("elements/upsert", kind, changed):
+                return False
+        for kind in reversed(KINDS):
+            removed = [item_id for item_id in self.hashes[kind] if item_id not in current[kind]]
+            if not self._post("elements/delete", kind, removed):
+                return False
+        self.hashes = current
+        return True
+
+
+def _measure(server: Any, action: Callable[[], bool]) -> tuple:
+    before = server.stats.to_dict()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok = action()
+    seconds = time.perf_counter() - start
+    after = server.stats.to_dict()
+    requests = after["requests"] - before["requests"]
+    wire = (after["bytes_in"] + after["bytes_out"]) - (before["bytes_in"] + before["bytes_out"])
+    return seconds, requests, wire, ok
+
+
+def run_benchmark(
+    sizes: List[int],
+    faults: Faults,
+    max_batch_items: int = DEFAULT_MAX_BATCH_ITEMS,
+    retries: int = DEFAULT_RETRIES,
+) -> List[BenchmarkRow]:
+    server = start_server(faults=faults)
+    os.environ["KUMU_API_URL"] = server.url
+    base_url = f"{server.url}/projects/{ACCOUNT}/{PROJECT}"
+    rows: List[BenchmarkRow] = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp, make_session(API_KEY) as session:
+            for size in sizes:
+                blueprint = generate_blueprint(size, seed=size)
+                connections = len(blueprint["connections"])
+                blueprint_path = Path(tmp) / f"blueprint-{size}.json"
+                blueprint_path.write_text(json.dumps(blueprint, ensure_ascii=False, indent=2), encoding="utf-8")
+                delta = DeltaClient(session, base_url, max_batch_items, retries)
+
+                server.reset()
+                scenarios = [
+                    ("full", lambda: sync_to_kumu(API_KEY, ACCOUNT, PROJECT, blueprint, session, retries)),
+                    ("stream", lambda: stream_to_kumu(API_KEY, ACCOUNT, PROJECT, blueprint_path,
+                                                      session=session, retries=retries)),
+                    ("stream-gzip", lambda: stream_to_kumu(API_KEY, ACCOUNT, PROJECT, blueprint_path, gzip=True,
+                                                           session=session, retries=retries)),
+                    ("delta-init", lambda: delta.run(blueprint)),
+                    ("delta-edit", lambda: delta.run(blueprint)),
+                ]
+                for name, action in scenarios:
+                    if name == "delta-edit":
+                        edit_blueprint(blueprint)
+                    seconds, requests, wire, ok = _measure(server, action)
+                    rows.append(BenchmarkRow(size, connections, name, seconds, requests, wire, ok))
+    finally:
+        server.shutdown()
+        server.server_close()
+    return rows
+
+
+def print_table(rows: List[BenchmarkRow]) -> None:
+    print(f"{'elements':>9} {'connections':>11} {'scenario':<11} {'seconds':>8} {'requests':>8} {'wire KB':>9}  ok")
+    for row in rows:
+        print(
+            f"{row.elements:>9} {row.connections:>11} {row.scenario:<11} {row.seconds:>8.3f} "
+            f"{row.requests:>8} {row.bytes_on_wire / 1024:>9.1f}  {'yes' if row.ok else 'NO'}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark KUMU sync throughput against a local stand-in.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Element counts to generate")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-batch-items", type=int, default=DEFAULT_MAX_BATCH_ITEMS,
+                        help="Items per request of the delta scenarios")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries on 429/5xx and timeouts")
+    parser.add_argument("--json", type=Path, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    faults = Faults(args.latency_ms / 1000.0, args.rate_limit, args.error_rate, API_KEY, args.seed)
+    rows = run_benchmark(args.sizes, faults, args.max_batch_items, args.retries)
+    print_table(rows)
+    if args.json:
+        args.json.write_text(json.dumps([asdict(row) for row in rows], indent=2), encoding="utf-8")
+    return 0 if all(row.ok for row in rows) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
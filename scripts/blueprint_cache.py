@@ -0,0 +1,62 @@
+"""
+On-disk cache helpers shared by the blueprint tooling.
+
+Everything lives below ``.blueprint_cache/`` in the repository root (ignored
+by git); set ``BLUEPRINT_CACHE_DIR`` to use another location. Entries are
+small JSON files written atomically, so concurrent runs never see partial
+files. Unreadable entries are treated as cache misses.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def cache_dir(namespace: str) -> Path:
+    root = os.environ.get("BLUEPRINT_CACHE_DIR")
+    base = Path(root) if root else REPO_ROOT / ".blueprint_cache"
+    return base / namespace
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of the file contents, the key of content-addressed entries."""
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_json_cache(path: Path) -> Optional[Any]:
+    try:
+        with path.open("r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def store_json_cache(path: Path, value: Any) -> None:
+    """Atomically write ``value`` to ``path``; failures are silently ignored."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=".tmp-", suffix=path.suffix)
+        try:
+            # json.dumps uses the C encoder; json.dump to a file does not.
+            text = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(text)
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+    except OSError:
+        pass
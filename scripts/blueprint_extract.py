@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Extract reference models from the main model by k-hop neighbourhood.
+
+Starting from seed elements (ids or labels, or every element of a type such
+as ``Problem`` or ``Schlüsselfaktor``), a breadth-first search follows
+connections up to ``--depth`` hops (``--direction`` out, in or both; mutual
+and undirected connections are followed both ways, ``reversed`` ones against
+their arrow). Elements not matching the ``--type``/``--tag`` filters are
+neither included nor traversed; seeds are always kept. The result is the
+induced subgraph: the selected elements and every connection between them.
+
+The search runs on an :class:`ExtractionIndex`: element ids, labels, types,
+tags, connection endpoints and the byte span of every item in the file. It
+is built once per blueprint version (one :class:`blueprint_spans.BlueprintSpanIndex`
+pass) and cached in ``.blueprint_cache/extract/``, keyed by path, size and
+mtime. An extraction then reads only the cache and the bytes of the selected
+items, without parsing the main model. Items are copied as they are, except
+for derived metrics, which describe the main model rather than the extract:
+degree counts are recomputed for the extract (so it passes validation) and
+centrality and MICMAC values are dropped unless ``--keep-metrics``.
+
+Example::
+
+    python scripts/blueprint_extract.py "Begrenzungsgrad von Work in Progress" \\
+        --depth 2 --direction out --type Schlüsselfaktor --type Problem \\
+        --name "Work in Progress Focus Model" -o models/reference_models/wip.json
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import mmap
+import sys
+from array import array
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterable, List, Optional, Sequence, Set, Union
+
+from blueprint_cache import REPO_ROOT, cache_dir, load_json_cache, store_json_cache
+from blueprint_graph import MISSING, build_csr
+from blueprint_merge import DERIVED_ATTRIBUTES
+from blueprint_spans import BlueprintSpanIndex
+
+DEFAULT_BLUEPRINT = REPO_ROOT / "models" / "main_model" / "wirkmechanismen-main-model-blueprint.json"
+# Bump when the cached index layout changes.
+INDEX_VERSION = 1
+# Integer columns are cached as base64 of packed int64 arrays: decoding a list
+# of 10^6 JSON numbers takes longer than the whole extraction should.
+PACKED_COLUMNS = (
+    "element_spans", "connection_spans", "conn_source", "conn_target", "bidirectional",
+    "out_offsets", "out_targets", "out_edges", "in_offsets", "in_sources", "in_edges",
+)
+DIRECTIONS = ("out", "in", "both")
+DEGREE_ATTRIBUTES = ("degree", "indegree", "outdegree", "size")
+BIDIRECTIONAL = frozenset(("mutual", "undirected"))
+
+
+def _pack(values: Iterable[int]) -> str:
+    return base64.b64encode(array("q", values).tobytes()).decode("ascii")
+
+
+def _unpack(text: str) -> array:
+    values = array("q")
+    values.frombytes(base64.b64decode(text))
+    return values
+
+
+def _attributes(item: Any) -> Dict[str, Any]:
+    attrs = item.get("attributes") if isinstance(item, dict) else None
+    return attrs if isinstance(attrs, dict) else {}
+
+
+class ExtractionIndex:
+    """Adjacency and item byte spans of one blueprint file."""
+
+    def __init__(self, path: Path, entry: Dict[str, Any]) -> None:
+        self.path = path
+        self.size: int = entry["size"]
+        self.mtime_ns: int = entry["mtime_ns"]
+        self.element_ids: List[str] = entry["element_ids"]
+        self.labels: List[str] = entry["labels"]
+        self.types: List[Optional[str]] = entry["types"]
+        self.tags: List[List[str]] = entry["tags"]
+        columns = {name: _unpack(entry[name]) for name in PACKED_COLUMNS}
+        self.element_spans = columns["element_spans"]
+        self.connection_spans = columns["connection_spans"]
+        self.conn_source = columns["conn_source"]
+        self.conn_target = columns["conn_target"]
+        self.bidirectional: Set[int] = set(columns["bidirectional"])
+        # CSR adjacency over the connections whose endpoints both resolve.
+        self.out_offsets, self.out_targets, self.out_edges = columns["out_offsets"], columns["out_targets"], columns["out_edges"]
+        self.in_offsets, self.in_sources, self.in_edges = columns["in_offsets"], columns["in_sources"], columns["in_edges"]
+        self.element_index = {elem_id: i for i, elem_id in enumerate(self.element_ids)}
+        self._by_label: Optional[Dict[str, List[int]]] = None
+
+    # ------------------------------------------------------------ building
+    @staticmethod
+    def build_entry(raw: bytes) -> Dict[str, Any]:
+        """Cache entry for the blueprint bytes ``raw`` (without size and mtime)."""
+        index = BlueprintSpanIndex(raw, keep_values=True)
+        values = index.values or {}
+        element_ids: List[str] = []
+        labels: List[str] = []
+        types: List[Optional[str]] = []
+        tags: List[List[str]] = []
+        element_spans: List[int] = []
+        position: Dict[str, int] = {}
+        for span in index.items["elements"]:
+            # First occurrence wins for duplicated ids, as in BlueprintGraph.
+            if span.id is None or span.id in position:
+                continue
+            attrs = _attributes(values["elements"][span.index])
+            position[span.id] = len(element_ids)
+            element_ids.append(span.id)
+            label = attrs.get("label")
+            labels.append(label if isinstance(label, str) else "")
+            element_type = attrs.get("element type")
+            types.append(element_type if isinstance(element_type, str) else None)
+            item_tags = attrs.get("tags")
+            tags.append([tag for tag in item_tags if isinstance(tag, str)] if isinstance(item_tags, list) else [])
+            element_spans += (span.start, span.end)
+
+        connection_spans: List[int] = []
+        conn_source: List[int] = []
+        conn_target: List[int] = []
+        bidirectional: List[int] = []
+        for span in index.items["connections"]:
+            conn = values["connections"][span.index]
+            source, target = conn.get("from"), conn.get("to")
+            if conn.get("reversed") is True:
+                source, target = target, source
+            if conn.get("direction") in BIDIRECTIONAL:
+                bidirectional.append(len(conn_source))
+            conn_source.append(position.get(source, MISSING) if isinstance(source, str) else MISSING)
+            conn_target.append(position.get(target, MISSING) if isinstance(target, str) else MISSING)
+            connection_spans += (span.start, span.end)
+
+        src, dst, edges = array("l"), array("l"), array("l")
+        for edge, (s, t) in enumerate(zip(conn_source, conn_target)):
+            if s != MISSING and t != MISSING:
+                src.append(s)
+                dst.append(t)
+                edges.append(edge)
+        n = len(element_ids)
+        columns = {
+            "element_spans": element_spans, "connection_spans": connection_spans,
+            "conn_source": conn_source, "conn_target": conn_target, "bidirectional": bidirectional,
+        }
+        columns.update(zip(("out_offsets", "out_targets", "out_edges"), build_csr(n, src, dst, edges)))
+        columns.update(zip(("in_offsets", "in_sources", "in_edges"), build_csr(n, dst, src, edges)))
+        entry: Dict[str, Any] = {"version": INDEX_VERSION, "element_ids": element_ids, "labels": labels,
+                                 "types": types, "tags": tags}
+        entry.update((name, _pack(columns[name])) for name in PACKED_COLUMNS)
+        return entry
+
+    @classmethod
+    def load(cls, path: Union[str, Path], use_cache: bool = True) -> "ExtractionIndex":
+        """Index of ``path``, from the cache while size and mtime are unchanged."""
+        path = Path(path).resolve()
+        stat = path.stat()
+        cache_file = cache_dir("extract") / (hashlib.blake2b(str(path).encode("utf-8"), digest_size=16).hexdigest() + ".json")
+        if use_cache:
+            entry = load_json_cache(cache_file)
+            if (
+                isinstance(entry, dict)
+                and entry.get("version") == INDEX_VERSION
+                and entry.get("size") == stat.st_size
+                and entry.get("mtime_ns") == stat.st_mtime_ns
+            ):
+                return cls(path, entry)
+        entry = cls.build_entry(path.read_bytes())
+        entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        if use_cache:
+            store_json_cache(cache_file, entry)
+        return cls(path, entry)
+
+    # ------------------------------------------------------------ selection
+    def resolve_seeds(self, seeds: Iterable[str], seed_types: Iterable[str] = ()) -> List[int]:
+        """Element positions for ids, exact labels (case-insensitive) and element types."""
+        found: Dict[int, None] = {}
+        for seed in seeds:
+            if seed in self.element_index:
+                found[self.element_index[seed]] = None
+                continue
+            if self._by_label is None:
+                self._by_label = {}
+                for i, label in enumerate(self.labels):
+                    self._by_label.setdefault(label.casefold(), []).append(i)
+            matches = self._by_label.get(seed.casefold())
+            if not matches:
+                raise KeyError(f"No element with id or label {seed!r}")
+            found.update(dict.fromkeys(matches))
+        for element_type in seed_types:
+            matches = [i for i, value in enumerate(self.types) if value == element_type]
+            if not matches:
+                raise KeyError(f"No element of type {element_type!r}")
+            found.update(dict.fromkeys(matches))
+        return list(found)
+
+    def _neighbors(self, node: int, direction: str) -> Iterable[int]:
+        if direction in ("out", "both"):
+            yield from self.out_targets[self.out_offsets[node]:self.out_offsets[node + 1]]
+        if direction in ("in", "both"):
+            yield from self.in_sources[self.in_offsets[node]:self.in_offsets[node + 1]]
+        if direction != "both" and self.bidirectional:
+            # Mutual/undirected connections are followed against their arrow as well.
+            if direction == "out":
+                offsets, edges, others = self.in_offsets, self.in_edges, self.in_sources
+            else:
+                offsets, edges, others = self.out_offsets, self.out_edges, self.out_targets
+            for k in range(offsets[node], offsets[node + 1]):
+                if edges[k] in self.bidirectional:
+                    yield others[k]
+
+    def select(
+        self,
+        seeds: Sequence[int],
+        depth: int = 1,
+        direction: str = "both",
+        types: Collection[str] = (),
+        tags: Collection[str] = (),
+    ) -> List[int]:
+        """Element positions within ``depth`` hops of ``seeds`` (in file order)."""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {', '.join(DIRECTIONS)}")
+        type_filter, tag_filter = set(types), set(tags)
+
+        def allowed(node: int) -> bool:
+            if type_filter and self.types[node] not in type_filter:
+                return False
+            return not tag_filter or not tag_filter.isdisjoint(self.tags[node])
+
+        distance = {node: 0 for node in seeds}
+        queue = deque(seeds)
+        while queue:
+            node = queue.popleft()
+            if distance[node] >= depth:
+                continue
+            for neighbor in self._neighbors(node, direction):
+                if neighbor not in distance and allowed(neighbor):
+                    distance[neighbor] = distance[node] + 1
+                    queue.append(neighbor)
+        return sorted(distance)
+
+    def induced_connections(self, selected: Collection[int]) -> List[int]:
+        """Connections (file order) whose endpoints are both selected."""
+        members = set(selected)
+        found = [
+            self.out_edges[k]
+            for node in members
+            for k in range(self.out_offsets[node], self.out_offsets[node + 1])
+            if self.out_targets[k] in members
+        ]
+        return sorted(found)
+
+    # ------------------------------------------------------------ output
+    def extract(
+        self,
+        selected: Sequence[int],
+        name: Optional[str] = None,
+        keep_metrics: bool = False,
+    ) -> Dict[str, Any]:
+        """Reference-model blueprint with the ``selected`` elements and the connections between them."""
+        connections = self.induced_connections(selected)
+        with self.path.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if len(data) != self.size:
+                raise RuntimeError(f"{self.path} changed since it was indexed; run the extraction again")
+
+            def decode(spans: array, position: int) -> Dict[str, Any]:
+                return json.loads(data[spans[2 * position]:spans[2 * position + 1]].decode("utf-8"))
+
+            elements = [decode(self.element_spans, i) for i in selected]
+            items = [decode(self.connection_spans, i) for i in connections]
+
+        # Same definition as recompute_metrics.py: stored from/to, ``reversed`` ignored.
+        indegree = Counter(conn.get("to") for conn in items)
+        outdegree = Counter(conn.get("from") for conn in items)
+        for element in elements:
+            attrs = element.setdefault("attributes", {})
+            if not keep_metrics:
+                for attr in DERIVED_ATTRIBUTES.difference(DEGREE_ATTRIBUTES).intersection(attrs):
+                    del attrs[attr]
+            elem_id = element["_id"]
+            attrs["indegree"] = indegree[elem_id]
+            attrs["outdegree"] = outdegree[elem_id]
+            attrs["degree"] = indegree[elem_id] + outdegree[elem_id]
+            attrs["size"] = attrs["degree"] + 1
+        blueprint: Dict[str, Any] = {}
+        if name:
+            blueprint["name"] = name
+        blueprint["source"] = f"Subset derived from {self.path.name}"
+        blueprint["elements"] = elements
+        blueprint["connections"] = items
+        return blueprint
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract a k-hop reference model from the main model.")
+    parser.add_argument("seeds", nargs="*", help="Seed element ids or labels")
+    parser.add_argument("--seed-type", action="append", default=[], metavar="TYPE",
+                        help="Use every element of this element type as seed (repeatable)")
+    parser.add_argument("--depth", type=int, default=1, help="Maximum number of hops (default: 1)")
+    parser.add_argument("--direction", choices=DIRECTIONS, default="both",
+                        help="Follow outgoing, incoming or all connections (default: both)")
+    parser.add_argument("--type", action="append", default=[], metavar="TYPE", dest="types",
+                        help="Only include and traverse elements of this type (repeatable)")
+    parser.add_argument("--tag", action="append", default=[], metavar="TAG", dest="tags",
+                        help="Only include and traverse elements with this tag (repeatable)")
+    parser.add_argument("--name", help="Model name written to the blueprint")
+    parser.add_argument("--keep-metrics", action="store_true", help="Keep the main model's centrality and MICMAC attributes")
+    parser.add_argument("--blueprint", type=Path, default=DEFAULT_BLUEPRINT, help="Source blueprint (default: main model)")
+    parser.add_argument("-o", "--output", type=Path, help="Write the reference model here (default: stdout)")
+    parser.add_argument("--force", action="store_true", help="Overwrite an existing output file")
+    parser.add_argument("--no-cache", action="store_true", help="Rebuild the index instead of using the cache")
+    args = parser.parse_args(argv)
+
+    if not args.seeds and not args.seed_type:
+        parser.error("give at least one seed or --seed-type")
+    if args.depth < 0:
+        parser.error("--depth must not be negative")
+    if args.output is not None and args.output.exists() and not args.force:
+        print(f"❌ {args.output} exists (use --force to overwrite)", file=sys.stderr)
+        return 1
+    try:
+        index = ExtractionIndex.load(args.blueprint, use_cache=not args.no_cache)
+        seeds = index.resolve_seeds(args.seeds, args.seed_type)
+        selected = index.select(seeds, args.depth, args.direction, args.types, args.tags)
+        blueprint = index.extract(selected, args.name, args.keep_metrics)
+    except (OSError, ValueError, KeyError, RuntimeError) as exc:
+        message = exc.args[0] if isinstance(exc, KeyError) else exc
+        print(f"❌ {message}", file=sys.stderr)
+        return 1
+
+    text = json.dumps(blueprint, indent=2, ensure_ascii=False) + "\n"
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+    print(f"✅ {len(blueprint['elements'])} elements, {len(blueprint['connections'])} connections "
+          f"({len(seeds)} seeds, depth {args.depth}, {args.direction})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
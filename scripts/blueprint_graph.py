@@ -0,0 +1,235 @@
+"""
+Shared in-memory graph core for Kumu blueprint JSON files.
+
+A blueprint is loaded once into a :class:`BlueprintGraph`:
+
+* element and connection ids are interned and mapped to dense integers,
+* forward and reverse adjacency are stored CSR-style in flat ``array`` buffers
+  (``out_offsets``/``out_targets`` and ``in_offsets``/``in_sources``),
+* frequently used attributes (``label``, ``element type``, ``connection type``)
+  are stored column-wise, aligned with the element/connection index.
+
+The raw blueprint dict stays available as ``graph.data`` and the element and
+connection dicts are shared with it, so scripts that modify attributes and
+write the blueprint back keep working on the very same objects.
+"""
+from __future__ import annotations
+
+import json
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+ELEMENT_COLUMNS = ("label", "element type")
+CONNECTION_COLUMNS = ("label", "connection type")
+
+# Index used for connection endpoints that do not resolve to a known element.
+MISSING = -1
+
+
+def read_blueprint_data(path: Path) -> Dict[str, Any]:
+    """Read a blueprint file (BOM tolerant) and return the raw blueprint dict.
+
+    A bare top-level list is treated as a list of connections, matching the
+    behaviour of the original validator.
+    """
+    with Path(path).open("r", encoding="utf-8-sig") as handle:
+        data = json.load(handle)
+    return normalize_blueprint_data(data)
+
+
+def normalize_blueprint_data(data: Any) -> Dict[str, Any]:
+    if isinstance(data, list):
+        return {"elements": [], "connections": data}
+    if not isinstance(data, dict):
+        raise ValueError(f"Top-level JSON must be an object, got {type(data).__name__}")
+    return data
+
+
+def build_csr(count: int, keys: array, values: array, edges: array) -> tuple:
+    """Counting-sort ``values``/``edges`` by ``keys`` into CSR offset form."""
+    offsets = array("l", [0]) * (count + 1)
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+    cursor = array("l", offsets[:-1])
+    packed_values = array("l", [0]) * len(values)
+    packed_edges = array("l", [0]) * len(values)
+    for key, value, edge in zip(keys, values, edges):
+        slot = cursor[key]
+        packed_values[slot] = value
+        packed_edges[slot] = edge
+        cursor[key] = slot + 1
+    return offsets, packed_values, packed_edges
+
+
+class BlueprintGraph:
+    """Compact, index-based view of a Kumu blueprint.
+
+    Elements are numbered ``0..n-1`` in file order (first occurrence wins for
+    duplicated ids); connections are numbered ``0..m-1`` in file order. Only
+    connections whose endpoints both resolve take part in the adjacency arrays.
+    """
+
+    def __init__(self, data: Any) -> None:
+        self.data: Dict[str, Any] = normalize_blueprint_data(data)
+
+        raw_elements = self.data.get("elements")
+        raw_connections = self.data.get("connections")
+        if not isinstance(raw_elements, list):
+            raw_elements = []
+        if not isinstance(raw_connections, list):
+            raw_connections = []
+
+        self.elements: List[Dict[str, Any]] = []
+        self.element_ids: List[str] = []
+        self.element_index: Dict[str, int] = {}
+        for elem in raw_elements:
+            if not isinstance(elem, dict):
+                continue
+            elem_id = elem.get("_id")
+            if not isinstance(elem_id, str) or elem_id in self.element_index:
+                continue
+            elem_id = sys.intern(elem_id)
+            self.element_index[elem_id] = len(self.elements)
+            self.element_ids.append(elem_id)
+            self.elements.append(elem)
+
+        self.connections: List[Dict[str, Any]] = [c for c in raw_connections if isinstance(c, dict)]
+        self.connection_ids: List[Optional[str]] = []
+        self.connection_index: Dict[str, int] = {}
+
+        n = len(self.elements)
+        self.conn_source = array("l")
+        self.conn_target = array("l")
+        # Degree counters follow the historical definition used by the
+        # validator and recompute_metrics: a connection counts as soon as both
+        # `from` and `to` are set, even if the other endpoint is unknown.
+        self.indegree = array("l", [0]) * n
+        self.outdegree = array("l", [0]) * n
+
+        edge_src = array("l")
+        edge_dst = array("l")
+        edge_ids = array("l")
+        lookup = self.element_index.get
+        for index, conn in enumerate(self.connections):
+            conn_id = conn.get("_id")
+            if isinstance(conn_id, str):
+                conn_id = sys.intern(conn_id)
+                self.connection_index.setdefault(conn_id, index)
+            else:
+                conn_id = None
+            self.connection_ids.append(conn_id)
+
+            from_id = conn.get("from")
+            to_id = conn.get("to")
+            src = lookup(from_id, MISSING) if isinstance(from_id, str) else MISSING
+            dst = lookup(to_id, MISSING) if isinstance(to_id, str) else MISSING
+            self.conn_source.append(src)
+            self.conn_target.append(dst)
+            if from_id and to_id:
+                if src != MISSING:
+                    self.outdegree[src] += 1
+                if dst != MISSING:
+                    self.indegree[dst] += 1
+            if src != MISSING and dst != MISSING:
+                edge_src.append(src)
+                edge_dst.append(dst)
+                edge_ids.append(index)
+
+        self.out_offsets, self.out_targets, self.out_edges = build_csr(n, edge_src, edge_dst, edge_ids)
+        self.in_offsets, self.in_sources, self.in_edges = build_csr(n, edge_dst, edge_src, edge_ids)
+
+        self._element_columns: Dict[str, List[Any]] = {}
+        self._connection_columns: Dict[str, List[Any]] = {}
+        for name in ELEMENT_COLUMNS:
+            self.element_column(name)
+        for name in CONNECTION_COLUMNS:
+            self.connection_column(name)
+
+    # ------------------------------------------------------------------ sizes
+    @property
+    def element_count(self) -> int:
+        return len(self.elements)
+
+    @property
+    def connection_count(self) -> int:
+        return len(self.connections)
+
+    @property
+    def edge_count(self) -> int:
+        """Number of connections with both endpoints resolved."""
+        return len(self.out_targets)
+
+    # ----------------------------------------------------------------- lookup
+    def index_of(self, elem_id: str) -> int:
+        return self.element_index.get(elem_id, MISSING)
+
+    def element(self, elem_id: str) -> Optional[Dict[str, Any]]:
+        index = self.element_index.get(elem_id)
+        return None if index is None else self.elements[index]
+
+    def connection(self, conn_id: str) -> Optional[Dict[str, Any]]:
+        index = self.connection_index.get(conn_id)
+        return None if index is None else self.connections[index]
+
+    # -------------------------------------------------------------- adjacency
+    def successors(self, index: int) -> Sequence[int]:
+        return self.out_targets[self.out_offsets[index]:self.out_offsets[index + 1]]
+
+    def predecessors(self, index: int) -> Sequence[int]:
+        return self.in_sources[self.in_offsets[index]:self.in_offsets[index + 1]]
+
+    def out_connections(self, index: int) -> Sequence[int]:
+        return self.out_edges[self.out_offsets[index]:self.out_offsets[index + 1]]
+
+    def in_connections(self, index: int) -> Sequence[int]:
+        return self.in_edges[self.in_offsets[index]:self.in_offsets[index + 1]]
+
+    # ---------------------------------------------------------------- columns
+    def element_column(self, name: str) -> List[Any]:
+        """Return attribute ``name`` for every element, aligned with the index."""
+        column = self._element_columns.get(name)
+        if column is None:
+            column = [_attributes(elem).get(name) for elem in self.elements]
+            self._element_columns[name] = column
+        return column
+
+    def connection_column(self, name: str) -> List[Any]:
+        """Return attribute ``name`` for every connection, aligned with the index."""
+        column = self._connection_columns.get(name)
+        if column is None:
+            column = [_attributes(conn).get(name) for conn in self.connections]
+            self._connection_columns[name] = column
+        return column
+
+    def invalidate_columns(self, names: Iterable[str] = ()) -> None:
+        """Drop cached columns after attributes were modified in place."""
+        names = list(names)
+        if not names:
+            self._element_columns.clear()
+            self._connection_columns.clear()
+            return
+        for name in names:
+            self._element_columns.pop(name, None)
+            self._connection_columns.pop(name, None)
+
+    def label(self, index: int) -> str:
+        value = self.element_column("label")[index]
+        return value if isinstance(value, str) else ""
+
+    def elements_of_type(self, element_type: str) -> List[int]:
+        column = self.element_column("element type")
+        return [i for i, value in enumerate(column) if value == element_type]
+
+
+def _attributes(obj: Dict[str, Any]) -> Dict[str, Any]:
+    attrs = obj.get("attributes")
+    return attrs if isinstance(attrs, dict) else {}
+
+
+def load_blueprint(path: Path) -> BlueprintGraph:
+    """Load a blueprint file into a :class:`BlueprintGraph`."""
+    return BlueprintGraph(read_blueprint_data(path))
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Per-item content hashes and Merkle roots for change detection.
+
+A :class:`BlueprintManifest` holds one digest per element and connection
+(blake2b over the item's JSON with sorted keys, so formatting and key order
+do not matter), a root per kind over the sorted ``(id, digest)`` pairs, and
+a blueprint root over the kind roots and the remaining top-level members.
+It is computed in a single pass over a parsed blueprint.
+
+:func:`diff_manifests` answers "which ids were added, removed or changed"
+from two manifests alone: equal roots end the comparison immediately, equal
+kind roots skip that kind, and only the id → digest maps of differing kinds
+are compared. No blueprint has to be loaded.
+
+Manifests are stored as sidecars next to the model, ``<model>.json.manifest``
+(not ``*.json``, so model discovery and the linter skip them). A sidecar
+records the git blob id and size of the file it describes, so it can be
+committed; :func:`load_manifest` reuses it while the file still hashes to
+that blob (hashing is far cheaper than parsing) and recomputes it otherwise.
+Manifests of git revisions come from the committed sidecar when it matches
+the blob, else from the blob itself, and are cached in
+``.blueprint_cache/manifests/`` keyed by blob id, so::
+
+    python scripts/blueprint_manifest.py diff origin/main:models/main_model/wirkmechanismen-main-model-blueprint.json
+
+parses at most the blueprints whose manifest was never computed before.
+``diff`` only reads; ``build`` (or ``diff --write``) writes or refreshes the
+sidecars (default: every model below ``models/``), and
+:meth:`blueprint_writer.BlueprintDocument.save` keeps existing sidecars
+current.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from blueprint_cache import REPO_ROOT, cache_dir, load_json_cache, store_json_cache
+from blueprint_graph import normalize_blueprint_data
+from blueprint_spans import KINDS
+from blueprint_writer import write_atomic
+from git_base import BASE_REF, GitCatFileBatch
+
+MANIFEST_SUFFIX = ".manifest"
+MANIFEST_VERSION = 1
+MODELS_DIR = REPO_ROOT / "models"
+# Pseudo-kind for the top-level members other than the item arrays.
+REST = "rest"
+
+
+def content_digest(value: Any) -> bytes:
+    """Digest of ``value`` independent of key order and formatting."""
+    normalized = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(normalized.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def git_blob_id(raw: bytes) -> str:
+    """The id ``git hash-object`` assigns to ``raw``."""
+    digest = hashlib.sha1(b"blob %d\0" % len(raw))
+    digest.update(raw)
+    return digest.hexdigest()
+
+
+def _merkle_root(pairs: Iterable[Tuple[str, str]]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for key, value in pairs:
+        digest.update(key.encode("utf-8", "surrogatepass"))
+        digest.update(b"\0")
+        digest.update(value.encode("ascii"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def item_digests(items: Any) -> Dict[str, str]:
+    """``id → digest`` for a list of items.
+
+    Items without a string ``_id`` are keyed ``#<position>``; repeated ids
+    (duplicate connections) get ``<id>#<n>`` for the n-th repetition.
+    """
+    digests: Dict[str, str] = {}
+    seen: Dict[str, int] = {}
+    for position, item in enumerate(items if isinstance(items, list) else []):
+        item_id = item.get("_id") if isinstance(item, dict) else None
+        if not isinstance(item_id, str):
+            key = f"#{position}"
+        elif item_id in seen:
+            seen[item_id] += 1
+            key = f"{item_id}#{seen[item_id]}"
+        else:
+            seen[item_id] = 0
+            key = item_id
+        digests[key] = content_digest(item).hex()
+    return digests
+
+
+@dataclass
+class BlueprintManifest:
+    root: str
+    roots: Dict[str, str]
+    items: Dict[str, Dict[str, str]]
+    source: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any], source: Optional[Dict[str, Any]] = None) -> "BlueprintManifest":
+        items = {kind: item_digests(data.get(kind)) for kind in KINDS}
+        roots = {kind: _merkle_root(sorted(items[kind].items())) for kind in KINDS}
+        rest = {key: value for key, value in data.items() if key not in KINDS}
+        roots[REST] = content_digest(rest).hex()
+        root = _merkle_root((name, roots[name]) for name in (*KINDS, REST))
+        return cls(root, roots, items, dict(source or {}))
+
+    @classmethod
+    def from_bytes(cls, raw: bytes, source: Optional[Dict[str, Any]] = None) -> "BlueprintManifest":
+        data = normalize_blueprint_data(json.loads(raw.decode("utf-8-sig")))
+        return cls.from_data(data, {"blob": git_blob_id(raw), "size": len(raw), **(source or {})})
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "BlueprintManifest":
+        return cls.from_bytes(Path(path).read_bytes())
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"version": MANIFEST_VERSION, "root": self.root, "roots": self.roots,
+                "source": self.source, "items": self.items}
+
+    @classmethod
+    def from_json(cls, value: Any) -> Optional["BlueprintManifest"]:
+        """Manifest from :meth:`to_json` output, or None if it is not one."""
+        if not isinstance(value, dict) or value.get("version") != MANIFEST_VERSION:
+            return None
+        root, roots, items = value.get("root"), value.get("roots"), value.get("items")
+        if not isinstance(root, str) or not isinstance(roots, dict) or not isinstance(items, dict):
+            return None
+        if any(not isinstance(items.get(kind), dict) or kind not in roots for kind in KINDS) or REST not in roots:
+            return None
+        return cls(root, roots, items, value.get("source") or {})
+
+    def describes(self, path: Path) -> bool:
+        """Whether the manifest still matches the file at ``path``."""
+        try:
+            if path.stat().st_size != self.source.get("size"):
+                return False
+            return git_blob_id(path.read_bytes()) == self.source.get("blob")
+        except OSError:
+            return False
+
+
+@dataclass
+class ManifestDiff:
+    added: Dict[str, List[str]] = field(default_factory=dict)
+    removed: Dict[str, List[str]] = field(default_factory=dict)
+    changed: Dict[str, List[str]] = field(default_factory=dict)
+    rest_changed: bool = False
+
+    def __bool__(self) -> bool:
+        return self.rest_changed or any(
+            ids for group in (self.added, self.removed, self.changed) for ids in group.values()
+        )
+
+    def ids(self, kind: str = "elements") -> List[str]:
+        """Added and changed ids of ``kind``, i.e. the items a consumer has to look at."""
+        return sorted(self.added.get(kind, []) + self.changed.get(kind, []))
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"added": self.added, "removed": self.removed, "changed": self.changed,
+                "rest_changed": self.rest_changed}
+
+
+def diff_manifests(old: BlueprintManifest, new: BlueprintManifest) -> ManifestDiff:
+    """Ids added, removed and changed from ``old`` to ``new``."""
+    diff = ManifestDiff()
+    if old.root == new.root:
+        return diff
+    diff.rest_changed = old.roots.get(REST) != new.roots.get(REST)
+    for kind in KINDS:
+        if old.roots.get(kind) == new.roots.get(kind):
+            continue
+        before, after = old.items.get(kind, {}), new.items.get(kind, {})
+        diff.added[kind] = sorted(key for key in after if key not in before)
+        diff.removed[kind] = sorted(key for key in before if key not in after)
+        diff.changed[kind] = sorted(key for key, digest in after.items() if key in before and before[key] != digest)
+    return diff
+
+
+# ------------------------------------------------------------ sidecars and revisions
+def manifest_path(path: Union[str, Path]) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + MANIFEST_SUFFIX)
+
+
+def read_sidecar(path: Union[str, Path]) -> Optional[BlueprintManifest]:
+    """The sidecar manifest of ``path`` if it exists and is current."""
+    manifest = BlueprintManifest.from_json(load_json_cache(manifest_path(path)))
+    if manifest is None or not manifest.describes(Path(path)):
+        return None
+    return manifest
+
+
+def write_sidecar(path: Union[str, Path], manifest: BlueprintManifest) -> Path:
+    target = manifest_path(path)
+    text = json.dumps(manifest.to_json(), ensure_ascii=False, indent=1, sort_keys=True) + "\n"
+    write_atomic(target, text.encode("utf-8"))
+    return target
+
+
+def refresh_sidecar(path: Union[str, Path], data: Dict[str, Any], raw: bytes) -> bool:
+    """Rewrite an existing sidecar of ``path`` after ``raw`` (holding ``data``) was written there."""
+    path = Path(path)
+    if not manifest_path(path).exists():
+        return False
+    source = {"blob": git_blob_id(raw), "size": len(raw)}
+    write_sidecar(path, BlueprintManifest.from_data(data, source))
+    return True
+
+
+def load_manifest(path: Union[str, Path], write: bool = False) -> BlueprintManifest:
+    """Manifest of the file at ``path``: the sidecar if current, else computed.
+
+    A recomputed manifest is written back as sidecar only when ``write`` is set.
+    """
+    path = Path(path)
+    manifest = read_sidecar(path)
+    if manifest is None:
+        manifest = BlueprintManifest.from_file(path)
+        if write:
+            write_sidecar(path, manifest)
+    return manifest
+
+
+class RevisionManifests:
+    """Manifests of ``REV:PATH`` blobs, cached on disk by blob id."""
+
+    def __init__(self, repo_root: Path = REPO_ROOT, use_cache: bool = True) -> None:
+        self.repo_root = repo_root
+        self.cache_dir = cache_dir("manifests") if use_cache else None
+        self._batch: Optional[GitCatFileBatch] = None
+
+    def blob_id(self, spec: str) -> Optional[str]:
+        try:
+            output = subprocess.run(
+                ["git", "rev-parse", "--verify", "--quiet", spec],
+                cwd=str(self.repo_root), check=True, capture_output=True, text=True,
+            ).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return output.strip() or None
+
+    def get(self, spec: str) -> Optional[BlueprintManifest]:
+        """Manifest of ``spec`` (None if the revision or path does not exist)."""
+        blob = self.blob_id(spec)
+        if blob is None:
+            return None
+        if self.cache_dir is not None:
+            cached = BlueprintManifest.from_json(load_json_cache(self.cache_dir / f"{blob}.json"))
+            if cached is not None:
+                return cached
+        if self._batch is None:
+            self._batch = GitCatFileBatch(self.repo_root)
+        manifest = self._committed_sidecar(spec, blob)
+        if manifest is None:
+            raw = self._batch.read(blob)
+            if raw is None:
+                return None
+            manifest = BlueprintManifest.from_bytes(raw)
+        if self.cache_dir is not None:
+            store_json_cache(self.cache_dir / f"{blob}.json", manifest.to_json())
+        return manifest
+
+    def _committed_sidecar(self, spec: str, blob: str) -> Optional[BlueprintManifest]:
+        assert self._batch is not None
+        raw = self._batch.read(spec + MANIFEST_SUFFIX)
+        if raw is None:
+            return None
+        try:
+            manifest = BlueprintManifest.from_json(json.loads(raw.decode("utf-8")))
+        except ValueError:
+            return None
+        return manifest if manifest is not None and manifest.source.get("blob") == blob else None
+
+    def close(self) -> None:
+        if self._batch is not None:
+            self._batch.close()
+            self._batch = None
+
+    def __enter__(self) -> "RevisionManifests":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def _relative(path: Path) -> str:
+    return path.resolve().relative_to(REPO_ROOT).as_posix()
+
+
+def changed_since(path: Union[str, Path], ref: str = BASE_REF) -> Optional[ManifestDiff]:
+    """What changed in the working-tree file ``path`` since ``ref`` (None if absent there)."""
+    path = Path(path)
+    spec = f"{ref}:{_relative(path)}"
+    with RevisionManifests() as revisions:
+        blob = revisions.blob_id(spec)
+        if blob is None:
+            return None
+        if blob == git_blob_id(path.read_bytes()):
+            return ManifestDiff()
+        base = revisions.get(spec)
+    if base is None:
+        return None
+    return diff_manifests(base, load_manifest(path))
+
+
+def discover_blueprints(directory: Path = MODELS_DIR) -> List[Path]:
+    return sorted(path for path in directory.rglob("*.json") if path.is_file())
+
+
+# ------------------------------------------------------------ CLI
+def _resolve(spec: str, revisions: RevisionManifests, write: bool) -> BlueprintManifest:
+    path = Path(spec)
+    if path.exists():
+        return load_manifest(path, write=write)
+    manifest = revisions.get(spec)
+    if manifest is None:
+        raise ValueError(f"{spec!r} is neither a file nor a git REV:PATH")
+    return manifest
+
+
+def _print_diff(diff: ManifestDiff) -> None:
+    if not diff:
+        print("no changes")
+        return
+    for kind in KINDS:
+        for label, group in (("+", diff.added), ("-", diff.removed), ("~", diff.changed)):
+            for item_id in group.get(kind, []):
+                print(f"{label} {kind[:-1]} {item_id}")
+    if diff.rest_changed:
+        print("~ top-level members")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Per-item content hashes (Merkle manifests) for blueprints.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Write or refresh sidecar manifests")
+    build.add_argument("paths", nargs="*", type=Path, help="Blueprints or directories (default: models/)")
+    diff = sub.add_parser("diff", help="Ids added, removed and changed between two versions")
+    diff.add_argument("old", help="File path or git REV:PATH")
+    diff.add_argument("new", nargs="?", help="File path or git REV:PATH (default: working-tree file of OLD)")
+    diff.add_argument("--json", action="store_true", help="Print the difference as JSON")
+    diff.add_argument("--write", action="store_true",
+                      help="Write sidecars for working-tree files that have none or a stale one")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        files: List[Path] = []
+        for target in args.paths or [MODELS_DIR]:
+            files.extend(discover_blueprints(target) if target.is_dir() else [target])
+        status = 0
+        for path in files:
+            try:
+                manifest = read_sidecar(path)
+                state = "up to date"
+                if manifest is None:
+                    manifest = BlueprintManifest.from_file(path)
+                    write_sidecar(path, manifest)
+                    state = "written"
+            except (OSError, ValueError) as exc:
+                print(f"❌ {path}: {exc}")
+                status = 1
+                continue
+            print(f"{manifest.root}  {path}  ({state})")
+        return status
+
+    new_spec = args.new
+    if new_spec is None:
+        _, sep, rel = args.old.partition(":")
+        if not sep:
+            parser.error("NEW is required when OLD is a file path")
+        new_spec = str(REPO_ROOT / rel)
+    try:
+        with RevisionManifests() as revisions:
+            old = _resolve(args.old, revisions, args.write)
+            new = _resolve(new_spec, revisions, args.write)
+    except (OSError, ValueError) as exc:
+        print(f"❌ {exc}", file=sys.stderr)
+        return 2
+    result = diff_manifests(old, new)
+    if args.json:
+        print(json.dumps(result.to_json(), ensure_ascii=False, indent=2))
+    else:
+        _print_diff(result)
+    return 1 if result else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Semantic three-way merge of blueprint variants.
+
+Elements and connections are aligned by ``_id`` instead of by line. Every
+object of the base, ours and theirs is hashed once over its normalized
+content (``json.dumps`` with sorted keys), so identical objects, which are
+the vast majority between two variants, are settled by comparing digests:
+
+* same digest in ours and theirs, or theirs unchanged from base → ours,
+* ours unchanged from base → theirs,
+* otherwise the object is merged member by member and attribute by
+  attribute with the usual three-way rule; a member changed differently on
+  both sides is a :class:`Conflict`.
+
+Objects added on one side are kept; objects deleted on one side are dropped
+if the other side left them unchanged. Deleted on one side and modified on
+the other is a conflict of the whole object: ``--prefer`` keeps or drops it
+as that side has it, ``base`` restores the base version. The merged lists
+keep the order of ours, with objects only present in theirs appended in
+their order. Other top-level members are merged the same way as object
+members.
+
+Elements and connections are merged independently, so a connection kept by
+one side can point at an element the merge dropped. Such dangling endpoints
+are listed in the report (``dangling``) and make the merge fail like a
+conflict; endpoints that were already dangling in ours or theirs are not
+reported.
+
+Derived metrics (degree counts, centrality, MICMAC) are not reported as
+conflicts: ours is kept and ``recompute_metrics.py`` should be run after the
+merge. All other conflicts are resolved with ``--prefer`` (default ours) and
+reported as JSON (``--conflicts``), one record per attribute::
+
+    {"kind": "elements", "id": "elem-...", "field": "attributes.label",
+     "base": ..., "ours": ..., "theirs": ..., "resolution": "ours"}
+
+An empty ``field`` marks a delete/modify conflict of the whole object; the
+deleted side is reported as ``null`` with ``"<side>_missing": true``. A
+dangling endpoint is reported as::
+
+    {"id": "conn-...", "field": "from", "element": "elem-..."}
+
+The common ancestor is read from git (``git cat-file --batch``): by default
+the version of OURS in the commit that added THEIRS, i.e. the state the
+variant was copied from. ``--base REV:PATH`` or a plain file path overrides it.
+
+Example::
+
+    python scripts/blueprint_merge.py \\
+        "models/main_model/wirkmechanismen-main-model-blueprint.json" \\
+        "models/main_model/wirkmechanismen-main-model-blueprint-Henrike.json" \\
+        --conflicts merge-conflicts.json --dry-run
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from blueprint_cache import REPO_ROOT
+from blueprint_graph import normalize_blueprint_data
+from blueprint_manifest import content_digest
+from blueprint_spans import KINDS
+from blueprint_writer import BlueprintDocument, write_atomic
+from git_base import GitCatFileBatch
+from graph_metrics import CENTRALITY_METRICS
+from micmac import EXPOSURE, INFLUENCE, KUMU_ATTRIBUTES
+
+DERIVED_ATTRIBUTES = frozenset(
+    ("degree", "indegree", "outdegree", "size", INFLUENCE, EXPOSURE, *KUMU_ATTRIBUTES, *CENTRALITY_METRICS)
+)
+PREFER_CHOICES = ("ours", "theirs", "base")
+
+
+class _Missing:
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+MISSING: Any = _Missing()
+
+
+@dataclass
+class Conflict:
+    kind: str
+    id: Optional[str]
+    field: str
+    base: Any
+    ours: Any
+    theirs: Any
+    resolution: str
+
+    def to_json(self) -> Dict[str, Any]:
+        record: Dict[str, Any] = {"kind": self.kind, "id": self.id, "field": self.field}
+        for side in ("base", "ours", "theirs"):
+            value = getattr(self, side)
+            record[side] = None if value is MISSING else value
+            if value is MISSING:
+                record[f"{side}_missing"] = True
+        record["resolution"] = self.resolution
+        return record
+
+
+@dataclass
+class MergeStats:
+    identical: int = 0
+    taken_ours: int = 0
+    taken_theirs: int = 0
+    merged: int = 0
+    added: int = 0
+    deleted: int = 0
+
+
+@dataclass
+class DanglingEndpoint:
+    id: Optional[str]
+    field: str
+    element: Any
+
+
+@dataclass
+class MergeResult:
+    data: Dict[str, Any]
+    conflicts: List[Conflict] = field(default_factory=list)
+    stats: Dict[str, MergeStats] = field(default_factory=dict)
+    dangling: List[DanglingEndpoint] = field(default_factory=list)
+
+
+class _Side:
+    """Items of one blueprint version by id, with their content digests."""
+
+    def __init__(self, items: Any) -> None:
+        self.items: Dict[str, Any] = {}
+        self.order: List[str] = []
+        self.digests: Dict[str, bytes] = {}
+        self.anonymous: List[Any] = []
+        for item in items if isinstance(items, list) else []:
+            item_id = item.get("_id") if isinstance(item, dict) else None
+            if not isinstance(item_id, str):
+                self.anonymous.append(item)
+            elif item_id not in self.items:
+                self.items[item_id] = item
+                self.order.append(item_id)
+                self.digests[item_id] = content_digest(item)
+
+
+class ThreeWayMerge:
+    def __init__(self, prefer: str = "ours", derived: frozenset = DERIVED_ATTRIBUTES) -> None:
+        if prefer not in PREFER_CHOICES:
+            raise ValueError(f"prefer must be one of {', '.join(PREFER_CHOICES)}")
+        self.prefer = prefer
+        self.derived = derived
+        self.conflicts: List[Conflict] = []
+
+    def _value(self, kind: str, item_id: Optional[str], name: str, base: Any, ours: Any, theirs: Any) -> Any:
+        """Three-way merge of one value; MISSING means absent."""
+        if _same(ours, theirs):
+            return ours
+        if _same(base, ours):
+            return theirs
+        if _same(base, theirs):
+            return ours
+        if name.rpartition(".")[2] in self.derived:
+            return ours
+        chosen = {"ours": ours, "theirs": theirs, "base": base}[self.prefer]
+        self.conflicts.append(Conflict(kind, item_id, name, base, ours, theirs, self.prefer))
+        return chosen
+
+    def _deleted(self, kind: str, item_id: str, base: Any, ours: Any, theirs: Any) -> Any:
+        """Resolve an object deleted on one side (MISSING) and modified on the other."""
+        self.conflicts.append(Conflict(kind, item_id, "", base, ours, theirs, self.prefer))
+        return {"ours": ours, "theirs": theirs, "base": base}[self.prefer]
+
+    def _members(self, kind: str, item_id: Optional[str], prefix: str, base: Any, ours: Dict[str, Any], theirs: Dict[str, Any]) -> Dict[str, Any]:
+        base = base if isinstance(base, dict) else {}
+        merged: Dict[str, Any] = {}
+        names = list(ours) + [name for name in theirs if name not in ours]
+        for name in names:
+            b, o, t = base.get(name, MISSING), ours.get(name, MISSING), theirs.get(name, MISSING)
+            if name == "attributes" and not prefix and isinstance(o, dict) and isinstance(t, dict):
+                value = self._members(kind, item_id, "attributes.", b, o, t)
+            else:
+                value = self._value(kind, item_id, prefix + name, b, o, t)
+            if value is not MISSING:
+                merged[name] = value
+        return merged
+
+    def merge_items(self, kind: str, base_items: Any, our_items: Any, their_items: Any) -> Tuple[List[Any], MergeStats]:
+        base, ours, theirs = _Side(base_items), _Side(our_items), _Side(their_items)
+        stats = MergeStats()
+        merged: Dict[str, Any] = {}
+        for item_id in ours.order:
+            our_digest = ours.digests[item_id]
+            their_digest = theirs.digests.get(item_id)
+            base_digest = base.digests.get(item_id)
+            if their_digest == our_digest:
+                stats.identical += 1
+                merged[item_id] = ours.items[item_id]
+            elif their_digest is None:
+                if base_digest is None:
+                    stats.added += 1
+                    merged[item_id] = ours.items[item_id]
+                elif base_digest == our_digest:
+                    stats.deleted += 1
+                else:
+                    item = self._deleted(kind, item_id, base.items[item_id], ours.items[item_id], MISSING)
+                    if item is not MISSING:
+                        merged[item_id] = item
+            elif their_digest == base_digest:
+                stats.taken_ours += 1
+                merged[item_id] = ours.items[item_id]
+            elif our_digest == base_digest:
+                stats.taken_theirs += 1
+                merged[item_id] = theirs.items[item_id]
+            else:
+                stats.merged += 1
+                merged[item_id] = self._members(
+                    kind, item_id, "", base.items.get(item_id), ours.items[item_id], theirs.items[item_id]
+                )
+        for item_id in theirs.order:
+            if item_id in ours.items:
+                continue
+            base_digest = base.digests.get(item_id)
+            if base_digest is None:
+                stats.added += 1
+                merged[item_id] = theirs.items[item_id]
+            elif base_digest == theirs.digests[item_id]:
+                stats.deleted += 1
+            else:
+                item = self._deleted(kind, item_id, base.items[item_id], MISSING, theirs.items[item_id])
+                if item is not MISSING:
+                    merged[item_id] = item
+        # Objects without an id cannot be aligned; ours are kept as they are.
+        return list(merged.values()) + ours.anonymous, stats
+
+    def merge(self, base: Dict[str, Any], ours: Dict[str, Any], theirs: Dict[str, Any]) -> MergeResult:
+        result = MergeResult({})
+        rest = self._members("blueprint", None, "", {k: v for k, v in base.items() if k not in KINDS},
+                             {k: v for k, v in ours.items() if k not in KINDS},
+                             {k: v for k, v in theirs.items() if k not in KINDS})
+        for name in list(ours) + [name for name in theirs if name not in ours]:
+            if name in KINDS:
+                items, stats = self.merge_items(name, base.get(name), ours.get(name), theirs.get(name))
+                result.data[name] = items
+                result.stats[name] = stats
+            elif name in rest:
+                result.data[name] = rest[name]
+        result.conflicts = self.conflicts
+        result.dangling = dangling_endpoints(result.data, ours, theirs)
+        return result
+
+
+def _element_ids(data: Dict[str, Any]) -> set:
+    return {elem.get("_id") for elem in data.get("elements") or [] if isinstance(elem, dict)}
+
+
+def dangling_endpoints(merged: Dict[str, Any], ours: Dict[str, Any], theirs: Dict[str, Any]) -> List[DanglingEndpoint]:
+    """Connection endpoints of ``merged`` whose element the merge dropped.
+
+    Only elements present in ours or theirs count; an endpoint that was
+    already dangling in both inputs is not the merge's doing.
+    """
+    elements = _element_ids(merged)
+    dropped = (_element_ids(ours) | _element_ids(theirs)) - elements
+    dangling: List[DanglingEndpoint] = []
+    for conn in merged.get("connections") or []:
+        if not isinstance(conn, dict):
+            continue
+        for name in ("from", "to"):
+            endpoint = conn.get(name)
+            if isinstance(endpoint, str) and endpoint in dropped:
+                dangling.append(DanglingEndpoint(conn.get("_id"), name, endpoint))
+    return dangling
+
+
+def _same(a: Any, b: Any) -> bool:
+    if a is MISSING or b is MISSING:
+        return a is b
+    return a == b and isinstance(a, bool) == isinstance(b, bool)
+
+
+def merge_blueprints(base: Dict[str, Any], ours: Dict[str, Any], theirs: Dict[str, Any], prefer: str = "ours") -> MergeResult:
+    return ThreeWayMerge(prefer).merge(base, ours, theirs)
+
+
+# ------------------------------------------------------------ base version
+def _relative(path: Path) -> str:
+    return path.resolve().relative_to(REPO_ROOT).as_posix()
+
+
+def default_base_spec(ours: Path, theirs: Path) -> Optional[str]:
+    """``REV:PATH`` of OURS in the commit that added THEIRS (None if unknown)."""
+    try:
+        ours_rel, theirs_rel = _relative(ours), _relative(theirs)
+    except ValueError:
+        return None
+    try:
+        output = subprocess.run(
+            ["git", "log", "--diff-filter=A", "--format=%H", "--", theirs_rel],
+            cwd=str(REPO_ROOT), check=True, capture_output=True, text=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    commits = output.split()
+    if not commits:
+        return None
+    return f"{commits[-1]}:{ours_rel}"
+
+
+def read_base(spec: str) -> Dict[str, Any]:
+    """Blueprint from a file path or a git ``REV:PATH`` spec."""
+    path = Path(spec)
+    if path.exists():
+        content = path.read_bytes()
+    else:
+        with GitCatFileBatch() as git:
+            content = git.read(spec)
+        if content is None:
+            raise ValueError(f"Base version {spec!r} not found in git")
+    return normalize_blueprint_data(json.loads(content.decode("utf-8-sig")))
+
+
+# ------------------------------------------------------------ CLI
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Three-way merge of two blueprint variants aligned by _id.")
+    parser.add_argument("ours", type=Path, help="Blueprint the result is based on (its formatting is kept)")
+    parser.add_argument("theirs", type=Path, help="Variant to merge in")
+    parser.add_argument("--base", help="Common ancestor: file path or git REV:PATH (default: OURS when THEIRS was added)")
+    parser.add_argument("--prefer", choices=PREFER_CHOICES, default="ours", help="Side taken for conflicting attributes")
+    parser.add_argument("--conflicts", type=Path, help="Write the conflict report as JSON ('-' for stdout)")
+    out = parser.add_mutually_exclusive_group()
+    out.add_argument("-o", "--output", type=Path, help="Write the merged blueprint here")
+    out.add_argument("--in-place", action="store_true", help="Overwrite OURS with the merge result")
+    out.add_argument("--dry-run", action="store_true", help="Print the diff OURS -> merge result")
+    args = parser.parse_args(argv)
+
+    for path in (args.ours, args.theirs):
+        if not path.exists():
+            print(f"❌ Blueprint not found: {path}", file=sys.stderr)
+            return 2
+    base_spec = args.base or default_base_spec(args.ours, args.theirs)
+    if base_spec is None:
+        print("❌ No common ancestor found in git history; pass --base", file=sys.stderr)
+        return 2
+    try:
+        base = read_base(base_spec)
+    except ValueError as exc:
+        print(f"❌ {exc}", file=sys.stderr)
+        return 2
+
+    document = BlueprintDocument.open(args.ours)
+    theirs = BlueprintDocument.open(args.theirs).data
+    result = merge_blueprints(base, document.data, theirs, args.prefer)
+    document.data = result.data
+
+    report = {
+        "base": base_spec,
+        "ours": str(args.ours),
+        "theirs": str(args.theirs),
+        "stats": {kind: asdict(stats) for kind, stats in result.stats.items()},
+        "conflicts": [conflict.to_json() for conflict in result.conflicts],
+        "dangling": [asdict(endpoint) for endpoint in result.dangling],
+    }
+    if args.conflicts is not None:
+        text = json.dumps(report, indent=2, ensure_ascii=False)
+        if str(args.conflicts) == "-":
+            print(text)
+        else:
+            write_atomic(args.conflicts, (text + "\n").encode("utf-8"))
+
+    log = sys.stderr
+    for kind, stats in result.stats.items():
+        print(
+            f"  {kind}: {stats.identical} identical, {stats.taken_ours} ours, {stats.taken_theirs} theirs, "
+            f"{stats.merged} merged, {stats.added} added, {stats.deleted} deleted",
+            file=log,
+        )
+    print(f"  {len(result.conflicts)} conflicts (resolved as {args.prefer})", file=log)
+    for endpoint in result.dangling:
+        print(f"  ⚠️  connection {endpoint.id}: '{endpoint.field}' points at dropped element {endpoint.element}", file=log)
+    if args.dry_run:
+        sys.stdout.write(document.diff())
+    elif args.in_place:
+        document.save()
+    elif args.output is not None:
+        document.save(args.output)
+    return 1 if result.conflicts or result.dangling else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
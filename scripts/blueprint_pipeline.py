@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Run a chain of blueprint maintenance transforms with one load and one write.
+
+The routine ``remove_duplicates`` → ``add_cluster_attributes`` →
+``apply_mapping_updates`` → ``recompute_metrics`` used to parse and
+rewrite the blueprint four times. :func:`run_pipeline` instead:
+
+1. takes ``<blueprint>.lock`` (:func:`blueprint_writer.blueprint_lock`), so
+   concurrent runs wait for each other instead of overwriting each other,
+2. loads the blueprint once as a :class:`blueprint_writer.BlueprintDocument`,
+3. runs every stage in memory, timing each one,
+4. writes once, atomically and as a minimal diff (or, with ``--dry-run``,
+   prints the unified diff and writes nothing).
+
+Built-in stages are ``dedupe``, ``cluster``, ``mapping`` and ``metrics``.
+A custom stage is any ``transform(document, options) -> Optional[str]``,
+referenced as ``module:function`` (module importable from ``scripts/``) or
+``path/to/file.py:function``; the returned string is printed as its summary.
+Stages that add or remove elements or connections must call
+``document.invalidate_graph()``.
+
+Stages can also come from a JSON config::
+
+    {"stages": ["dedupe",
+                {"stage": "cluster", "cluster": "Mensch", "elements": ["elem-..."]},
+                {"stage": "mapping", "mapping": "mapping_result.json"},
+                {"stage": "plugin", "target": "my_checks:tag_orphans"},
+                {"stage": "metrics", "jobs": 4}]}
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import importlib.util
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from blueprint_writer import BlueprintChangedError, BlueprintDocument, blueprint_lock
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_BLUEPRINT = REPO_ROOT / "models" / "main_model" / "wirkmechanismen-main-model-blueprint.json"
+DEFAULT_STAGES = ("dedupe", "cluster", "mapping", "metrics")
+
+# add_cluster_attributes.py lives in the repository root; appended so it
+# cannot shadow a module of scripts/ with the same name.
+if str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
+
+Transform = Callable[[BlueprintDocument, Dict[str, Any]], Optional[str]]
+
+
+@dataclass
+class Stage:
+    name: str
+    transform: Transform
+    options: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class StageResult:
+    name: str
+    seconds: float
+    summary: str = ""
+
+
+# ------------------------------------------------------------ built-in stages
+def dedupe_connections(document: BlueprintDocument, options: Dict[str, Any]) -> str:
+    """Drop connections whose ``_id`` already occurred (first one wins)."""
+    connections = document.data.get("connections")
+    if not isinstance(connections, list):
+        return "no connections"
+    seen = set()
+    unique = []
+    for conn in connections:
+        conn_id = conn.get("_id") if isinstance(conn, dict) else None
+        if conn_id is not None and conn_id in seen:
+            continue
+        seen.add(conn_id)
+        unique.append(conn)
+    removed = len(connections) - len(unique)
+    if removed:
+        document.data["connections"] = unique
+        document.invalidate_graph()
+    return f"removed {removed} duplicate connections"
+
+
+def assign_clusters(document: BlueprintDocument, options: Dict[str, Any]) -> str:
+    """Set ``cluster`` on the configured elements (default: the "Mensch" list of add_cluster_attributes)."""
+    from add_cluster_attributes import MENSCH_CLUSTER_ELEMENTS, assign_cluster
+
+    cluster = options.get("cluster", "Mensch")
+    elements = options.get("elements", MENSCH_CLUSTER_ELEMENTS)
+    modified, not_found = assign_cluster(document.graph, elements, cluster)
+    summary = f"{modified} elements in cluster {cluster!r}"
+    if not_found:
+        summary += f", not found: {', '.join(not_found)}"
+    return summary
+
+
+def apply_mapping_stage(document: BlueprintDocument, options: Dict[str, Any]) -> str:
+    """Fill empty measurability/influenceability from a mapping_result.json."""
+    from apply_mapping_updates import apply_mapping, load_mapping
+
+    mapping_path = Path(options.get("mapping", REPO_ROOT / "mapping_result.json"))
+    if not mapping_path.is_absolute():
+        mapping_path = REPO_ROOT / mapping_path
+    if not mapping_path.exists():
+        return f"skipped, {mapping_path.name} not found"
+    applied = apply_mapping(document.graph, load_mapping(mapping_path))
+    return f"applied {len(applied)} updates"
+
+
+def recompute_metrics_stage(document: BlueprintDocument, options: Dict[str, Any]) -> str:
+    from recompute_metrics import refresh_metrics
+
+    degree_only = options.get("degree_only", False)
+    updated = refresh_metrics(
+        document.graph,
+        centrality=not degree_only,
+        jobs=options.get("jobs", 1),
+        micmac=not (degree_only or options.get("no_micmac", False)),
+        signed_micmac=options.get("signed_micmac", False),
+    )
+    return f"degree counts changed for {updated} elements"
+
+
+BUILTIN_STAGES: Dict[str, Transform] = {
+    "dedupe": dedupe_connections,
+    "cluster": assign_clusters,
+    "mapping": apply_mapping_stage,
+    "metrics": recompute_metrics_stage,
+}
+
+
+# ------------------------------------------------------------ configuration
+def load_plugin(target: str) -> Transform:
+    """Resolve ``module:function`` or ``path/to/file.py:function``."""
+    module_name, _, function_name = target.rpartition(":")
+    if not module_name or not function_name:
+        raise ValueError(f"Plugin must be given as module:function, got {target!r}")
+    if module_name.endswith(".py"):
+        path = Path(module_name)
+        spec = importlib.util.spec_from_file_location(path.stem, path)
+        if spec is None or spec.loader is None:
+            raise ValueError(f"Cannot load plugin file {path}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(module_name)
+    transform = getattr(module, function_name, None)
+    if not callable(transform):
+        raise ValueError(f"Plugin {target!r} is not callable")
+    return transform
+
+
+def build_stage(spec: Any, defaults: Optional[Dict[str, Any]] = None) -> Stage:
+    """Stage from a name or a ``{"stage": name, **options}`` config entry."""
+    if isinstance(spec, str):
+        spec = {"stage": spec}
+    options = {**(defaults or {}), **{key: value for key, value in spec.items() if key not in ("stage", "target")}}
+    name = spec.get("stage")
+    if name == "plugin":
+        target = spec.get("target")
+        if not isinstance(target, str):
+            raise ValueError("Plugin stage needs a 'target' (module:function)")
+        return Stage(target, load_plugin(target), options)
+    if name not in BUILTIN_STAGES:
+        raise ValueError(f"Unknown stage {name!r} (known: {', '.join(BUILTIN_STAGES)}, plugin)")
+    return Stage(name, BUILTIN_STAGES[name], options)
+
+
+def load_config(path: Path, defaults: Optional[Dict[str, Any]] = None) -> List[Stage]:
+    with Path(path).open("r", encoding="utf-8-sig") as handle:
+        config = json.load(handle)
+    specs = config.get("stages") if isinstance(config, dict) else config
+    if not isinstance(specs, list):
+        raise ValueError(f"{path}: expected a list of stages")
+    return [build_stage(spec, defaults) for spec in specs]
+
+
+# ------------------------------------------------------------ runner
+def run_pipeline(
+    blueprint_path: Path,
+    stages: Sequence[Stage],
+    dry_run: bool = False,
+    lock_timeout: float = 30.0,
+    report: Callable[[str], None] = print,
+) -> List[StageResult]:
+    """Load ``blueprint_path`` once, run ``stages`` in order and write once."""
+    results: List[StageResult] = []
+
+    def timed(name: str, action: Callable[[], Optional[str]]) -> None:
+        start = time.perf_counter()
+        summary = action() or ""
+        result = StageResult(name, time.perf_counter() - start, summary)
+        results.append(result)
+        report(f"  {name:<12} {result.seconds * 1000:9.1f} ms  {summary}")
+
+    with blueprint_lock(blueprint_path, timeout=lock_timeout):
+        loaded: List[BlueprintDocument] = []
+
+        def load() -> str:
+            loaded.append(BlueprintDocument.open(blueprint_path))
+            return f"{len(loaded[0].raw)} bytes"
+
+        timed("load", load)
+        document = loaded[0]
+        for stage in stages:
+            timed(stage.name, lambda stage=stage: stage.transform(document, stage.options))
+
+        if dry_run:
+            diff: List[str] = []
+
+            def render_diff() -> str:
+                try:
+                    label = blueprint_path.resolve().relative_to(REPO_ROOT).as_posix()
+                except ValueError:
+                    label = blueprint_path.name
+                diff.append(document.diff(label))
+                return f"{diff[0].count(chr(10))} diff lines, nothing written"
+
+            timed("diff", render_diff)
+            if diff[0]:
+                sys.stdout.write(diff[0])
+        else:
+            timed("write", lambda: "written" if document.save() else "unchanged, nothing written")
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run blueprint maintenance transforms with a single load and write.")
+    parser.add_argument("blueprint", nargs="?", type=Path, default=DEFAULT_BLUEPRINT, help="Blueprint JSON (default: main model)")
+    parser.add_argument("--stages", default=",".join(DEFAULT_STAGES),
+                        help=f"Comma-separated built-in stages (default: {','.join(DEFAULT_STAGES)})")
+    parser.add_argument("--plugin", action="append", default=[], metavar="MODULE:FUNCTION",
+                        help="Append a custom transform stage (repeatable)")
+    parser.add_argument("--config", type=Path, help="JSON file with the stage list (replaces --stages)")
+    parser.add_argument("--mapping", type=Path, help="mapping_result.json for the mapping stage")
+    parser.add_argument("--degree-only", action="store_true", help="metrics stage: only degree/indegree/outdegree/size")
+    parser.add_argument("--no-micmac", action="store_true", help="metrics stage: skip local MICMAC influence/exposure")
+    parser.add_argument("--signed-micmac", action="store_true", help="metrics stage: weigh MICMAC connections by polarity")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="metrics stage: worker processes for betweenness")
+    parser.add_argument("--dry-run", action="store_true", help="Print the unified diff instead of writing")
+    parser.add_argument("--lock-timeout", type=float, default=30.0, help="Seconds to wait for a concurrent run")
+    args = parser.parse_args(argv)
+
+    if not args.blueprint.exists():
+        print(f"❌ Blueprint not found: {args.blueprint}")
+        return 1
+    defaults: Dict[str, Any] = {"jobs": args.jobs, "degree_only": args.degree_only,
+                                "no_micmac": args.no_micmac, "signed_micmac": args.signed_micmac}
+    if args.mapping is not None:
+        defaults["mapping"] = str(args.mapping.resolve())
+    try:
+        if args.config is not None:
+            stages = load_config(args.config, defaults)
+        else:
+            names = [name.strip() for name in args.stages.split(",") if name.strip()]
+            stages = [build_stage(name, defaults) for name in names]
+        stages += [build_stage({"stage": "plugin", "target": target}, defaults) for target in args.plugin]
+    except (OSError, ValueError, ImportError) as exc:
+        print(f"❌ {exc}")
+        return 2
+
+    print(f"🔄 Pipeline for {args.blueprint}: {' → '.join(stage.name for stage in stages)}\n")
+    start = time.perf_counter()
+    try:
+        run_pipeline(args.blueprint, stages, dry_run=args.dry_run, lock_timeout=args.lock_timeout)
+    except (TimeoutError, BlueprintChangedError) as exc:
+        print(f"❌ {exc}")
+        return 1
+    print(f"\n✅ Done in {time.perf_counter() - start:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,620 @@
+"""
+Byte-span index and in-place patching for blueprint JSON files.
+
+:class:`BlueprintSpanIndex` locates every member of the top-level ``elements``
+and ``connections`` arrays in one pass: each item is decoded by the C JSON
+decoder to read its ``_id`` and its byte span is recorded. Items are
+addressable by ``_id`` in O(1). The byte spans of an item's members and of
+each member of its ``attributes`` object are resolved from the raw bytes the
+first time the item is looked up, so only patched items pay for that.
+
+:class:`BlueprintPatch` collects attribute edits against an index and
+applies them by splicing only the affected byte ranges, so everything else
+stays byte-identical: formatting, key order, number spelling, BOM and line
+endings. New attributes are appended after the last existing one using the
+indentation, separator and newline style of the file. :meth:`BlueprintPatch.diff`
+emits a unified diff (``git apply`` compatible) built from the touched lines
+only, so a bulk update costs O(file) for the scan plus O(updates).
+
+Example::
+
+    index = BlueprintSpanIndex.from_file(path)
+    patch = BlueprintPatch(index)
+    patch.set_attribute("elem-0PyumJeh", "measurability", 0.5)
+    path.write_bytes(patch.apply())
+"""
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from blueprint_stream import UTF8_BOM, BlueprintStreamError
+
+KINDS = ("elements", "connections")
+
+_WHITESPACE = re.compile(rb"[ \t\r\n]*")
+_TEXT_WHITESPACE = re.compile(r"[ \t\r\n]*")
+# Fast path for the common escape-free ``"key":`` including surrounding whitespace.
+_KEY = re.compile(rb'[ \t\r\n]*"([^"\\]*)"[ \t\r\n]*:[ \t\r\n]*')
+_SCALAR = re.compile(rb"[^,:\]\}\s]+")
+_PLAIN = re.compile(rb'[^"{}\[\]]*')
+_QUOTE, _BACKSLASH, _COMMA = ord('"'), ord("\\"), ord(",")
+_OPENERS, _CLOSERS = (ord("{"), ord("[")), (ord("}"), ord("]"))
+
+
+@dataclass
+class MemberSpan:
+    """``"key": value`` inside an object; offsets are absolute, ends exclusive."""
+
+    key_start: int
+    key_end: int
+    value_start: int
+    value_end: int
+
+
+@dataclass
+class ObjectSpan:
+    start: int
+    end: int
+    # In file order; for duplicate keys the last occurrence wins, as in json.loads.
+    members: Dict[str, MemberSpan] = field(default_factory=dict)
+    order: List[MemberSpan] = field(default_factory=list)
+
+
+@dataclass
+class ItemSpans:
+    kind: str
+    index: int
+    id: Optional[str]
+    start: int
+    end: int
+    # Filled by BlueprintSpanIndex.resolve (item() resolves automatically).
+    object: Optional[ObjectSpan] = None
+    attributes: Optional[ObjectSpan] = None
+
+
+class _Scanner:
+    """Member span scanner over the raw bytes of one item.
+
+    String contents are skipped with ``bytes.find`` and only keys are
+    decoded, which keeps the per-byte work in C.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+        self._keys: Dict[bytes, str] = {}
+
+    def error(self, message: str, offset: Optional[int] = None) -> BlueprintStreamError:
+        return BlueprintStreamError(message, self.pos if offset is None else offset)
+
+    def peek(self) -> int:
+        self.pos = _WHITESPACE.match(self.data, self.pos).end()
+        return self.data[self.pos] if self.pos < len(self.data) else -1
+
+    def expect(self, char: bytes, message: str) -> None:
+        if self.peek() != char[0]:
+            raise self.error(message)
+        self.pos += 1
+
+    def string_end(self, start: int) -> int:
+        """End of the JSON string whose opening quote is at ``start``."""
+        data = self.data
+        end = data.find(b'"', start + 1)
+        while end > 0 and data[end - 1] == _BACKSLASH:
+            slash = end - 1
+            while data[slash - 1] == _BACKSLASH:
+                slash -= 1
+            if (end - slash) % 2 == 0:
+                break
+            end = data.find(b'"', end + 1)
+        if end < 0:
+            raise self.error("Unterminated string", start)
+        return end + 1
+
+    def decode(self, start: int, end: int) -> str:
+        """Text of the complete JSON string at ``data[start:end]``."""
+        raw = self.data[start + 1:end - 1]
+        try:
+            return json.loads(self.data[start:end]) if b"\\" in raw else raw.decode("utf-8")
+        except (UnicodeDecodeError, ValueError):
+            raise self.error("Invalid string", start) from None
+
+    def skip_value(self) -> int:
+        """Move past the value at pos and return its end."""
+        data = self.data
+        first = self.peek()
+        start = self.pos
+        if first == _QUOTE:
+            self.pos = self.string_end(start)
+        elif first in _OPENERS:
+            depth, scan = 0, start
+            while True:
+                scan = _PLAIN.match(data, scan).end()
+                if scan >= len(data):
+                    raise self.error("Unexpected end of data inside value", start)
+                char = data[scan]
+                if char == _QUOTE:
+                    scan = self.string_end(scan)
+                    continue
+                scan += 1
+                depth += 1 if char in _OPENERS else -1
+                if depth == 0:
+                    break
+            self.pos = scan
+        else:
+            match = _SCALAR.match(data, start)
+            if match is None:
+                raise self.error("Expecting value")
+            self.pos = match.end()
+        return self.pos
+
+    def object(self, handlers: Optional[Dict[str, Callable[[], Any]]] = None) -> Tuple[ObjectSpan, Dict[str, Any]]:
+        """Spans of the object at pos.
+
+        For members whose key is in ``handlers`` and whose value is not a
+        string, the handler is called with the cursor on the value; it must
+        move past the value and its result is returned under that key.
+        """
+        data, keys, key_match = self.data, self._keys, _KEY.match
+        handlers = handlers or {}
+        self.expect(b"{", "Expecting '{'")
+        obj = ObjectSpan(self.pos - 1, -1)
+        results: Dict[str, Any] = {}
+        members, order = obj.members, obj.order
+        if self.peek() == ord("}"):
+            self.pos += 1
+            obj.end = self.pos
+            return obj, results
+        while True:
+            match = key_match(data, self.pos)
+            if match is not None:
+                key_start, key_end = match.start(1) - 1, match.end(1) + 1
+                self.pos = match.end()
+            else:
+                if self.peek() != _QUOTE:
+                    raise self.error("Expecting property name enclosed in double quotes")
+                key_start = self.pos
+                key_end = self.pos = self.string_end(key_start)
+                self.expect(b":", "Expecting ':' delimiter")
+                self.peek()
+            raw = data[key_start:key_end]
+            key = keys.get(raw)
+            if key is None:
+                key = keys[raw] = self.decode(key_start, key_end)
+            value_start = self.pos
+            if value_start < len(data) and data[value_start] == _QUOTE:
+                self.pos = self.string_end(value_start)
+            elif key in handlers:
+                results[key] = handlers[key]()
+            else:
+                self.skip_value()
+            span = MemberSpan(key_start, key_end, value_start, self.pos)
+            members[key] = span
+            order.append(span)
+            char = data[self.pos] if self.pos < len(data) else -1
+            if char != _COMMA and char != _CLOSERS[0]:
+                char = self.peek()
+            self.pos += 1
+            if char == _CLOSERS[0]:
+                break
+            if char != _COMMA:
+                raise self.error("Expecting ',' delimiter", self.pos - 1)
+        obj.end = self.pos
+        return obj, results
+
+    def attributes(self) -> Optional[ObjectSpan]:
+        if self.peek() != _OPENERS[0]:
+            self.skip_value()
+            return None
+        return self.object()[0]
+
+    def item(self, item: ItemSpans) -> None:
+        self.pos = item.start
+        item.object, results = self.object({"attributes": self.attributes})
+        item.attributes = results.get("attributes")
+
+
+class BlueprintSpanIndex:
+    def __init__(self, data: bytes, keep_values: bool = False) -> None:
+        """Index ``data``; with ``keep_values`` the decoded top-level object is kept as :attr:`values`."""
+        self.data = data
+        self.items: Dict[str, List[ItemSpans]] = {kind: [] for kind in KINDS}
+        # Byte span of the ``elements``/``connections`` array values.
+        self.arrays: Dict[str, Tuple[int, int]] = {}
+        self.values: Optional[Dict[str, Any]] = {} if keep_values else None
+        self._by_id: Dict[str, Dict[str, ItemSpans]] = {kind: {} for kind in KINDS}
+        self._scan()
+        first_newline = data.find(b"\n")
+        self.newline = b"\r\n" if first_newline > 0 and data[first_newline - 1] == ord("\r") else b"\n"
+
+    @classmethod
+    def from_file(cls, path: Path) -> "BlueprintSpanIndex":
+        return cls(Path(path).read_bytes())
+
+    def _scan(self) -> None:
+        """Locate every item with the C JSON decoder; member spans are resolved on demand."""
+        data = self.data
+        offset = len(UTF8_BOM) if data.startswith(UTF8_BOM) else 0
+        try:
+            text = data[offset:].decode("utf-8")
+        except UnicodeDecodeError as exc:
+            raise BlueprintStreamError(f"Invalid UTF-8: {exc.reason}", offset + exc.start) from None
+        # Character -> byte offsets, advanced monotonically (identity for ASCII files).
+        ascii_text = text.isascii()
+        mark = [0, offset]
+
+        def to_byte(char_pos: int) -> int:
+            if ascii_text:
+                return offset + char_pos
+            mark[1] += len(text[mark[0]:char_pos].encode("utf-8"))
+            mark[0] = char_pos
+            return mark[1]
+
+        decode = json.JSONDecoder().raw_decode
+        whitespace = _TEXT_WHITESPACE.match
+
+        def expect(pos: int, char: str, message: str) -> int:
+            pos = whitespace(text, pos).end()
+            if text[pos:pos + 1] != char:
+                raise BlueprintStreamError(message, to_byte(pos))
+            return pos + 1
+
+        values = self.values
+
+        def items(kind: str, pos: int) -> int:
+            array_start = to_byte(pos)
+            kept: List[Any] = []
+            if values is not None:
+                values[kind] = kept
+            pos = expect(pos, "[", "Expecting '['")
+            pos = whitespace(text, pos).end()
+            if text[pos:pos + 1] == "]":
+                self.arrays[kind] = (array_start, to_byte(pos + 1))
+                return pos + 1
+            index = 0
+            while True:
+                value, end = decode(text, pos)
+                if values is not None:
+                    kept.append(value)
+                if isinstance(value, dict):
+                    item_id = value.get("_id")
+                    start = to_byte(pos)
+                    item = ItemSpans(kind, index, item_id if isinstance(item_id, str) else None, start, to_byte(end))
+                    self.items[kind].append(item)
+                    if item.id is not None:
+                        self._by_id[kind][item.id] = item
+                index += 1
+                pos = whitespace(text, end).end()
+                char = text[pos:pos + 1]
+                if char == "]":
+                    self.arrays[kind] = (array_start, to_byte(pos + 1))
+                    return pos + 1
+                if char != ",":
+                    raise BlueprintStreamError("Expecting ',' delimiter", to_byte(pos))
+                pos = whitespace(text, pos + 1).end()
+
+        try:
+            pos = expect(0, "{", "Blueprint is not a JSON object")
+            pos = whitespace(text, pos).end()
+            if text[pos:pos + 1] == "}":
+                pos += 1
+            else:
+                while True:
+                    key, pos = decode(text, whitespace(text, pos).end())
+                    if not isinstance(key, str):
+                        raise BlueprintStreamError("Expecting property name enclosed in double quotes", to_byte(pos))
+                    pos = whitespace(text, expect(pos, ":", "Expecting ':' delimiter")).end()
+                    if key in self.items and text[pos:pos + 1] == "[":
+                        pos = items(key, pos)
+                    else:
+                        value, pos = decode(text, pos)
+                        if values is not None:
+                            values[key] = value
+                    pos = whitespace(text, pos).end()
+                    char = text[pos:pos + 1]
+                    pos += 1
+                    if char == "}":
+                        break
+                    if char != ",":
+                        raise BlueprintStreamError("Expecting ',' delimiter", to_byte(pos - 1))
+            if whitespace(text, pos).end() != len(text):
+                raise BlueprintStreamError("Extra data", to_byte(pos))
+        except json.JSONDecodeError as exc:
+            raise BlueprintStreamError(exc.msg, offset + len(text[:exc.pos].encode("utf-8"))) from None
+
+    def resolve(self, item: ItemSpans) -> ItemSpans:
+        """Fill the member and attribute spans of ``item``."""
+        if item.object is None:
+            _Scanner(self.data).item(item)
+        return item
+
+    def item(self, item_id: str, kind: str = "elements") -> Optional[ItemSpans]:
+        item = self._by_id[kind].get(item_id)
+        return self.resolve(item) if item is not None else None
+
+    def line_indent(self, offset: int) -> bytes:
+        """Leading whitespace of the line containing ``offset``."""
+        line_start = self.data.rfind(b"\n", 0, offset) + 1
+        return _WHITESPACE.match(self.data, line_start, offset).group().replace(b"\r", b"").replace(b"\n", b"")
+
+
+def encode_value(value: Any, indent: bytes = b"", newline: bytes = b"\n") -> bytes:
+    """JSON for ``value`` as json.dump(indent=2, ensure_ascii=False) would write it at ``indent``."""
+    text = json.dumps(value, ensure_ascii=False, indent=2).encode("utf-8")
+    if b"\n" in text:
+        text = text.replace(b"\n", newline + indent)
+    return text
+
+
+class PatchConflict(ValueError):
+    """Two edits touch overlapping bytes."""
+
+
+class BlueprintPatch:
+    def __init__(self, index: BlueprintSpanIndex) -> None:
+        self.index = index
+        # (start, end) -> replacement bytes for existing values.
+        self._edits: Dict[Tuple[int, int], bytes] = {}
+        # object start -> (object, names of members to remove). The cuts are
+        # computed in _sorted_edits, so adjacent removals merge into one range.
+        self._removals: Dict[int, Tuple[ObjectSpan, Set[str]]] = {}
+        # object start -> (object, {name: value}) of members to append.
+        self._inserts: Dict[int, Tuple[ObjectSpan, Dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return (len(self._edits) + sum(len(names) for _obj, names in self._removals.values())
+                + sum(len(values) for _obj, values in self._inserts.values()))
+
+    def _item(self, item_id: str, kind: str) -> ItemSpans:
+        item = self.index.item(item_id, kind)
+        if item is None:
+            raise KeyError(f"{kind[:-1]} {item_id!r} not found")
+        return item
+
+    def _append(self, obj: ObjectSpan) -> Dict[str, Any]:
+        return self._inserts.setdefault(obj.start, (obj, {}))[1]
+
+    def replace(self, start: int, end: int, text: bytes) -> None:
+        """Raw edit: replace ``data[start:end]`` with ``text``."""
+        self._edits[(start, end)] = text
+
+    def set_member(self, obj: ObjectSpan, name: str, value: Any) -> bool:
+        """Set member ``name`` of ``obj``; return False if the file already holds an equal value."""
+        span = obj.members.get(name)
+        if span is None:
+            self._append(obj)[name] = value
+            return True
+        removed = self._removals.get(obj.start)
+        if removed is not None:
+            removed[1].discard(name)
+        key = (span.value_start, span.value_end)
+        try:
+            old = json.loads(self.index.data[span.value_start:span.value_end])
+        except ValueError:
+            old = None
+        else:
+            # 1 and 1.0 count as equal (no churn), True and 1 do not.
+            if old == value and isinstance(old, bool) == isinstance(value, bool):
+                self._edits.pop(key, None)
+                return False
+        indent = self.index.line_indent(span.key_start)
+        self._edits[key] = encode_value(value, indent, self.index.newline)
+        return True
+
+    def remove_member(self, obj: ObjectSpan, name: str) -> bool:
+        pending = self._inserts.get(obj.start)
+        if pending is not None and name in pending[1]:
+            del pending[1][name]
+            return True
+        span = obj.members.get(name)
+        removed = self._removals.setdefault(obj.start, (obj, set()))[1]
+        if span is None or name in removed:
+            return False
+        self._edits.pop((span.value_start, span.value_end), None)
+        removed.add(name)
+        return True
+
+    def _removal_cuts(self, obj: ObjectSpan, names: Set[str]) -> List[Tuple[int, int]]:
+        """Byte ranges cutting the members ``names`` out of ``obj``.
+
+        Each run of adjacent removed members is one range: from the end of the
+        previous kept member's value, or up to the next kept member's key when
+        the run starts the object, so separators never overlap.
+        """
+        removed = {id(obj.members[name]) for name in names}
+        order = obj.order
+        cuts: List[Tuple[int, int]] = []
+        position = 0
+        while position < len(order):
+            if id(order[position]) not in removed:
+                position += 1
+                continue
+            first = position
+            while position < len(order) and id(order[position]) in removed:
+                position += 1
+            last = position - 1
+            if first > 0:
+                cuts.append((order[first - 1].value_end, order[last].value_end))
+            elif position < len(order):
+                cuts.append((order[first].key_start, order[position].key_start))
+            else:
+                cuts.append((obj.start + 1, obj.end - 1))
+        return cuts
+
+    def _kept(self, obj: ObjectSpan) -> List[MemberSpan]:
+        removals = self._removals.get(obj.start)
+        if removals is None or not removals[1]:
+            return obj.order
+        removed = {id(obj.members[name]) for name in removals[1]}
+        return [span for span in obj.order if id(span) not in removed]
+
+    def set_item_attribute(self, item: ItemSpans, name: str, value: Any) -> bool:
+        item = self.index.resolve(item)
+        if item.attributes is not None:
+            return self.set_member(item.attributes, name, value)
+        if "attributes" in item.object.members:
+            # ``attributes`` is not an object (e.g. null): replace it.
+            return self.set_member(item.object, "attributes", {name: value})
+        # No attributes object yet: append one to the item.
+        self._append(item.object).setdefault("attributes", {})[name] = value
+        return True
+
+    def set_attribute(self, item_id: str, name: str, value: Any, kind: str = "elements") -> bool:
+        """Set ``attributes[name]``; return False if the file already holds an equal value."""
+        return self.set_item_attribute(self._item(item_id, kind), name, value)
+
+    def remove_attribute(self, item_id: str, name: str, kind: str = "elements") -> bool:
+        attributes = self._item(item_id, kind).attributes
+        return attributes is not None and self.remove_member(attributes, name)
+
+    def update_attributes(self, item_id: str, values: Dict[str, Any], kind: str = "elements") -> int:
+        """Set several attributes of one item; return how many actually change."""
+        return sum(self.set_attribute(item_id, name, value, kind) for name, value in values.items())
+
+    def _insertion(self, obj: ObjectSpan, values: Dict[str, Any]) -> Tuple[int, int, bytes]:
+        data, newline = self.index.data, self.index.newline
+        kept = self._kept(obj)
+        if kept:
+            last = max(kept, key=lambda span: span.value_end)
+            indent = self.index.line_indent(last.key_start)
+            separator = data[last.key_end:last.value_start] or b": "
+            start = end = last.value_end
+            prefix, suffix = b",", b""
+        else:
+            outer = self.index.line_indent(obj.start)
+            indent, separator = outer + b"  ", b": "
+            start, end = obj.start + 1, obj.end - 1
+            prefix, suffix = b"", newline + outer
+        members = [
+            newline + indent + json.dumps(name, ensure_ascii=False).encode("utf-8") + separator
+            + encode_value(value, indent, newline)
+            for name, value in values.items()
+        ]
+        return start, end, prefix + b",".join(members) + suffix
+
+    def _sorted_edits(self) -> List[Tuple[int, int, bytes]]:
+        # Rank 0 before 1: a replaced last value comes before members appended after it.
+        edits = [(start, end, 0, text) for (start, end), text in self._edits.items()]
+        for obj, values in self._inserts.values():
+            if values:
+                start, end, text = self._insertion(obj, values)
+                edits.append((start, end, 1, text))
+        for obj, names in self._removals.values():
+            if not names:
+                continue
+            if not self._kept(obj) and self._inserts.get(obj.start, (obj, {}))[1]:
+                # Every member goes and new ones come: the insertion rewrites the whole body.
+                continue
+            edits.extend((start, end, 0, b"") for start, end in self._removal_cuts(obj, names))
+        edits.sort(key=lambda edit: edit[:3])
+        result: List[Tuple[int, int, bytes]] = []
+        last_end = -1
+        for start, end, _rank, text in edits:
+            if start < last_end:
+                raise PatchConflict(f"Overlapping edits at byte {start}")
+            result.append((start, end, text))
+            last_end = max(last_end, end)
+        return result
+
+    def apply(self) -> bytes:
+        data = self.index.data
+        parts = []
+        pos = 0
+        for start, end, text in self._sorted_edits():
+            parts.append(data[pos:start])
+            parts.append(text)
+            pos = end
+        parts.append(data[pos:])
+        return b"".join(parts)
+
+    def diff(self, path: str, context: int = 3) -> str:
+        """Unified diff of the patch against ``path`` (shown as a/path and b/path)."""
+        data = self.index.data
+        edits = self._sorted_edits()
+        if not edits:
+            return ""
+        # Group edits whose line regions (with context) touch.
+        regions: List[List[Any]] = []
+        for start, end, text in edits:
+            first = data.rfind(b"\n", 0, start) + 1
+            last = data.find(b"\n", end)
+            last = len(data) if last < 0 else last + 1
+            for _ in range(context):
+                if first > 0:
+                    first = data.rfind(b"\n", 0, first - 1) + 1
+                if last < len(data):
+                    nxt = data.find(b"\n", last)
+                    last = len(data) if nxt < 0 else nxt + 1
+            if regions and first <= regions[-1][1]:
+                regions[-1][1] = max(regions[-1][1], last)
+                regions[-1][2].append((start, end, text))
+            else:
+                regions.append([first, last, [(start, end, text)]])
+
+        out = [f"--- a/{path}\n", f"+++ b/{path}\n"]
+        line = 1
+        counted = 0
+        shift = 0
+        for first, last, region_edits in regions:
+            line += data.count(b"\n", counted, first)
+            counted = first
+            old_bytes = data[first:last]
+            pieces, pos = [], first
+            for start, end, text in region_edits:
+                pieces.append(data[pos:start])
+                pieces.append(text)
+                pos = end
+            pieces.append(data[pos:last])
+            old = old_bytes.decode("utf-8").splitlines(keepends=True)
+            new = b"".join(pieces).decode("utf-8").splitlines(keepends=True)
+            for group in SequenceMatcher(None, old, new, autojunk=False).get_grouped_opcodes(context):
+                i1, i2 = group[0][1], group[-1][2]
+                j1, j2 = group[0][3], group[-1][4]
+                out.append(
+                    f"@@ -{_range(line + i1, i2 - i1)} +{_range(line + shift + j1, j2 - j1)} @@\n"
+                )
+                for tag, a1, a2, b1, b2 in group:
+                    if tag == "equal":
+                        out.extend(_diff_lines(" ", old[a1:a2]))
+                        continue
+                    out.extend(_diff_lines("-", old[a1:a2]))
+                    out.extend(_diff_lines("+", new[b1:b2]))
+            shift += len(new) - len(old)
+        return "".join(out)
+
+
+def _range(start: int, length: int) -> str:
+    if length == 0:
+        start -= 1
+    return f"{start}" if length == 1 else f"{start},{length}"
+
+
+def _diff_lines(prefix: str, lines: List[str]) -> List[str]:
+    result = []
+    for text in lines:
+        if text.endswith("\n"):
+            result.append(prefix + text)
+        else:
+            result.append(prefix + text + "\n\\ No newline at end of file\n")
+    return result
+
+
+def patch_attributes(path: Path, updates: Dict[str, Dict[str, Any]], kind: str = "elements") -> Tuple[bytes, BlueprintPatch, List[str]]:
+    """Patch ``{id: {attribute: value}}`` into the file at ``path``.
+
+    Returns the new bytes, the patch (for :meth:`BlueprintPatch.diff`) and the
+    ids that were not found. Nothing is written.
+    """
+    patch = BlueprintPatch(BlueprintSpanIndex.from_file(path))
+    missing = []
+    for item_id, values in updates.items():
+        try:
+            patch.update_attributes(item_id, values, kind)
+        except KeyError:
+            missing.append(item_id)
+    return patch.apply(), patch, missing
@@ -0,0 +1,270 @@
+"""
+Streaming (incremental) reader for Kumu blueprint JSON files.
+
+:func:`iter_blueprint` reads a blueprint in fixed-size chunks and yields the
+members of the top-level ``elements`` and ``connections`` arrays one at a
+time, so only the object currently being decoded has to be held in memory.
+Other top-level members (``name``, ``source``, ``metadata``, ...) are decoded
+whole and yielded as ``field`` events.
+
+The reader accepts a UTF-8 BOM and, like ``load_blueprint`` in
+``scripts/validate_blueprint.py``, a bare top-level list which is treated as
+a list of connections. Syntax errors raise :class:`BlueprintStreamError`
+carrying the absolute byte offset of the problem.
+"""
+from __future__ import annotations
+
+import io
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional, Union
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+UTF8_BOM = b"\xef\xbb\xbf"
+
+# Event kinds yielded by iter_blueprint().
+START = "start"
+ARRAY = "array"
+ELEMENT = "element"
+CONNECTION = "connection"
+FIELD = "field"
+
+ARRAY_KINDS = {"elements": ELEMENT, "connections": CONNECTION}
+
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+# Everything up to the next bracket, skipping complete strings in one step.
+_SKIP = re.compile(rb'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+_QUOTE, _OPENERS = ord('"'), (ord("{"), ord("["))
+_DECODER = json.JSONDecoder()
+_SCALAR = re.compile(rb"[^,:\]\}\s]+")
+_WHITESPACE = re.compile(rb"[ \t\r\n]*")
+
+Source = Union[str, Path, bytes, BinaryIO]
+
+
+class BlueprintStreamError(ValueError):
+    """Malformed blueprint input; ``offset`` is the absolute byte offset."""
+
+    def __init__(self, message: str, offset: int) -> None:
+        super().__init__(f"{message} (byte offset {offset})")
+        self.message = message
+        self.offset = offset
+
+
+@dataclass
+class StreamEvent:
+    """One item produced by :func:`iter_blueprint`.
+
+    ``kind`` is ``start`` (``value`` is ``"object"``, ``"array"`` or the type
+    name of a top-level scalar), ``array`` (the ``elements``/``connections``
+    array named by ``key`` begins), ``element``/``connection`` (``index`` is
+    the array position) or ``field`` (``key`` names another top-level
+    member). ``offset`` is the byte offset at which the value starts.
+    """
+
+    kind: str
+    value: Any
+    offset: int
+    index: int = -1
+    key: Optional[str] = None
+
+
+class _Reader:
+    """Chunked byte buffer that discards everything before the current item."""
+
+    def __init__(self, handle: BinaryIO, chunk_size: int) -> None:
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.buf = b""
+        self.pos = 0
+        self.base = 0
+        self.eof = False
+        while len(self.buf) < len(UTF8_BOM) and self.fill():
+            pass
+        if self.buf.startswith(UTF8_BOM):
+            self.pos = len(UTF8_BOM)
+
+    @property
+    def offset(self) -> int:
+        return self.base + self.pos
+
+    def fill(self, keep: Optional[int] = None) -> bool:
+        """Read another chunk; bytes before ``keep`` (default: pos) are dropped."""
+        if self.eof:
+            return False
+        keep = self.pos if keep is None else keep
+        if keep:
+            self.buf = self.buf[keep:]
+            self.base += keep
+            self.pos -= keep
+        chunk = self.handle.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def error(self, message: str, offset: Optional[int] = None) -> BlueprintStreamError:
+        return BlueprintStreamError(message, self.offset if offset is None else offset)
+
+    def skip_ws(self) -> None:
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self.fill():
+                return
+
+    def peek(self) -> bytes:
+        self.skip_ws()
+        return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char: bytes, message: str) -> None:
+        if self.peek() != char:
+            raise self.error(message)
+        self.pos += 1
+
+    def _match_to_end(self, pattern: re.Pattern) -> int:
+        """Return the end index of ``pattern`` at pos, reading more data if needed."""
+        while True:
+            match = pattern.match(self.buf, self.pos)
+            if match is not None and (match.end() < len(self.buf) or self.eof):
+                return match.end()
+            if not self.fill():
+                if match is None:
+                    return -1
+                return match.end()
+
+    def _compound_end(self) -> int:
+        depth = 0
+        scan = self.pos
+        while True:
+            scan = _SKIP.match(self.buf, scan).end()
+            if scan < len(self.buf):
+                char = self.buf[scan]
+                if char != _QUOTE:
+                    scan += 1
+                    depth += 1 if char in _OPENERS else -1
+                    if depth == 0:
+                        return scan
+                    continue
+                # A string cut off by the end of the buffer (or never closed).
+                if self.eof:
+                    raise self.error("Unterminated string", self.base + scan)
+            elif self.eof:
+                raise self.error("Unexpected end of data inside value")
+            start = self.pos
+            # At end of input fill() only sets eof; the loop then rescans the tail.
+            self.fill()
+            scan -= start - self.pos
+
+    def read_value(self) -> tuple:
+        """Decode the JSON value at the current position; return (value, offset)."""
+        first = self.peek()
+        if not first:
+            raise self.error("Expecting value")
+        start = self.pos
+        if first in (b"{", b"["):
+            end = self._compound_end()
+        elif first == b'"':
+            end = self._match_to_end(_STRING)
+            if end < 0:
+                raise self.error("Unterminated string")
+        else:
+            end = self._match_to_end(_SCALAR)
+            if end < 0:
+                raise self.error("Expecting value")
+        start = self.pos
+        raw = self.buf[start:end]
+        offset = self.base + start
+        try:
+            text = raw.decode("utf-8")
+        except UnicodeDecodeError as exc:
+            raise BlueprintStreamError("Invalid UTF-8 data", offset + exc.start) from exc
+        try:
+            value, consumed = _DECODER.raw_decode(text)
+            if consumed != len(text):
+                raise json.JSONDecodeError("Extra data", text, consumed)
+        except json.JSONDecodeError as exc:
+            raise BlueprintStreamError(exc.msg, offset + len(text[:exc.pos].encode("utf-8"))) from exc
+        self.pos = end
+        return value, offset
+
+    def read_key(self) -> str:
+        if self.peek() != b'"':
+            raise self.error("Expecting property name enclosed in double quotes")
+        key, _offset = self.read_value()
+        return key
+
+    def iter_array(self) -> Iterator[tuple]:
+        self.expect(b"[", "Expecting '['")
+        if self.peek() == b"]":
+            self.pos += 1
+            return
+        while True:
+            yield self.read_value()
+            char = self.peek()
+            if char == b",":
+                self.pos += 1
+            elif char == b"]":
+                self.pos += 1
+                return
+            else:
+                raise self.error("Expecting ',' delimiter")
+
+
+def _open(source: Source) -> tuple:
+    if isinstance(source, (str, Path)):
+        return Path(source).open("rb"), True
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(bytes(source)), True
+    return source, False
+
+
+def iter_blueprint(source: Source, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[StreamEvent]:
+    """Yield :class:`StreamEvent` items for a blueprint file, bytes or binary handle."""
+    handle, owned = _open(source)
+    try:
+        reader = _Reader(handle, chunk_size)
+        first = reader.peek()
+        if first == b"[":
+            yield StreamEvent(START, "array", reader.offset)
+            yield StreamEvent(ARRAY, None, reader.offset, key="connections")
+            for index, (value, offset) in enumerate(reader.iter_array()):
+                yield StreamEvent(CONNECTION, value, offset, index)
+        elif first == b"{":
+            yield StreamEvent(START, "object", reader.offset)
+            reader.pos += 1
+            if reader.peek() == b"}":
+                reader.pos += 1
+            else:
+                while True:
+                    key = reader.read_key()
+                    reader.expect(b":", "Expecting ':' delimiter")
+                    kind = ARRAY_KINDS.get(key)
+                    if kind is not None and reader.peek() == b"[":
+                        yield StreamEvent(ARRAY, None, reader.offset, key=key)
+                        for index, (value, offset) in enumerate(reader.iter_array()):
+                            yield StreamEvent(kind, value, offset, index)
+                    else:
+                        value, offset = reader.read_value()
+                        yield StreamEvent(FIELD, value, offset, key=key)
+                    char = reader.peek()
+                    if char == b",":
+                        reader.pos += 1
+                    elif char == b"}":
+                        reader.pos += 1
+                        break
+                    else:
+                        raise reader.error("Expecting ',' delimiter")
+        elif not first:
+            raise reader.error("Expecting value")
+        else:
+            value, offset = reader.read_value()
+            yield StreamEvent(START, type(value).__name__, offset)
+            return
+        if reader.peek():
+            raise reader.error("Extra data")
+    finally:
+        if owned:
+            handle.close()
@@ -0,0 +1,359 @@
+"""
+Single-pass validation engine for Kumu blueprint JSON files.
+
+:class:`BlueprintValidator` consumes elements and connections one at a time
+and keeps only hash-based bookkeeping (id sets, degree counters), so every
+object is visited exactly once. It combines
+
+* the structural checks of ``lint_blueprint.lint_blueprint``,
+* reference integrity, degree consistency, duplicate ids, description
+  coverage and source-label checks of the blueprint validators,
+
+and returns everything as one :class:`ValidationResult`. Input can be an
+already parsed blueprint (:func:`validate_blueprint_data`) or a file streamed
+through ``blueprint_stream`` (:func:`validate_blueprint_stream`), in which
+case memory stays bounded by the id bookkeeping. Connections may
+reference elements that appear later in the stream; such references are
+resolved when :meth:`BlueprintValidator.finish` is called, without changing
+the order of the reported findings.
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from blueprint_stream import ARRAY, CONNECTION, DEFAULT_CHUNK_SIZE, ELEMENT, START, Source, iter_blueprint
+
+SUPPORTED_DIRECTIONS = {"directed", "undirected", "mutual"}
+STANDARD_SOURCE_LABELS = {"[A]", "[A?]", "[E]", "[X]", "[O]", "[?]"}
+REQUIRED_ELEMENT_ATTRIBUTES = ("label", "element type")
+
+
+@dataclass
+class ReferenceIssue:
+    """A connection whose `from` and/or `to` does not resolve to an element."""
+
+    connection_id: Any
+    from_id: Any
+    to_id: Any
+    from_ok: bool
+    to_ok: bool
+
+
+@dataclass
+class DegreeMismatch:
+    element_id: str
+    metric: str
+    stored: Any
+    actual: int
+
+
+@dataclass
+class MissingAttribute:
+    element_id: Any
+    label: Any
+    attribute: str
+
+
+@dataclass
+class ValidationResult:
+    element_count: int = 0
+    connection_count: int = 0
+    # Lint findings, kept in the order lint_blueprint has always reported them.
+    structure_errors: List[str] = field(default_factory=list)
+    element_errors: List[str] = field(default_factory=list)
+    new_element_errors: List[str] = field(default_factory=list)
+    connection_errors: List[str] = field(default_factory=list)
+    # Validator findings.
+    reference_issues: List[ReferenceIssue] = field(default_factory=list)
+    degree_mismatches: List[DegreeMismatch] = field(default_factory=list)
+    duplicate_element_ids: Dict[Any, int] = field(default_factory=dict)
+    duplicate_connection_ids: Dict[Any, int] = field(default_factory=dict)
+    missing_attributes: List[MissingAttribute] = field(default_factory=list)
+    missing_descriptions: int = 0
+    nonstandard_labels: int = 0
+
+    @property
+    def lint_errors(self) -> List[str]:
+        return self.structure_errors + self.element_errors + self.new_element_errors + self.connection_errors
+
+    @property
+    def ok(self) -> bool:
+        """True when there are no validator errors (warnings are allowed)."""
+        return not (self.reference_issues or self.duplicate_element_ids or self.duplicate_connection_ids)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form (duplicate id maps become [id, count] pairs)."""
+        data = asdict(self)
+        data["duplicate_element_ids"] = [list(item) for item in self.duplicate_element_ids.items()]
+        data["duplicate_connection_ids"] = [list(item) for item in self.duplicate_connection_ids.items()]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ValidationResult":
+        data = dict(data)
+        data["reference_issues"] = [ReferenceIssue(**item) for item in data.get("reference_issues", [])]
+        data["degree_mismatches"] = [DegreeMismatch(**item) for item in data.get("degree_mismatches", [])]
+        data["missing_attributes"] = [MissingAttribute(**item) for item in data.get("missing_attributes", [])]
+        data["duplicate_element_ids"] = {key: count for key, count in data.get("duplicate_element_ids", [])}
+        data["duplicate_connection_ids"] = {key: count for key, count in data.get("duplicate_connection_ids", [])}
+        return cls(**data)
+
+
+def _hashable(value: Any) -> bool:
+    return isinstance(value, Hashable)
+
+
+def _attributes(obj: Dict[str, Any]) -> Dict[str, Any]:
+    attrs = obj.get("attributes", {})
+    return attrs if isinstance(attrs, dict) else {}
+
+
+class BlueprintValidator:
+    """Incremental validator; feed objects in any order, then call :meth:`finish`."""
+
+    def __init__(self, base_element_ids: Optional[Set[str]] = None) -> None:
+        self.base_element_ids = base_element_ids
+        self.result = ValidationResult()
+
+        # Ids as the linter sees them (non-empty strings) and as the validator
+        # sees them (any `_id` present on an element object).
+        self._lint_ids: Set[str] = set()
+        self._element_ids: Dict[Any, int] = {}
+        self._connection_ids: Dict[Any, int] = {}
+        self._lint_connection_ids: Set[str] = set()
+
+        self._indegree: Dict[Any, int] = {}
+        self._outdegree: Dict[Any, int] = {}
+        self._stored_degrees: List[Tuple[Any, Any, Any, Any]] = []
+
+        # Findings that depend on elements not seen yet. `None` entries in the
+        # finding lists are placeholders filled (or dropped) by finish().
+        self._pending_lint: List[Tuple[int, str, str, str]] = []
+        self._pending_refs: List[Tuple[int, ReferenceIssue]] = []
+        self._connection_errors: List[Optional[str]] = []
+        self._reference_issues: List[Optional[ReferenceIssue]] = []
+
+    # ---------------------------------------------------------------- structure
+    def add_structure_error(self, message: str) -> None:
+        self.result.structure_errors.append(message)
+
+    # ----------------------------------------------------------------- elements
+    def add_element(self, index: int, raw_element: Any) -> None:
+        result = self.result
+        prefix = f"elements[{index}]"
+        if not isinstance(raw_element, dict):
+            result.element_errors.append(f"{prefix}: must be an object.")
+            return
+
+        attributes = raw_element.get("attributes")
+        elem_id = raw_element.get("_id")
+
+        if "_id" in raw_element and _hashable(elem_id):
+            count = self._element_ids.get(elem_id, 0) + 1
+            self._element_ids[elem_id] = count
+            if count > 1:
+                result.duplicate_element_ids[elem_id] = count
+            if elem_id:
+                attrs = _attributes(raw_element)
+                self._stored_degrees.append(
+                    (elem_id, attrs.get("indegree", 0), attrs.get("outdegree", 0), attrs.get("degree", 0))
+                )
+        if "_id" in raw_element:
+            attrs = _attributes(raw_element)
+            for attr in REQUIRED_ELEMENT_ATTRIBUTES:
+                if attr not in attrs:
+                    result.missing_attributes.append(MissingAttribute(elem_id, attrs.get("label", "N/A"), attr))
+
+        if self.base_element_ids is not None and isinstance(elem_id, str) and elem_id not in self.base_element_ids:
+            self._check_new_element(elem_id, attributes)
+
+        if not isinstance(elem_id, str) or not elem_id.strip():
+            result.element_errors.append(f"{prefix}._id must be a non-empty string.")
+            return
+        if elem_id in self._lint_ids:
+            result.element_errors.append(f"{prefix}._id '{elem_id}' is duplicated.")
+        self._lint_ids.add(elem_id)
+
+        if not isinstance(attributes, dict):
+            result.element_errors.append(f"{prefix}.attributes must be an object.")
+        else:
+            label = attributes.get("label")
+            if not isinstance(label, str) or not label.strip():
+                result.element_errors.append(f"{prefix}.attributes.label must be a non-empty string.")
+
+    def _check_new_element(self, elem_id: str, attributes: Any) -> None:
+        if not isinstance(attributes, dict):
+            return
+        missing = []
+        if attributes.get("measurability") is None:
+            missing.append("measurability")
+        if attributes.get("influenceability") is None:
+            missing.append("influenceability")
+        if missing:
+            self.result.new_element_errors.append(
+                f"New element '{elem_id}' missing fields: {', '.join(missing)}. "
+                + "Add values (0/0.5/1) or include 'MISSING_METRICS: measurability=<value_or_NULL>, influenceability=<value_or_NULL>' in the PR description."
+            )
+
+    # -------------------------------------------------------------- connections
+    def add_connection(self, index: int, raw_connection: Any) -> None:
+        prefix = f"connections[{index}]"
+        errors = self._connection_errors
+        if not isinstance(raw_connection, dict):
+            errors.append(f"{prefix}: must be an object.")
+            return
+
+        result = self.result
+        result.connection_count += 1
+        conn_id = raw_connection.get("_id")
+        from_id = raw_connection.get("from")
+        to_id = raw_connection.get("to")
+        attributes = _attributes(raw_connection)
+
+        # Validator bookkeeping: duplicates, reference integrity, degrees.
+        if "_id" in raw_connection and _hashable(conn_id):
+            count = self._connection_ids.get(conn_id, 0) + 1
+            self._connection_ids[conn_id] = count
+            if count > 1:
+                result.duplicate_connection_ids[conn_id] = count
+        issue = ReferenceIssue(
+            raw_connection.get("_id", "UNKNOWN"),
+            from_id,
+            to_id,
+            bool(from_id) and _hashable(from_id) and from_id in self._element_ids,
+            bool(to_id) and _hashable(to_id) and to_id in self._element_ids,
+        )
+        if not (issue.from_ok and issue.to_ok):
+            self._pending_refs.append((len(self._reference_issues), issue))
+            self._reference_issues.append(None)
+        if from_id and to_id and _hashable(from_id) and _hashable(to_id):
+            self._outdegree[from_id] = self._outdegree.get(from_id, 0) + 1
+            self._indegree[to_id] = self._indegree.get(to_id, 0) + 1
+
+        if not attributes.get("description"):
+            result.missing_descriptions += 1
+        label = attributes.get("label", "")
+        if label and isinstance(label, str) and label.strip() not in STANDARD_SOURCE_LABELS:
+            result.nonstandard_labels += 1
+
+        # Lint checks.
+        if not isinstance(conn_id, str) or not conn_id.strip():
+            errors.append(f"{prefix}._id must be a non-empty string.")
+            return
+        if conn_id in self._lint_connection_ids:
+            errors.append(f"{prefix}._id '{conn_id}' is duplicated.")
+        self._lint_connection_ids.add(conn_id)
+
+        for field_name in ("from", "to"):
+            value = raw_connection.get(field_name)
+            if not isinstance(value, str) or not value.strip():
+                errors.append(f"{prefix}.{field_name} must be a non-empty string.")
+            elif value not in self._lint_ids:
+                self._pending_lint.append((len(errors), prefix, field_name, value))
+                errors.append(None)
+
+        direction = raw_connection.get("direction")
+        if direction is not None:
+            if direction not in SUPPORTED_DIRECTIONS:
+                errors.append(
+                    f"{prefix}.direction must be one of {sorted(SUPPORTED_DIRECTIONS)}, got '{direction}'."
+                )
+
+        for flag in ("delayed", "reversed"):
+            value = raw_connection.get(flag)
+            if value is not None and not isinstance(value, bool):
+                errors.append(f"{prefix}.{flag} must be boolean if provided.")
+
+        raw_attributes = raw_connection.get("attributes")
+        if raw_attributes is not None and not isinstance(raw_attributes, dict):
+            errors.append(f"{prefix}.attributes must be an object when present.")
+
+    # ------------------------------------------------------------------- finish
+    def finish(self) -> ValidationResult:
+        result = self.result
+        result.element_count = len(self._element_ids)
+
+        for slot, prefix, field_name, value in self._pending_lint:
+            if value not in self._lint_ids:
+                self._connection_errors[slot] = f"{prefix}.{field_name} references unknown element id '{value}'."
+        result.connection_errors = [msg for msg in self._connection_errors if msg is not None]
+
+        for slot, issue in self._pending_refs:
+            issue.from_ok = bool(issue.from_id) and _hashable(issue.from_id) and issue.from_id in self._element_ids
+            issue.to_ok = bool(issue.to_id) and _hashable(issue.to_id) and issue.to_id in self._element_ids
+            if not (issue.from_ok and issue.to_ok):
+                self._reference_issues[slot] = issue
+        result.reference_issues = [issue for issue in self._reference_issues if issue is not None]
+
+        for elem_id, stored_in, stored_out, stored_deg in self._stored_degrees:
+            actual_in = self._indegree.get(elem_id, 0)
+            actual_out = self._outdegree.get(elem_id, 0)
+            for metric, stored, actual in (
+                ("indegree", stored_in, actual_in),
+                ("outdegree", stored_out, actual_out),
+                ("degree", stored_deg, actual_in + actual_out),
+            ):
+                if stored != actual:
+                    result.degree_mismatches.append(DegreeMismatch(elem_id, metric, stored, actual))
+
+        return result
+
+
+def validate_blueprint_data(data: Any, base_element_ids: Optional[Set[str]] = None) -> ValidationResult:
+    """Validate an already parsed blueprint in a single pass over its objects."""
+    validator = BlueprintValidator(base_element_ids)
+    if not isinstance(data, dict):
+        validator.add_structure_error(f"Top-level JSON must be an object, got {type(data).__name__}")
+        return validator.finish()
+
+    elements = data.get("elements")
+    if not isinstance(elements, list):
+        validator.add_structure_error("Missing or invalid `elements` array.")
+        elements = []
+    connections = data.get("connections")
+    if not isinstance(connections, list):
+        validator.add_structure_error("Missing or invalid `connections` array.")
+        connections = []
+
+    for index, raw_element in enumerate(elements):
+        validator.add_element(index, raw_element)
+    for index, raw_connection in enumerate(connections):
+        validator.add_connection(index, raw_connection)
+    return validator.finish()
+
+
+def validate_blueprint_stream(
+    source: Source,
+    base_element_ids: Optional[Set[str]] = None,
+    allow_bare_list: bool = True,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ValidationResult:
+    """Validate a blueprint file without materializing it.
+
+    Raises ``blueprint_stream.BlueprintStreamError`` on malformed JSON. A bare
+    top-level list is read as connections unless ``allow_bare_list`` is false,
+    in which case it is reported like any other non-object top level.
+    """
+    validator = BlueprintValidator(base_element_ids)
+    arrays: Set[str] = set()
+    for event in iter_blueprint(source, chunk_size):
+        if event.kind == ELEMENT:
+            validator.add_element(event.index, event.value)
+        elif event.kind == CONNECTION:
+            validator.add_connection(event.index, event.value)
+        elif event.kind == ARRAY:
+            arrays.add(event.key)
+        elif event.kind == START and event.value != "object":
+            if event.value == "array" and allow_bare_list:
+                arrays.add("elements")
+                continue
+            got = "list" if event.value == "array" else event.value
+            validator.add_structure_error(f"Top-level JSON must be an object, got {got}")
+            return validator.finish()
+
+    if "elements" not in arrays:
+        validator.add_structure_error("Missing or invalid `elements` array.")
+    if "connections" not in arrays:
+        validator.add_structure_error("Missing or invalid `connections` array.")
+    return validator.finish()
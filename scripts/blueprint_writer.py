@@ -0,0 +1,309 @@
+"""
+Format-preserving, minimal-diff writing of edited blueprints.
+
+:class:`BlueprintDocument` loads a blueprint for editing and keeps the raw
+bytes together with a :class:`blueprint_spans.BlueprintSpanIndex` and a
+pristine decoded copy of every element and connection. Scripts edit
+``document.data`` (or ``document.graph``, which shares its dicts) as before.
+:meth:`BlueprintDocument.render` then compares each element and connection
+with its copy and re-emits only what changed:
+
+* changed attributes and other changed members of an item are replaced in
+  place, new ones are appended in the file's own style,
+* items removed from or inserted into the ``elements``/``connections``
+  arrays are cut out or spliced in (items are aligned by ``_id``),
+* all other bytes are copied from the original buffer, so BOM, line endings,
+  key order and number spelling survive and diffs show only real edits.
+
+Changes the span patch cannot express (top-level members other than the two
+arrays, a file without those arrays) fall back to a full
+``json.dumps(indent=2)``, still keeping BOM and newline style.
+:meth:`BlueprintDocument.save` writes through a temporary file and
+``os.replace``, so readers never see a partial blueprint, and refuses to
+overwrite a file that changed on disk since it was loaded;
+:func:`blueprint_lock` serializes whole load-modify-write cycles. An existing
+``blueprint_manifest`` sidecar next to the file is refreshed on save.
+
+Example::
+
+    document = BlueprintDocument.open(path)
+    document.graph.element("elem-0PyumJeh")["attributes"]["cluster"] = "Mensch"
+    document.save()
+"""
+from __future__ import annotations
+
+import difflib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from blueprint_graph import BlueprintGraph, normalize_blueprint_data
+from blueprint_spans import KINDS, BlueprintPatch, BlueprintSpanIndex, ItemSpans, encode_value
+from blueprint_stream import UTF8_BOM
+
+_MISSING = object()
+
+
+class BlueprintChangedError(RuntimeError):
+    """The blueprint file was rewritten by someone else after it was loaded."""
+
+
+@contextmanager
+def blueprint_lock(path: Union[str, Path], timeout: float = 30.0, poll: float = 0.1) -> Iterator[Path]:
+    """Hold ``<path>.lock`` (created exclusively) for a load-modify-write cycle.
+
+    Works on every platform because it only relies on ``O_EXCL``. A lock left
+    behind by a crashed run has to be removed by hand; the error names it.
+    """
+    lock = Path(path).with_name(Path(path).name + ".lock")
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(str(lock), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"{lock} is held by another run (delete it if that run crashed)") from None
+            time.sleep(poll)
+    try:
+        with os.fdopen(fd, "w") as handle:
+            handle.write(f"{os.getpid()}\n")
+        yield lock
+    finally:
+        try:
+            os.unlink(lock)
+        except OSError:
+            pass
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Replace ``path`` with ``data`` via a temporary file in the same directory."""
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=".tmp-", suffix=path.suffix)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        if path.exists():
+            os.chmod(tmp_name, path.stat().st_mode & 0o777)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def _same(old: Any, new: Any) -> bool:
+    return old == new and isinstance(old, bool) == isinstance(new, bool)
+
+
+def _item_key(position: int, item: Any) -> Tuple[str, Any]:
+    item_id = item.get("_id") if isinstance(item, dict) else None
+    return ("id", item_id) if isinstance(item_id, str) else ("position", position)
+
+
+class BlueprintDocument:
+    def __init__(self, raw: bytes, path: Optional[Path] = None) -> None:
+        self.path = Path(path) if path is not None else None
+        self.data: Dict[str, Any] = normalize_blueprint_data(json.loads(raw.decode("utf-8-sig")))
+        self._graph: Optional[BlueprintGraph] = None
+        self._load(raw)
+
+    def _load(self, raw: bytes) -> None:
+        """Make ``raw`` the baseline that :meth:`render` diffs against."""
+        self.raw = raw
+        self._stat: Optional[Tuple[int, int]] = None
+        if self.path is not None and self.path.exists():
+            stat = self.path.stat()
+            self._stat = (stat.st_size, stat.st_mtime_ns)
+        self.index: Optional[BlueprintSpanIndex]
+        try:
+            self.index = BlueprintSpanIndex(raw, keep_values=True)
+        except ValueError:
+            # Not a blueprint object (e.g. a bare connection list): no span patching.
+            self.index = None
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> "BlueprintDocument":
+        path = Path(path)
+        return cls(path.read_bytes(), path)
+
+    @property
+    def graph(self) -> BlueprintGraph:
+        """Graph view sharing its element and connection dicts with :attr:`data`."""
+        if self._graph is None:
+            self._graph = BlueprintGraph(self.data)
+        return self._graph
+
+    def invalidate_graph(self) -> None:
+        """Rebuild :attr:`graph` on next access, e.g. after adding or removing items."""
+        self._graph = None
+
+    @property
+    def newline(self) -> bytes:
+        return self.index.newline if self.index is not None else b"\n"
+
+    # ------------------------------------------------------------ changes
+    def changed_items(self, kind: str) -> List[int]:
+        """Positions in ``data[kind]`` of items that differ from the loaded file."""
+        original = (self.index.values or {}).get(kind) if self.index is not None else None
+        current = self.data.get(kind)
+        if not isinstance(original, list) or not isinstance(current, list):
+            return list(range(len(current))) if isinstance(current, list) else []
+        originals = {_item_key(i, item): item for i, item in enumerate(original)}
+        return [
+            i for i, item in enumerate(current)
+            if not _same(originals.get(_item_key(i, item), _MISSING), item)
+        ]
+
+    def _patchable(self) -> bool:
+        index = self.index
+        if index is None or index.values is None:
+            return False
+        original = index.values
+        for kind in KINDS:
+            old, new = original.get(kind), self.data.get(kind)
+            if old is None and new is None:
+                continue
+            if kind not in index.arrays or not isinstance(new, list):
+                return False
+            # Items without a span (non-objects) cannot be aligned.
+            if len(index.items[kind]) != len(old):
+                return False
+        rest = {key: value for key, value in self.data.items() if key not in KINDS}
+        return rest == {key: value for key, value in original.items() if key not in KINDS}
+
+    def _patch_item(self, patch: BlueprintPatch, span: ItemSpans, old: Dict[str, Any], new: Any) -> None:
+        index = self.index
+        if not isinstance(new, dict):
+            indent = index.line_indent(span.start)
+            patch.replace(span.start, span.end, encode_value(new, indent, index.newline))
+            return
+        index.resolve(span)
+        old_attrs = old.get("attributes")
+        for name, value in new.items():
+            if name in old and _same(old[name], value):
+                continue
+            if name == "attributes" and isinstance(value, dict) and isinstance(old_attrs, dict) and span.attributes is not None:
+                for attr, attr_value in value.items():
+                    if attr not in old_attrs or not _same(old_attrs[attr], attr_value):
+                        patch.set_member(span.attributes, attr, attr_value)
+                for attr in old_attrs:
+                    if attr not in value:
+                        patch.remove_member(span.attributes, attr)
+            else:
+                patch.set_member(span.object, name, value)
+        for name in old:
+            if name not in new:
+                patch.remove_member(span.object, name)
+
+    def _patch_array(self, patch: BlueprintPatch, kind: str) -> None:
+        index = self.index
+        old: List[Any] = index.values.get(kind) or []
+        new: List[Any] = self.data.get(kind) or []
+        spans = index.items[kind]
+        newline = index.newline
+        if spans:
+            indent = index.line_indent(spans[0].start)
+            separator = index.data[spans[0].end:spans[1].start] if len(spans) > 1 else b"," + newline + indent
+        old_keys = [_item_key(i, item) for i, item in enumerate(old)]
+        new_keys = [_item_key(i, item) for i, item in enumerate(new)]
+        if old_keys == new_keys:
+            blocks = [("equal", 0, len(old), 0, len(new))]
+        else:
+            blocks = SequenceMatcher(None, old_keys, new_keys, autojunk=False).get_opcodes()
+        for tag, i1, i2, j1, j2 in blocks:
+            if tag == "equal":
+                for offset in range(i2 - i1):
+                    before, after = old[i1 + offset], new[j1 + offset]
+                    if not _same(before, after):
+                        self._patch_item(patch, spans[i1 + offset], before, after)
+                continue
+            if i1 == 0 and i2 == len(old):
+                # Nothing of the original array survives (or it was empty).
+                start, end = index.arrays[kind]
+                array_indent = index.line_indent(start)
+                patch.replace(start, end, encode_value(new, array_indent, newline))
+                continue
+            encoded = [encode_value(item, indent, newline) for item in new[j1:j2]]
+            if i1 > 0:
+                start = spans[i1 - 1].end
+                end = spans[i2 - 1].end if i2 > i1 else start
+                patch.replace(start, end, b"".join(separator + text for text in encoded))
+            else:
+                patch.replace(spans[0].start, spans[i2].start, b"".join(text + separator for text in encoded))
+
+    def _patch(self) -> Optional[BlueprintPatch]:
+        if not self._patchable():
+            return None
+        patch = BlueprintPatch(self.index)
+        for kind in KINDS:
+            if self.index.values.get(kind) is not None:
+                self._patch_array(patch, kind)
+        return patch
+
+    def render(self) -> bytes:
+        """The file contents for the current :attr:`data`."""
+        patch = self._patch()
+        return patch.apply() if patch is not None else self._dump()
+
+    def diff(self, label: Optional[str] = None, context: int = 3) -> str:
+        """Unified diff from the loaded file to :meth:`render` ("" if unchanged)."""
+        label = label or (self.path.as_posix() if self.path is not None else "blueprint.json")
+        patch = self._patch()
+        if patch is not None:
+            return patch.diff(label, context)
+        old = self.raw.decode("utf-8").splitlines(keepends=True)
+        new = self._dump().decode("utf-8").splitlines(keepends=True)
+        return "".join(difflib.unified_diff(old, new, f"a/{label}", f"b/{label}", n=context))
+
+    def _dump(self) -> bytes:
+        text = json.dumps(self.data, indent=2, ensure_ascii=False).encode("utf-8")
+        newline = self.newline
+        if newline != b"\n":
+            text = text.replace(b"\n", newline)
+        if self.raw.rstrip(b" \t").endswith(b"\n"):
+            text += newline
+        return (UTF8_BOM if self.raw.startswith(UTF8_BOM) else b"") + text
+
+    def changed_on_disk(self) -> bool:
+        """Whether the file at :attr:`path` no longer holds the loaded bytes."""
+        if self.path is None:
+            return False
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return True
+        if (stat.st_size, stat.st_mtime_ns) == self._stat:
+            return False
+        return self.path.read_bytes() != self.raw
+
+    def save(self, path: Optional[Union[str, Path]] = None, force: bool = False) -> bool:
+        """Write the document atomically; return False (and write nothing) if unchanged.
+
+        Saving over :attr:`path` raises :class:`BlueprintChangedError` when
+        another process rewrote the file since it was loaded, unless ``force``.
+        """
+        target = Path(path) if path is not None else self.path
+        if target is None:
+            raise ValueError("No path to save the blueprint to")
+        data = self.render()
+        if target == self.path:
+            if data == self.raw:
+                return False
+            if not force and self.changed_on_disk():
+                raise BlueprintChangedError(f"{target} was modified since it was loaded; reload and re-apply the edits")
+        write_atomic(target, data)
+        from blueprint_manifest import refresh_sidecar
+
+        refresh_sidecar(target, self.data, data)
+        if target == self.path:
+            self._load(data)
+        return True
+
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Check reference and impact models against the main model they were derived from.
+
+Derived models copy elements and connections from the main model and then
+drift silently. For every derived model this reports:
+
+* ``drift`` - an element whose label or description, or a connection whose
+  polarity (``connection type``), differs from the main model. These are
+  *refreshable*: ``--refresh`` copies the main model's values into the
+  derived model (written as a minimal diff). ``element type`` is not
+  compared by default, since a derived model may reclassify an element on
+  purpose; pass it in ``--element-fields`` to report it, but it is never
+  refreshed.
+* ``endpoints`` - a connection whose id exists in the main model but which
+  links other elements there. Not refreshed automatically.
+* ``orphan`` - a connection between two main-model elements that no longer
+  exists in the main model (matched by id, else by ``from``/``to``).
+
+Elements and connections that only exist in the derived model (e.g. the
+interventions of an impact model) are counted as local and not reported.
+Likewise an attribute the main model does not have (e.g. a description
+written for the reference model) is a ``local`` finding: it is counted (and
+listed with ``--show-local``) but does not fail the model.
+
+The main model is indexed once: per element and connection the tracked
+fields and a digest over them (:func:`blueprint_manifest.content_digest`),
+plus a ``(from, to)`` → connection lookup. A derived item whose digest equals
+the main one needs no field comparison. The index is cached by the main
+model's git blob id, and per-model results are cached (via
+:class:`lint_cache.LintCache`) by derived content, main blob and checker
+version, so a run where neither side changed parses nothing. Models that do
+need checking are processed in parallel (``-j``).
+
+Example::
+
+    python scripts/check_derived_models.py                # all derived models
+    python scripts/check_derived_models.py --refresh models/reference_models/wirkmechanismen-reference-model-wip.json
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from blueprint_cache import REPO_ROOT, cache_dir, load_json_cache, store_json_cache
+from blueprint_graph import normalize_blueprint_data
+from blueprint_manifest import content_digest, discover_blueprints, git_blob_id
+from blueprint_writer import BlueprintDocument
+from lint_cache import LintCache
+
+MAIN_MODEL = REPO_ROOT / "models" / "main_model" / "wirkmechanismen-main-model-blueprint.json"
+DERIVED_DIRS = (REPO_ROOT / "models" / "reference_models", REPO_ROOT / "models" / "impact_models")
+ELEMENT_FIELDS = ("label", "description")
+# Compared when requested, but never overwritten by --refresh.
+REPORT_ONLY_FIELDS = ("element type",)
+CONNECTION_FIELDS = ("connection type",)
+# Bump when the checks change in a way the module source does not reflect.
+CHECK_VERSION = 3
+
+DRIFT = "drift"
+ENDPOINTS = "endpoints"
+ORPHAN = "orphan"
+LOCAL = "local"
+
+
+@dataclass
+class Finding:
+    kind: str
+    item: str
+    id: Optional[str]
+    field: str = ""
+    derived: Any = None
+    main: Any = None
+    # Main-model connection a derived connection was matched to by endpoints.
+    main_id: Optional[str] = None
+    refreshable: bool = False
+    # Set once --refresh has copied the main-model value into the derived model.
+    refreshed: bool = False
+
+    def describe(self) -> str:
+        name = self.id or "<no id>"
+        if self.kind == ORPHAN:
+            return f"orphan connection {name}: {self.derived} no longer connected in the main model"
+        if self.kind == ENDPOINTS:
+            return f"connection {name} links {self.derived} here but {self.main} in the main model"
+        via = f" (main {self.main_id})" if self.main_id and self.main_id != self.id else ""
+        if self.kind == LOCAL:
+            return f"{self.item} {name}{via}: {self.field!r} is {_short(self.derived)}, not set in the main model"
+        return f"{self.item} {name}{via}: {self.field!r} is {_short(self.derived)}, main model has {_short(self.main)}"
+
+
+def _short(value: Any, width: int = 60) -> str:
+    text = repr(value)
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+@dataclass
+class ModelReport:
+    path: Path
+    findings: List[Finding] = field(default_factory=list)
+    elements: int = 0
+    connections: int = 0
+    local_elements: int = 0
+    local_connections: int = 0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.problems
+
+    @property
+    def problems(self) -> List[Finding]:
+        """Findings that fail the model (all but ``local`` ones)."""
+        return [finding for finding in self.findings if finding.kind != LOCAL]
+
+    @property
+    def local(self) -> List[Finding]:
+        return [finding for finding in self.findings if finding.kind == LOCAL]
+
+    @property
+    def refreshable(self) -> List[Finding]:
+        return [finding for finding in self.findings if finding.refreshable]
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["path"] = str(self.path)
+        return data
+
+    @classmethod
+    def from_dict(cls, path: Path, data: Dict[str, Any]) -> "ModelReport":
+        values = {key: value for key, value in data.items() if key not in ("path", "findings")}
+        return cls(path, [Finding(**item) for item in data.get("findings", [])], **values)
+
+
+def _attributes(item: Dict[str, Any]) -> Dict[str, Any]:
+    attrs = item.get("attributes")
+    return attrs if isinstance(attrs, dict) else {}
+
+
+def _tracked(item: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    attrs = _attributes(item)
+    return {name: attrs.get(name) for name in fields}
+
+
+class MainModelIndex:
+    """Tracked fields and their digests for every element and connection of the main model."""
+
+    def __init__(self, entry: Dict[str, Any]) -> None:
+        self.element_fields: Tuple[str, ...] = tuple(entry["element_fields"])
+        self.connection_fields: Tuple[str, ...] = tuple(entry["connection_fields"])
+        # id -> [digest, tracked values]
+        self.elements: Dict[str, List[Any]] = entry["elements"]
+        # id -> [digest, from, to, tracked values]
+        self.connections: Dict[str, List[Any]] = entry["connections"]
+        self.pairs: Dict[Tuple[Any, Any], str] = {}
+        for conn_id, (_digest, source, target, _values) in self.connections.items():
+            self.pairs.setdefault((source, target), conn_id)
+
+    @staticmethod
+    def build_entry(
+        data: Dict[str, Any],
+        element_fields: Sequence[str] = ELEMENT_FIELDS,
+        connection_fields: Sequence[str] = CONNECTION_FIELDS,
+    ) -> Dict[str, Any]:
+        elements: Dict[str, List[Any]] = {}
+        for elem in data.get("elements") or []:
+            elem_id = elem.get("_id") if isinstance(elem, dict) else None
+            if isinstance(elem_id, str) and elem_id not in elements:
+                values = _tracked(elem, element_fields)
+                elements[elem_id] = [content_digest(values).hex(), values]
+        connections: Dict[str, List[Any]] = {}
+        for conn in data.get("connections") or []:
+            conn_id = conn.get("_id") if isinstance(conn, dict) else None
+            if isinstance(conn_id, str) and conn_id not in connections:
+                values = _tracked(conn, connection_fields)
+                connections[conn_id] = [content_digest(values).hex(), conn.get("from"), conn.get("to"), values]
+        return {"element_fields": list(element_fields), "connection_fields": list(connection_fields),
+                "elements": elements, "connections": connections}
+
+    @classmethod
+    def load(
+        cls,
+        path: Path,
+        element_fields: Sequence[str] = ELEMENT_FIELDS,
+        connection_fields: Sequence[str] = CONNECTION_FIELDS,
+        raw: Optional[bytes] = None,
+        use_cache: bool = True,
+    ) -> "MainModelIndex":
+        """Index of the main model at ``path``, cached by blob id and tracked fields."""
+        raw = Path(path).read_bytes() if raw is None else raw
+        key = json.dumps([CHECK_VERSION, git_blob_id(raw), list(element_fields), list(connection_fields)])
+        cache_file = cache_dir("derived-index") / (hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+        entry = load_json_cache(cache_file) if use_cache else None
+        if not isinstance(entry, dict):
+            data = normalize_blueprint_data(json.loads(raw.decode("utf-8-sig")))
+            entry = cls.build_entry(data, element_fields, connection_fields)
+            if use_cache:
+                store_json_cache(cache_file, entry)
+        return cls(entry)
+
+    # ------------------------------------------------------------ checks
+    def _compare(self, report: ModelReport, item: str, item_id: Optional[str], values: Dict[str, Any],
+                 main_values: Dict[str, Any], main_id: Optional[str] = None) -> None:
+        for name, main_value in main_values.items():
+            if values.get(name) == main_value:
+                continue
+            if main_value is None:
+                # The derived model adds the attribute; never refresh it away.
+                report.findings.append(Finding(LOCAL, item, item_id, name, values.get(name), None, main_id))
+            else:
+                report.findings.append(Finding(DRIFT, item, item_id, name, values.get(name), main_value,
+                                               main_id, item_id is not None and name not in REPORT_ONLY_FIELDS))
+
+    def check(self, path: Path, data: Dict[str, Any]) -> ModelReport:
+        """Compare the derived blueprint ``data`` (read from ``path``) with the main model."""
+        report = ModelReport(path)
+        for elem in data.get("elements") or []:
+            if not isinstance(elem, dict):
+                continue
+            report.elements += 1
+            elem_id = elem.get("_id")
+            main = self.elements.get(elem_id) if isinstance(elem_id, str) else None
+            if main is None:
+                report.local_elements += 1
+                continue
+            values = _tracked(elem, self.element_fields)
+            if content_digest(values).hex() != main[0]:
+                self._compare(report, "element", elem_id, values, main[1])
+
+        for conn in data.get("connections") or []:
+            if not isinstance(conn, dict):
+                continue
+            report.connections += 1
+            conn_id = conn.get("_id") if isinstance(conn.get("_id"), str) else None
+            source, target = conn.get("from"), conn.get("to")
+            main_id = conn_id if conn_id in self.connections else self.pairs.get((source, target))
+            if main_id is None:
+                if source in self.elements and target in self.elements:
+                    report.findings.append(Finding(ORPHAN, "connection", conn_id, derived=f"{source} → {target}"))
+                else:
+                    report.local_connections += 1
+                continue
+            digest, main_source, main_target, main_values = self.connections[main_id]
+            if (main_source, main_target) != (source, target):
+                report.findings.append(Finding(ENDPOINTS, "connection", conn_id, derived=f"{source} → {target}",
+                                               main=f"{main_source} → {main_target}", main_id=main_id))
+            values = _tracked(conn, self.connection_fields)
+            if content_digest(values).hex() != digest:
+                self._compare(report, "connection", conn_id, values, main_values, main_id)
+        return report
+
+
+# ------------------------------------------------------------ running
+def checker_fingerprint() -> str:
+    digest = hashlib.sha256(f"derived-v{CHECK_VERSION}".encode("ascii"))
+    digest.update(Path(__file__).read_bytes())
+    return digest.hexdigest()
+
+
+_worker_index: Optional[MainModelIndex] = None
+
+
+def _init_worker(index: MainModelIndex) -> None:
+    global _worker_index
+    _worker_index = index
+
+
+def check_model(path: Path, index: Optional[MainModelIndex] = None) -> ModelReport:
+    index = index or _worker_index
+    assert index is not None
+    try:
+        with path.open("r", encoding="utf-8-sig") as handle:
+            data = normalize_blueprint_data(json.load(handle))
+    except (OSError, ValueError) as exc:
+        return ModelReport(path, error=str(exc))
+    return index.check(path, data)
+
+
+def _run_checks(paths: List[Path], index: MainModelIndex, jobs: int) -> Iterator[ModelReport]:
+    workers = min(jobs, len(paths))
+    if workers > 1:
+        try:
+            # The index is sent to each worker once, not with every model.
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(index,))
+        except (OSError, NotImplementedError):
+            executor = None
+        if executor is not None:
+            with executor:
+                yield from executor.map(check_model, paths)
+            return
+    for path in paths:
+        yield check_model(path, index)
+
+
+def check_many(
+    paths: Sequence[Path],
+    main_path: Path = MAIN_MODEL,
+    jobs: int = 1,
+    cache: Optional[LintCache] = None,
+    element_fields: Sequence[str] = ELEMENT_FIELDS,
+    connection_fields: Sequence[str] = CONNECTION_FIELDS,
+) -> Iterator[ModelReport]:
+    """Check ``paths`` against the main model; reports are yielded in input order."""
+    paths = list(paths)
+    main_raw = main_path.read_bytes()
+    keys: List[Optional[str]] = [None] * len(paths)
+    cached: List[Optional[Dict[str, Any]]] = [None] * len(paths)
+    if cache is not None:
+        options = {"main": git_blob_id(main_raw), "checker": checker_fingerprint(),
+                   "fields": [list(element_fields), list(connection_fields)]}
+        keys = [cache.key(path, options) for path in paths]
+        cached = [cache.get(key) for key in keys]
+
+    misses = [i for i, payload in enumerate(cached) if payload is None]
+    fresh: Iterator[ModelReport] = iter(())
+    if misses:
+        index = MainModelIndex.load(main_path, element_fields, connection_fields, raw=main_raw,
+                                    use_cache=cache is not None)
+        fresh = _run_checks([paths[i] for i in misses], index, jobs)
+    for position, path in enumerate(paths):
+        payload = cached[position]
+        if payload is None:
+            report = next(fresh)
+            if cache is not None and report.error is None:
+                cache.put(keys[position], report.to_dict())
+            yield report
+        else:
+            yield ModelReport.from_dict(path, payload)
+
+
+def refresh_model(report: ModelReport) -> List[Finding]:
+    """Copy the main model's values for every refreshable finding; return the findings applied."""
+    findings = report.refreshable
+    if not findings:
+        return []
+    document = BlueprintDocument.open(report.path)
+    applied: List[Finding] = []
+    for finding in findings:
+        lookup = document.graph.element if finding.item == "element" else document.graph.connection
+        item = lookup(finding.id) if finding.id is not None else None
+        if item is None:
+            continue
+        item.setdefault("attributes", {})[finding.field] = finding.main
+        finding.refreshed = True
+        applied.append(finding)
+    if applied:
+        document.save()
+    return applied
+
+
+def collect_paths(targets: Sequence[Path]) -> List[Path]:
+    files: List[Path] = []
+    for target in targets or DERIVED_DIRS:
+        if target.is_dir():
+            files.extend(discover_blueprints(target))
+        elif target.is_file():
+            files.append(target)
+        else:
+            raise ValueError(f"Path not found: {target}")
+    return files
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check derived (reference/impact) models against the main model.")
+    parser.add_argument("paths", nargs="*", type=Path,
+                        help="Derived model files or directories (default: models/reference_models and models/impact_models)")
+    parser.add_argument("--main", type=Path, default=MAIN_MODEL, help="Main model (default: wirkmechanismen main model)")
+    parser.add_argument("--element-fields", default=",".join(ELEMENT_FIELDS),
+                        help=f"Comma-separated element attributes to compare (default: {','.join(ELEMENT_FIELDS)})")
+    parser.add_argument("--connection-fields", default=",".join(CONNECTION_FIELDS),
+                        help=f"Comma-separated connection attributes to compare (default: {','.join(CONNECTION_FIELDS)})")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Number of models to check in parallel (defaults to the number of CPU cores)")
+    parser.add_argument("--refresh", action="store_true", help="Copy main-model values into drifted items")
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+    parser.add_argument("--show-local", action="store_true",
+                        help="Also list attributes the main model does not set")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write caches in .blueprint_cache/")
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        print("Error: --jobs must be at least 1", file=sys.stderr)
+        return 2
+    try:
+        paths = [path for path in collect_paths(args.paths) if path.resolve() != args.main.resolve()]
+        reports = list(check_many(
+            paths, args.main, args.jobs,
+            cache=None if args.no_cache else LintCache(cache_dir("derived")),
+            element_fields=[name.strip() for name in args.element_fields.split(",") if name.strip()],
+            connection_fields=[name.strip() for name in args.connection_fields.split(",") if name.strip()],
+        ))
+    except (OSError, ValueError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 2
+
+    failed = False
+    for report in reports:
+        if args.refresh and report.error is None:
+            refresh_model(report)
+        remaining = [finding for finding in report.problems if not finding.refreshed]
+        if report.error is not None or remaining:
+            failed = True
+        if args.json:
+            continue
+        local_items = [f"{report.local_elements} local elements, {report.local_connections} local connections"] \
+            if report.local_elements or report.local_connections else []
+        if report.local:
+            local_items.append(f"{len(report.local)} local values")
+        local = "".join(f", {item}" for item in local_items)
+        if report.error is not None:
+            print(f"FAIL {report.path}\n  - {report.error}")
+        elif report.ok:
+            print(f"OK   {report.path}{f' ({local[2:]})' if local else ''}")
+        else:
+            counts = ", ".join(f"{sum(f.kind == kind for f in report.findings)} {kind}"
+                               for kind in (DRIFT, ENDPOINTS, ORPHAN) if any(f.kind == kind for f in report.findings))
+            print(f"{'FIXED' if not remaining else 'FAIL'} {report.path} ({counts}, "
+                  f"{len(report.refreshable)} refreshable{local})")
+            for finding in report.problems:
+                print(f"  {'✓' if finding.refreshed else '-'} {finding.describe()}")
+        if args.show_local:
+            for finding in report.local:
+                print(f"  · {finding.describe()}")
+        sys.stdout.flush()
+    if args.json:
+        # After the refresh, so ``refreshed`` tells which findings were applied.
+        print(json.dumps([report.to_dict() for report in reports], ensure_ascii=False, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,112 +1,139 @@
 import argparse
-import json
-import re
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
 
+from blueprint_graph import load_blueprint
+from theory_classifier import Classification
+from theory_registry import TheoryIndex, TheoryRegistry, default_registry
 
-KT_KEYWORDS = [
-    r"koordin",
-    r"okhuysen",
-    r"bechky",
-    r"dings[øo]yr",
-    r"accountability",
-    r"predictability",
-    r"common understanding",
-    r"boundary\s*spann",
-    r"selbstkoordination",
-]
-
-MRT_KEYWORDS = [
-    r"media\s*richness",
-    r"\bmrt\b",
-    r"daft",
-    r"lengel",
-    r"schmidt",
-    r"ishii",
-    r"medienreich",
-    r"channel\s*expansion",
-    r"carlson",
-    r"zmud",
-    r"equivocality",
-    r"mehrdeutigkeit",
-    r"medium-aufgabe-passung",
-]
-
-
-def find_elem_ids_in_markdown(path: Path) -> Set[str]:
-    if not path.exists():
-        return set()
-    text = path.read_text(encoding="utf-8", errors="replace")
-    return set(re.findall(r"elem-[A-Za-z0-9]+", text))
-
-
-def text_blob_for_element(elem: dict) -> str:
-    attrs = elem.get("attributes", {})
-    tags = attrs.get("tags", [])
-    if not isinstance(tags, list):
-        tags = [str(tags)]
-    parts = [
-        elem.get("_id", ""),
-        attrs.get("label", ""),
-        attrs.get("description", ""),
-        " ".join(str(t) for t in tags),
-    ]
-    return "\n".join(parts)
-
-
-def text_blob_for_connection(conn: dict) -> str:
-    attrs = conn.get("attributes", {})
-    parts = [
-        conn.get("_id", ""),
-        attrs.get("label", ""),
-        attrs.get("description", ""),
-        attrs.get("connection type", ""),
-    ]
-    return "\n".join(parts)
 
-
-def match_keywords(text: str, patterns: List[str]) -> Set[str]:
-    lowered = text.casefold()
-    hits = set()
-    for pat in patterns:
-        if re.search(pat, lowered, flags=re.IGNORECASE):
-            hits.add(pat)
-    return hits
+def theory_matches(classification: Classification) -> Tuple[Set[str], Dict[str, List[str]]]:
+    return classification.theories, {k: list(v) for k, v in classification.matches.items()}
 
 
 def theory_from_text(text: str) -> Tuple[Set[str], Dict[str, List[str]]]:
-    matches = {"KT": sorted(match_keywords(text, KT_KEYWORDS)), "MRT": sorted(match_keywords(text, MRT_KEYWORDS))}
-    theories = set(k for k, v in matches.items() if v)
-    return theories, matches
+    return theory_matches(default_registry().classifier().classify_text(text))
 
 
 def theory_label(theories: Set[str]) -> str:
-    if theories == {"KT", "MRT"}:
-        return "KT+MRT"
-    if theories == {"KT"}:
-        return "KT"
-    if theories == {"MRT"}:
-        return "MRT"
-    return ""
+    return "+".join(sorted(theories))
+
+
+class ColumnWidths:
+    """Longest text per column, fed row by row while the rows are built."""
+
+    def __init__(self, headers: Sequence[Any] = (), min_width: int = 10, max_width: int = 70):
+        self.min_width = min_width
+        self.max_width = max_width
+        self.max_len: List[int] = []
+        self.observe(headers)
+
+    def observe(self, values: Sequence[Any]) -> None:
+        if len(values) > len(self.max_len):
+            self.max_len.extend([0] * (len(values) - len(self.max_len)))
+        for col, value in enumerate(values):
+            length = 0 if value is None else len(str(value))
+            if length > self.max_len[col]:
+                self.max_len[col] = length
+
+    def apply(self, ws) -> None:
+        for col, max_len in enumerate(self.max_len, start=1):
+            ws.column_dimensions[get_column_letter(col)].width = max(self.min_width, min(self.max_width, max_len + 2))
+
+
+def row_values(row: Dict[str, Any], headers: Sequence[str]) -> List[Any]:
+    return [row.get(k, "") for k in headers]
+
+
+def write_sheet(
+    wb: Workbook,
+    title: str,
+    rows: Iterable[Sequence[Any]],
+    widths: ColumnWidths,
+    headers: Optional[Sequence[str]] = None,
+    bold_first_row: bool = False,
+) -> None:
+    """Append a sheet to ``wb`` and write ``rows`` into it.
+
+    Widths are applied before any row is written, as write-only worksheets
+    require. With ``headers`` the sheet gets a bold header row, frozen panes
+    and an auto filter over all written rows.
+    """
+    ws = wb.create_sheet(title)
+    widths.apply(ws)
+    bold = Font(bold=True)
+    if wb.write_only:
+        def styled(values: Sequence[Any]) -> List[Any]:
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.font = bold
+                cells.append(cell)
+            return cells
+    else:
+        styled = None
+
+    count = 0
+    if headers is not None:
+        ws.freeze_panes = "A2"
+        ws.append(styled(headers) if styled else list(headers))
+        count += 1
+    for values in rows:
+        if count == 0 and bold_first_row and styled:
+            values = styled(values)
+        ws.append(values)
+        count += 1
+    if not wb.write_only and (headers is not None or bold_first_row) and count:
+        for cell in ws[1]:
+            cell.font = bold
+    if headers is not None:
+        ws.auto_filter.ref = f"A1:{get_column_letter(len(headers))}{count}"
+
+
+def match_column(theory_id: str) -> str:
+    return f"{theory_id.lower()}_match"
+
+
+def factor_headers(theories: TheoryRegistry) -> List[str]:
+    return [
+        "element_id",
+        "label",
+        "element_type",
+        "theory_basis",
+        *(match_column(t.id) for t in theories),
+        *(f"in_{t.slug}_coverage_doc" for t in theories),
+        "tags",
+        "measurability",
+        "influenceability",
+        "degree",
+        "indegree",
+        "outdegree",
+        "description",
+    ]
 
 
-def autosize(ws, min_width: int = 10, max_width: int = 70):
-    for col_cells in ws.columns:
-        max_len = 0
-        col = col_cells[0].column
-        for c in col_cells:
-            value = "" if c.value is None else str(c.value)
-            max_len = max(max_len, len(value))
-        ws.column_dimensions[get_column_letter(col)].width = max(min_width, min(max_width, max_len + 2))
+def connection_headers(theories: TheoryRegistry) -> List[str]:
+    return [
+        "connection_id",
+        "from_id",
+        "from_label",
+        "to_id",
+        "to_label",
+        "theory_basis",
+        "connection_type",
+        "source_label",
+        *(match_column(t.id) for t in theories),
+        "description",
+    ]
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Export KT/MRT-related factors and connections to Excel.")
+    parser = argparse.ArgumentParser(description="Export theory-related factors and connections to Excel.")
     parser.add_argument(
         "--model",
         default="models/main_model/wirkmechanismen-main-model-blueprint.json",
@@ -117,42 +144,70 @@ def main():
         default="theory_subset_koordination_mrt.xlsx",
         help="Output .xlsx file",
     )
+    parser.add_argument(
+        "--theory",
+        action="append",
+        help="Theory id from general/theories (repeatable; default: all)",
+    )
+    parser.add_argument(
+        "--full-model",
+        action="store_true",
+        help="Export all elements and connections, not only the theory-related Einflussfaktoren",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Write with a write-only workbook (no cell objects are kept in memory)",
+    )
     args = parser.parse_args()
 
     repo = Path(__file__).resolve().parents[1]
     model_path = (repo / args.model).resolve()
     out_path = (repo / args.out).resolve()
 
-    koord_doc_ids = find_elem_ids_in_markdown(repo / "KOORDINATIONSTHEORIE_COVERAGE_ANALYSIS.md")
-    mrt_doc_ids = find_elem_ids_in_markdown(repo / "MEDIA_RICHNESS_THEORY_COVERAGE_ANALYSIS.md")
-
-    data = json.loads(model_path.read_text(encoding="utf-8"))
-    elements = data.get("elements", [])
-    connections = data.get("connections", [])
-
-    element_by_id = {e.get("_id"): e for e in elements}
+    registry = default_registry()
+    try:
+        theories_used = registry.select(args.theory) if args.theory else registry
+    except KeyError as exc:
+        parser.error(str(exc.args[0]))
+    theory_ids = theories_used.ids
+    coverage_ids = {theory_id: registry.coverage_ids(theory_id) for theory_id in theory_ids}
+    factor_columns = factor_headers(theories_used)
+    connection_columns = connection_headers(theories_used)
+
+    # The index covers every registered theory so that exports of different
+    # theory subsets share it.
+    theory_index = TheoryIndex.open(registry, [model_path])
+    classifier = registry.classifier()
+    graph = load_blueprint(model_path)
 
     selected_factors: List[dict] = []
     selected_ids: Set[str] = set()
     element_theory: Dict[str, Set[str]] = {}
-
-    for elem in elements:
-        elem_id = elem.get("_id", "")
+    factor_widths = ColumnWidths(factor_columns)
+
+    if args.full_model:
+        element_indices = range(len(graph.elements))
+    else:
+        element_indices = graph.elements_of_type("Einflussfaktoren")
+    for index in element_indices:
+        elem = graph.elements[index]
+        elem_id = graph.element_ids[index]
         attrs = elem.get("attributes", {})
-        if attrs.get("element type") != "Einflussfaktoren":
-            continue
 
-        text = text_blob_for_element(elem)
-        theories, matches = theory_from_text(text)
+        if isinstance(elem_id, str):
+            found = theory_index.matches(model_path, elem_id)
+        else:
+            found = classifier.classify_element(elem).matches
+        matches = {theory_id: list(found.get(theory_id, ())) for theory_id in theory_ids}
+        theories = {theory_id for theory_id in theory_ids if matches[theory_id]}
 
-        if elem_id in koord_doc_ids:
-            theories.add("KT")
-            matches.setdefault("KT", []).append("coverage_doc_id")
-        if elem_id in mrt_doc_ids:
-            theories.add("MRT")
-            matches.setdefault("MRT", []).append("coverage_doc_id")
+        for theory_id in theory_ids:
+            if elem_id in coverage_ids[theory_id]:
+                theories.add(theory_id)
+                matches[theory_id].append("coverage_doc_id")
 
-        if not theories:
+        if not theories and not args.full_model:
             continue
 
         selected_ids.add(elem_id)
@@ -162,128 +217,106 @@ def main():
         if not isinstance(tags, list):
             tags = [str(tags)]
 
-        selected_factors.append(
-            {
-                "element_id": elem_id,
-                "label": attrs.get("label", ""),
-                "element_type": attrs.get("element type", ""),
-                "theory_basis": theory_label(theories),
-                "kt_match": ", ".join(sorted(set(matches.get("KT", [])))),
-                "mrt_match": ", ".join(sorted(set(matches.get("MRT", [])))),
-                "in_koordination_coverage_doc": "yes" if elem_id in koord_doc_ids else "no",
-                "in_mrt_coverage_doc": "yes" if elem_id in mrt_doc_ids else "no",
-                "tags": " | ".join(str(t) for t in tags),
-                "measurability": attrs.get("measurability"),
-                "influenceability": attrs.get("influenceability"),
-                "degree": attrs.get("degree"),
-                "indegree": attrs.get("indegree"),
-                "outdegree": attrs.get("outdegree"),
-                "description": attrs.get("description", ""),
-            }
-        )
+        row = {
+            "element_id": elem_id,
+            "label": attrs.get("label", ""),
+            "element_type": attrs.get("element type", ""),
+            "theory_basis": theory_label(theories),
+            **{match_column(t): ", ".join(sorted(set(matches[t]))) for t in theory_ids},
+            **{f"in_{t.slug}_coverage_doc": "yes" if elem_id in coverage_ids[t.id] else "no" for t in theories_used},
+            "tags": " | ".join(str(t) for t in tags),
+            "measurability": attrs.get("measurability"),
+            "influenceability": attrs.get("influenceability"),
+            "degree": graph.indegree[index] + graph.outdegree[index],
+            "indegree": graph.indegree[index],
+            "outdegree": graph.outdegree[index],
+            "description": attrs.get("description", ""),
+        }
+        factor_widths.observe(row_values(row, factor_columns))
+        selected_factors.append(row)
 
     selected_factors.sort(key=lambda r: (r["theory_basis"], r["label"]))
 
     selected_connections: List[dict] = []
-    for conn in connections:
+    conn_widths = ColumnWidths(connection_columns)
+    for conn_index, conn in enumerate(graph.connections):
         from_id = conn.get("from")
         to_id = conn.get("to")
 
-        if from_id not in selected_ids or to_id not in selected_ids:
+        if not args.full_model and (from_id not in selected_ids or to_id not in selected_ids):
             continue
 
-        from_elem = element_by_id.get(from_id, {})
-        to_elem = element_by_id.get(to_id, {})
-        from_label = from_elem.get("attributes", {}).get("label", "")
-        to_label = to_elem.get("attributes", {}).get("label", "")
+        from_label = graph.label(graph.conn_source[conn_index])
+        to_label = graph.label(graph.conn_target[conn_index])
 
-        conn_text = text_blob_for_connection(conn)
-        conn_theories, conn_matches = theory_from_text(conn_text)
+        conn_matches = classifier.classify_connection(conn).matches
+        conn_theories = {theory_id for theory_id in theory_ids if conn_matches.get(theory_id)}
 
         conn_theories = conn_theories.union(element_theory.get(from_id, set())).union(element_theory.get(to_id, set()))
 
         attrs = conn.get("attributes", {})
-        selected_connections.append(
-            {
-                "connection_id": conn.get("_id", ""),
-                "from_id": from_id,
-                "from_label": from_label,
-                "to_id": to_id,
-                "to_label": to_label,
-                "theory_basis": theory_label(conn_theories),
-                "connection_type": attrs.get("connection type", ""),
-                "source_label": attrs.get("label", ""),
-                "kt_match": ", ".join(sorted(set(conn_matches.get("KT", [])))),
-                "mrt_match": ", ".join(sorted(set(conn_matches.get("MRT", [])))),
-                "description": attrs.get("description", ""),
-            }
-        )
+        row = {
+            "connection_id": conn.get("_id", ""),
+            "from_id": from_id,
+            "from_label": from_label,
+            "to_id": to_id,
+            "to_label": to_label,
+            "theory_basis": theory_label(conn_theories),
+            "connection_type": attrs.get("connection type", ""),
+            "source_label": attrs.get("label", ""),
+            **{match_column(t): ", ".join(sorted(set(conn_matches.get(t, ())))) for t in theory_ids},
+            "description": attrs.get("description", ""),
+        }
+        conn_widths.observe(row_values(row, connection_columns))
+        selected_connections.append(row)
 
     selected_connections.sort(key=lambda r: (r["theory_basis"], r["from_label"], r["to_label"]))
-
-    wb = Workbook()
-
-    ws_f = wb.active
-    ws_f.title = "Einflussfaktoren"
-    factor_headers = [
-        "element_id",
-        "label",
-        "element_type",
-        "theory_basis",
-        "kt_match",
-        "mrt_match",
-        "in_koordination_coverage_doc",
-        "in_mrt_coverage_doc",
-        "tags",
-        "measurability",
-        "influenceability",
-        "degree",
-        "indegree",
-        "outdegree",
-        "description",
+    classifier.save()
+
+    try:
+        model_name = str(model_path.relative_to(repo))
+    except ValueError:
+        model_name = str(model_path)
+    if args.full_model:
+        factor_sheet = "Elemente"
+        meta_counts = [
+            ["Elemente gesamt (vollständiges Modell)", len(selected_factors)],
+            ["Verbindungen gesamt (vollständiges Modell)", len(selected_connections)],
+        ]
+    else:
+        factor_sheet = "Einflussfaktoren"
+        meta_counts = [
+            ["Faktoren gesamt (Einflussfaktoren, theoriebezogen)", len(selected_factors)],
+            ["Verbindungen zwischen theoriebezogenen Einflussfaktoren", len(selected_connections)],
+        ]
+    meta_rows = [
+        ["Analysebasis", model_name],
+        *meta_counts,
+        *([f"{t.name}-Orientierung", "; ".join(t.literature)] for t in theories_used),
+        ["Zusatzquelle im Repo", ", ".join(doc for t in theories_used for doc in t.coverage_docs)],
     ]
-    ws_f.append(factor_headers)
-    for h in ws_f[1]:
-        h.font = Font(bold=True)
-    for row in selected_factors:
-        ws_f.append([row.get(k, "") for k in factor_headers])
-    ws_f.freeze_panes = "A2"
-    ws_f.auto_filter.ref = ws_f.dimensions
-    autosize(ws_f)
-
-    ws_c = wb.create_sheet("Verbindungen")
-    conn_headers = [
-        "connection_id",
-        "from_id",
-        "from_label",
-        "to_id",
-        "to_label",
-        "theory_basis",
-        "connection_type",
-        "source_label",
-        "kt_match",
-        "mrt_match",
-        "description",
-    ]
-    ws_c.append(conn_headers)
-    for h in ws_c[1]:
-        h.font = Font(bold=True)
-    for row in selected_connections:
-        ws_c.append([row.get(k, "") for k in conn_headers])
-    ws_c.freeze_panes = "A2"
-    ws_c.auto_filter.ref = ws_c.dimensions
-    autosize(ws_c)
-
-    ws_m = wb.create_sheet("Meta")
-    ws_m.append(["Analysebasis", str(model_path.relative_to(repo))])
-    ws_m.append(["Faktoren gesamt (Einflussfaktoren, theoriebezogen)", len(selected_factors)])
-    ws_m.append(["Verbindungen zwischen theoriebezogenen Einflussfaktoren", len(selected_connections)])
-    ws_m.append(["Koordinationstheorie-Orientierung", "Okhuysen & Bechky (2009); Dingsøyr et al. (2018)"])
-    ws_m.append(["Media Richness Orientierung", "Daft & Lengel (1986); Schmidt et al. (2017); Ishii et al. (2019)"])
-    ws_m.append(["Zusatzquelle im Repo", "KOORDINATIONSTHEORIE_COVERAGE_ANALYSIS.md, MEDIA_RICHNESS_THEORY_COVERAGE_ANALYSIS.md"])
-    for h in ws_m[1]:
-        h.font = Font(bold=True)
-    autosize(ws_m)
+    meta_widths = ColumnWidths()
+    for values in meta_rows:
+        meta_widths.observe(values)
+
+    wb = Workbook(write_only=args.streaming)
+    if not args.streaming:
+        wb.remove(wb.active)
+    write_sheet(
+        wb,
+        factor_sheet,
+        (row_values(row, factor_columns) for row in selected_factors),
+        factor_widths,
+        headers=factor_columns,
+    )
+    write_sheet(
+        wb,
+        "Verbindungen",
+        (row_values(row, connection_columns) for row in selected_connections),
+        conn_widths,
+        headers=connection_columns,
+    )
+    write_sheet(wb, "Meta", meta_rows, meta_widths, bold_first_row=True)
 
     wb.save(out_path)
 
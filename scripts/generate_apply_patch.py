@@ -1,61 +1,34 @@
 import json
+import sys
 from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from blueprint_spans import BlueprintPatch, BlueprintSpanIndex
+
 repo = Path(__file__).resolve().parents[1]
 blueprint_path = repo / 'models' / 'main_model' / 'wirkmechanismen-main-model-blueprint.json'
 mapping_path = repo / 'mapping_result.json'
 if not mapping_path.exists():
     print('MAPPING_MISSING')
     raise SystemExit(2)
-with mapping_path.open('r', encoding='utf-8', errors='replace') as fh:
-    mapping = json.load(fh)
-with blueprint_path.open('r', encoding='utf-8') as fh:
-    lines = fh.readlines()
+raw = mapping_path.read_bytes()
+# mapping_result.json may come from a PowerShell redirect (UTF-16 with BOM)
+encoding = 'utf-16' if raw[:2] in (b'\xff\xfe', b'\xfe\xff') else 'utf-8-sig'
+mapping = json.loads(raw.decode(encoding))
 
-updates = mapping.get('updates', [])
-patch_parts = []
-for upd in updates:
+index = BlueprintSpanIndex.from_file(blueprint_path)
+patch = BlueprintPatch(index)
+changed = 0
+for upd in mapping.get('updates', []):
     eid = upd['_id']
-    meas = upd.get('measurability')
-    infl = upd.get('influenceability')
-    # find the block for this element by searching for the id line
-    id_line = f'      "_id": "{eid}",\n'
+    values = {key: upd[key] for key in ('measurability', 'influenceability') if upd.get(key) is not None}
     try:
-        idx = lines.index(id_line)
-    except ValueError:
-        # fallback: search any line containing the id
-        idx = None
-        for i,l in enumerate(lines):
-            if f'"_id": "{eid}"' in l:
-                idx = i
-                break
-        if idx is None:
-            print('ID_NOT_FOUND', eid)
-            continue
-    # we want to find the lines within the attributes block where micmac exposure and measurability occur
-    # search forward from idx for the sequence '"micmac exposure"'
-    mi = None
-    for j in range(idx, idx+80):
-        if j < len(lines) and '"micmac exposure"' in lines[j]:
-            mi = j
-            break
-    if mi is None:
-        print('MICMAC_NOT_FOUND', eid)
-        continue
-    # assume lines mi, mi+1, mi+2 correspond to micmac exposure, measurability, influenceability
-    old_block = ''.join(lines[mi:mi+3])
-    new_block = f'        "micmac exposure": 0,\n        "measurability": {meas if meas is not None else "null"},\n        "influenceability": {infl if infl is not None else "null"}\n'
-    # context: include 3 lines before and after
-    pre_ctx = ''.join(lines[max(0, mi-3):mi])
-    post_ctx = lines[mi+3] if mi+3 < len(lines) else ''
-    part = f"@@\n{pre_ctx}-{old_block}+{new_block}{post_ctx}\n"
-    patch_parts.append(part)
+        changed += patch.update_attributes(eid, values)
+    except KeyError:
+        print('ID_NOT_FOUND', eid)
 
-# assemble full patch
-patch = ['*** Begin Patch\n', f'*** Update File: {str(blueprint_path)}\n']
-for p in patch_parts:
-    patch.append(p)
-patch.append('\n*** End Patch\n')
 out = repo / 'generated_patch.txt'
-with out.open('w', encoding='utf-8') as fh:
-    fh.write(''.join(patch))
+with out.open('w', encoding='utf-8', newline='') as fh:
+    fh.write(patch.diff(blueprint_path.relative_to(repo).as_posix()))
+print('CHANGED', changed)
 print('WROTE', out)
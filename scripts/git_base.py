@@ -0,0 +1,196 @@
+"""
+Batched retrieval of base versions (default ``origin/main``) of blueprints.
+
+``--require-metrics-for-new`` needs the element ids each blueprint had on the
+base branch. Instead of one ``git show`` per file, :class:`BaseVersionProvider`
+answers all files with a constant number of git calls:
+
+1. ``git ls-tree`` resolves the base blob SHA of every file,
+2. ``git hash-object`` hashes the working-tree files; files whose blob equals
+   the base blob are reported as unchanged and never parsed,
+3. one ``git cat-file --batch`` session streams the remaining base blobs.
+
+Extracted id sets are cached on disk keyed by blob SHA, so a base blob is only
+ever parsed once.
+"""
+from __future__ import annotations
+
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+from blueprint_cache import REPO_ROOT, cache_dir, load_json_cache, store_json_cache
+from blueprint_stream import ELEMENT, BlueprintStreamError, iter_blueprint
+
+BASE_REF = "origin/main"
+
+# BaseVersion.status values.
+UNCHANGED = "unchanged"
+CHANGED = "changed"
+UNAVAILABLE = "unavailable"
+
+
+@dataclass(frozen=True)
+class BaseVersion:
+    """Base-branch state of one blueprint.
+
+    ``element_ids`` is only set for ``CHANGED`` files. ``UNAVAILABLE`` covers
+    files outside the repository, files missing on the base branch and
+    base blobs that cannot be parsed.
+    """
+
+    status: str
+    element_ids: Optional[FrozenSet[str]] = None
+    blob: Optional[str] = None
+
+
+class GitCatFileBatch:
+    """A single long-running ``git cat-file --batch`` process."""
+
+    def __init__(self, repo_root: Path = REPO_ROOT) -> None:
+        self._proc = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=str(repo_root),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def read(self, spec: str) -> Optional[bytes]:
+        """Return the raw content of object ``spec`` or None if it does not exist."""
+        assert self._proc.stdin is not None and self._proc.stdout is not None
+        self._proc.stdin.write(spec.encode("utf-8") + b"\n")
+        self._proc.stdin.flush()
+        header = self._proc.stdout.readline()
+        if not header or header.rstrip().endswith(b" missing") or header.rstrip().endswith(b" ambiguous"):
+            return None
+        size = int(header.split()[2])
+        content = self._proc.stdout.read(size)
+        self._proc.stdout.read(1)  # trailing newline
+        return content
+
+    def close(self) -> None:
+        if self._proc.stdin is not None:
+            self._proc.stdin.close()
+        if self._proc.stdout is not None:
+            self._proc.stdout.close()
+        self._proc.wait()
+
+    def __enter__(self) -> "GitCatFileBatch":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def _git(args: Sequence[str], repo_root: Path) -> Optional[bytes]:
+    try:
+        proc = subprocess.run(
+            ["git", *args],
+            cwd=str(repo_root),
+            check=True,
+            capture_output=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return proc.stdout
+
+
+def extract_element_ids(content: bytes) -> Optional[FrozenSet[str]]:
+    """Collect element ids from raw blueprint bytes without building the tree."""
+    ids = set()
+    try:
+        for event in iter_blueprint(content):
+            if event.kind == ELEMENT and isinstance(event.value, dict):
+                elem_id = event.value.get("_id")
+                if isinstance(elem_id, str):
+                    ids.add(elem_id)
+    except BlueprintStreamError:
+        return None
+    return frozenset(ids)
+
+
+class BaseVersionProvider:
+    def __init__(self, repo_root: Path = REPO_ROOT, ref: str = BASE_REF, use_cache: bool = True) -> None:
+        self.repo_root = repo_root
+        self.ref = ref
+        self.cache_dir = cache_dir("base-ids") if use_cache else None
+
+    def _relative(self, path: Path) -> Optional[str]:
+        try:
+            return path.resolve().relative_to(self.repo_root).as_posix()
+        except ValueError:
+            return None
+
+    def _base_blobs(self, rel_paths: List[str]) -> Dict[str, str]:
+        if not rel_paths:
+            return {}
+        output = _git(["ls-tree", "-z", self.ref, "--", *rel_paths], self.repo_root)
+        blobs: Dict[str, str] = {}
+        for record in (output or b"").split(b"\0"):
+            if not record:
+                continue
+            meta, _, name = record.partition(b"\t")
+            parts = meta.split()
+            if len(parts) == 3 and parts[1] == b"blob":
+                blobs[name.decode("utf-8")] = parts[2].decode("ascii")
+        return blobs
+
+    def _working_blobs(self, paths: List[Path]) -> List[Optional[str]]:
+        if not paths:
+            return []
+        output = _git(["hash-object", "--", *(str(p) for p in paths)], self.repo_root)
+        shas = (output or b"").decode("ascii").split()
+        if len(shas) != len(paths):
+            return [None] * len(paths)
+        return list(shas)
+
+    def _cached_ids(self, blob: str) -> Optional[FrozenSet[str]]:
+        if self.cache_dir is None:
+            return None
+        cached = load_json_cache(self.cache_dir / f"{blob}.json")
+        return frozenset(cached) if isinstance(cached, list) else None
+
+    def _store_ids(self, blob: str, ids: FrozenSet[str]) -> None:
+        if self.cache_dir is not None:
+            store_json_cache(self.cache_dir / f"{blob}.json", sorted(ids))
+
+    def lookup(self, paths: Iterable[Path]) -> Dict[Path, BaseVersion]:
+        """Return the base version of every path, using O(1) git processes."""
+        paths = list(paths)
+        rel_by_path = {path: self._relative(path) for path in paths}
+        in_repo = [path for path in paths if rel_by_path[path] is not None]
+
+        base_blobs = self._base_blobs([rel_by_path[p] for p in in_repo])
+        working = dict(zip(in_repo, self._working_blobs(in_repo)))
+
+        versions: Dict[Path, BaseVersion] = {}
+        to_fetch: Dict[str, List[Path]] = {}
+        for path in paths:
+            rel = rel_by_path[path]
+            blob = base_blobs.get(rel) if rel is not None else None
+            if blob is None:
+                versions[path] = BaseVersion(UNAVAILABLE)
+            elif working.get(path) == blob:
+                versions[path] = BaseVersion(UNCHANGED, blob=blob)
+            else:
+                ids = self._cached_ids(blob)
+                if ids is not None:
+                    versions[path] = BaseVersion(CHANGED, ids, blob)
+                else:
+                    to_fetch.setdefault(blob, []).append(path)
+
+        if to_fetch:
+            with GitCatFileBatch(self.repo_root) as batch:
+                for blob, blob_paths in to_fetch.items():
+                    content = batch.read(blob)
+                    ids = extract_element_ids(content) if content is not None else None
+                    if ids is None:
+                        version = BaseVersion(UNAVAILABLE, blob=blob)
+                    else:
+                        self._store_ids(blob, ids)
+                        version = BaseVersion(CHANGED, ids, blob)
+                    for path in blob_paths:
+                        versions[path] = version
+        return versions
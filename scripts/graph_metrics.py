@@ -0,0 +1,257 @@
+"""
+Centrality metrics for Kumu blueprints, computed locally on a BlueprintGraph.
+
+The attribute names are those of Kumu's metrics, but the definitions are
+this repository's own and do not reproduce the numbers Kumu computes (on the
+main model most closeness and reach values differ):
+
+* ``closeness``  - harmonic closeness over outgoing shortest paths,
+  ``sum(1 / d(u, v)) / (n - 1)``; unreachable elements contribute 0,
+* ``betweenness`` - Brandes betweenness on the directed graph, normalized
+  by ``(n - 1) * (n - 2)``,
+* ``eigenvector`` - power iteration over incoming connections (shifted by the
+  identity so that acyclic parts converge), normalized to sum 1,
+* ``reach`` - share of all elements reachable within two outgoing steps,
+  the element itself included,
+* ``reach-efficiency`` - ``reach`` divided by the element's degree.
+
+Parallel connections and self-loops are collapsed first, so each ordered pair
+of elements counts once. The kernels work on plain neighbour lists
+(``neighbors[u]`` iterates the distinct successors of ``u``) built from the
+CSR arrays of the graph, and return unnormalized per-source values, so
+:mod:`metric_editor` can re-run them for single sources after an edit.
+Betweenness is the only expensive metric (O(n * m)); :func:`betweenness` can
+split the source elements over several processes.
+"""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Collection, Dict, Iterable, List, Optional, Sequence
+
+from blueprint_graph import BlueprintGraph
+
+CENTRALITY_METRICS = ("closeness", "betweenness", "eigenvector", "reach", "reach-efficiency")
+
+REACH_STEPS = 2
+EIGENVECTOR_MAX_ITER = 1000
+EIGENVECTOR_TOLERANCE = 1e-9
+
+# Below this many elements a process pool costs more than it saves.
+PARALLEL_MIN_ELEMENTS = 500
+# Relative change below which a stored metric value counts as current.
+METRIC_TOLERANCE = 1e-9
+
+Neighbors = Sequence[Collection[int]]
+
+
+def neighbor_lists(offsets: Sequence[int], targets: Sequence[int]) -> List[List[int]]:
+    """Split CSR arrays into per-element lists without parallel edges and self-loops."""
+    result = []
+    for u in range(len(offsets) - 1):
+        row = dict.fromkeys(targets[offsets[u]:offsets[u + 1]])
+        row.pop(u, None)
+        result.append(list(row))
+    return result
+
+
+def _outgoing(graph: BlueprintGraph) -> List[List[int]]:
+    return neighbor_lists(graph.out_offsets, graph.out_targets)
+
+
+def _incoming(graph: BlueprintGraph) -> List[List[int]]:
+    return neighbor_lists(graph.in_offsets, graph.in_sources)
+
+
+# ------------------------------------------------------------------ kernels
+def harmonic_sum(neighbors: Neighbors, source: int) -> float:
+    """``sum(1 / d(source, v))`` over all elements reachable from ``source``."""
+    dist = {source: 0}
+    queue = deque((source,))
+    total = 0.0
+    while queue:
+        u = queue.popleft()
+        du = dist[u] + 1
+        for v in neighbors[u]:
+            if v not in dist:
+                dist[v] = du
+                total += 1.0 / du
+                queue.append(v)
+    return total
+
+
+def reach_count(neighbors: Neighbors, source: int, steps: int = REACH_STEPS) -> int:
+    """Number of elements within ``steps`` outgoing hops of ``source``, itself included."""
+    seen = {source}
+    frontier = [source]
+    for _ in range(steps):
+        next_frontier = []
+        for u in frontier:
+            for v in neighbors[u]:
+                if v not in seen:
+                    seen.add(v)
+                    next_frontier.append(v)
+        frontier = next_frontier
+    return len(seen)
+
+
+def brandes_accumulate(
+    neighbors: Neighbors,
+    sources: Iterable[int],
+    centrality: Optional[array] = None,
+    sign: float = 1.0,
+) -> array:
+    """Add ``sign`` times the Brandes dependencies of ``sources`` to ``centrality``."""
+    n = len(neighbors)
+    if centrality is None:
+        centrality = array("d", [0.0]) * n
+    sigma = array("d", [0.0]) * n
+    delta = array("d", [0.0]) * n
+    dist = array("l", [-1]) * n
+    for source in sources:
+        order: List[int] = []
+        preds: Dict[int, List[int]] = {}
+        sigma[source] = 1.0
+        dist[source] = 0
+        queue = deque((source,))
+        while queue:
+            u = queue.popleft()
+            order.append(u)
+            du = dist[u] + 1
+            sigma_u = sigma[u]
+            for v in neighbors[u]:
+                if dist[v] < 0:
+                    dist[v] = du
+                    queue.append(v)
+                if dist[v] == du:
+                    sigma[v] += sigma_u
+                    preds.setdefault(v, []).append(u)
+        for w in reversed(order):
+            coefficient = (1.0 + delta[w]) / sigma[w]
+            for u in preds.get(w, ()):
+                delta[u] += sigma[u] * coefficient
+            if w != source:
+                centrality[w] += sign * delta[w]
+        for w in order:
+            sigma[w] = 0.0
+            delta[w] = 0.0
+            dist[w] = -1
+    return centrality
+
+
+def eigenvector_scores(
+    in_neighbors: Neighbors,
+    active: Optional[Sequence[int]] = None,
+    max_iter: int = EIGENVECTOR_MAX_ITER,
+    tolerance: float = EIGENVECTOR_TOLERANCE,
+) -> array:
+    """Power iteration of ``(A^T + I)`` over ``active`` (default: all); sums to 1."""
+    n = len(in_neighbors)
+    nodes = range(n) if active is None else active
+    count = len(nodes)
+    x = array("d", [0.0]) * n
+    if count == 0:
+        return x
+    for i in nodes:
+        x[i] = 1.0 / count
+    for _ in range(max_iter):
+        # Every element adds the scores of its predecessors to its own.
+        y = array("d", x)
+        for v in nodes:
+            acc = 0.0
+            for u in in_neighbors[v]:
+                acc += x[u]
+            y[v] += acc
+        norm = sum(value * value for value in y) ** 0.5 or 1.0
+        for i in nodes:
+            y[i] /= norm
+        change = sum(abs(a - b) for a, b in zip(x, y))
+        x = y
+        if change < count * tolerance:
+            break
+    total = sum(x) or 1.0
+    for i in nodes:
+        x[i] /= total
+    return x
+
+
+def metric_changed(old: object, new: float) -> bool:
+    """Whether the stored value ``old`` must be replaced by ``new``; float noise is ignored."""
+    if not isinstance(old, (int, float)) or isinstance(old, bool):
+        return True
+    return abs(old - new) > METRIC_TOLERANCE * max(1.0, abs(new))
+
+
+# ------------------------------------------------------------ normalization
+def closeness_scale(n: int) -> float:
+    return 1.0 / (n - 1) if n > 1 else 0.0
+
+
+def betweenness_scale(n: int) -> float:
+    return 1.0 / ((n - 1) * (n - 2)) if n > 2 else 0.0
+
+
+def reach_efficiency_value(reach_value: float, degree: int) -> float:
+    return reach_value / degree if degree else 0.0
+
+
+# ------------------------------------------------------------ whole graph
+def closeness(graph: BlueprintGraph, neighbors: Optional[Neighbors] = None) -> array:
+    neighbors = neighbors if neighbors is not None else _outgoing(graph)
+    scale = closeness_scale(graph.element_count)
+    return array("d", (harmonic_sum(neighbors, u) * scale for u in range(graph.element_count)))
+
+
+def reach(graph: BlueprintGraph, neighbors: Optional[Neighbors] = None, steps: int = REACH_STEPS) -> array:
+    neighbors = neighbors if neighbors is not None else _outgoing(graph)
+    n = graph.element_count
+    return array("d", (reach_count(neighbors, u, steps) / n for u in range(n)))
+
+
+def reach_efficiency(graph: BlueprintGraph, reach_values: Sequence[float]) -> array:
+    return array("d", (
+        reach_efficiency_value(value, graph.indegree[i] + graph.outdegree[i])
+        for i, value in enumerate(reach_values)
+    ))
+
+
+def betweenness(graph: BlueprintGraph, neighbors: Optional[Neighbors] = None, jobs: int = 1) -> array:
+    """Directed Brandes betweenness; ``jobs > 1`` splits sources over processes."""
+    neighbors = neighbors if neighbors is not None else _outgoing(graph)
+    n = graph.element_count
+    jobs = min(jobs, n)
+    if jobs > 1 and n >= PARALLEL_MIN_ELEMENTS:
+        chunks = [range(start, n, jobs) for start in range(jobs)]
+        result = array("d", [0.0]) * n
+        try:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                partials = list(executor.map(brandes_accumulate, [neighbors] * jobs, chunks))
+        except (OSError, NotImplementedError):
+            partials = [brandes_accumulate(neighbors, range(n))]
+        for partial in partials:
+            for i, value in enumerate(partial):
+                result[i] += value
+    else:
+        result = brandes_accumulate(neighbors, range(n))
+    scale = betweenness_scale(n)
+    for i in range(n):
+        result[i] *= scale
+    return result
+
+
+def eigenvector(graph: BlueprintGraph, in_neighbors: Optional[Neighbors] = None) -> array:
+    return eigenvector_scores(in_neighbors if in_neighbors is not None else _incoming(graph))
+
+
+def compute_centrality(graph: BlueprintGraph, jobs: int = 1) -> Dict[str, array]:
+    """Compute every metric in :data:`CENTRALITY_METRICS`, aligned with the element index."""
+    outgoing = _outgoing(graph)
+    reach_values = reach(graph, outgoing)
+    return {
+        "closeness": closeness(graph, outgoing),
+        "betweenness": betweenness(graph, outgoing, jobs=jobs),
+        "eigenvector": eigenvector(graph),
+        "reach": reach_values,
+        "reach-efficiency": reach_efficiency(graph, reach_values),
+    }
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of the KUMU API used by sync_blueprint_to_kumu.py.
+
+Endpoints (below ``/api/v2/projects/<account>/<project>``):
+
+* ``POST .../elements``        - replace the project with the blueprint in the
+  body, as the full upload of the sync relies on,
+* ``GET  .../elements``        - return the stored project as a blueprint.
+
+Two routes exist only here, for the delta scenarios of the benchmark; KUMU
+documents no such endpoints:
+
+* ``POST .../elements/upsert`` - upsert the ``elements``/``connections`` of the
+  body by ``_id``,
+* ``POST .../elements/delete`` - delete the ids listed in ``elements``/``connections``.
+
+Request bodies may be sent with chunked transfer encoding and/or
+``Content-Encoding: gzip``; byte counters measure the body as sent. Project
+state is kept in memory. ``GET /_stats`` returns request/byte counters
+and ``POST /_reset`` clears state and counters; these control requests are
+not counted themselves.
+
+Faults can be injected to exercise retries and batching: a fixed latency per
+request, a rate limit (requests per second, answered with ``429`` and
+``Retry-After``) and a random share of ``503`` responses.
+
+Run standalone and point the sync at it::
+
+    python scripts/kumu_standin.py --port 8765 --latency-ms 50 --error-rate 0.05
+    KUMU_API_URL=http://127.0.0.1:8765/api/v2 KUMU_API_KEY=test \\
+        KUMU_ACCOUNT=local KUMU_PROJECT=demo python scripts/sync_blueprint_to_kumu.py --stream
+
+or in-process via :func:`start_server` (see benchmark_kumu_sync.py).
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+PROJECT_PATH = re.compile(r"^/api/v2/projects/(?P<account>[^/]+)/(?P<project>[^/]+)/elements(?:/(?P<action>upsert|delete))?/?$")
+KINDS = ("elements", "connections")
+
+
+@dataclass
+class Faults:
+    latency: float = 0.0
+    rate_limit: float = 0.0
+    error_rate: float = 0.0
+    api_key: Optional[str] = None
+    seed: Optional[int] = None
+
+
+@dataclass
+class Stats:
+    requests: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    statuses: Counter = field(default_factory=Counter)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+        }
+
+
+class KumuStandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], faults: Optional[Faults] = None) -> None:
+        super().__init__(address, _Handler)
+        self.faults = faults or Faults()
+        self.lock = threading.Lock()
+        self.random = random.Random(self.faults.seed)
+        self.projects: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+        self.stats = Stats()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v2"
+
+    def reset(self) -> None:
+        with self.lock:
+            self.projects.clear()
+            self.stats = Stats()
+
+    def project(self, account: str, project: str) -> Dict[str, Dict[str, Any]]:
+        return self.projects.setdefault((account, project), {kind: {} for kind in KINDS})
+
+    def blueprint(self, account: str, project: str) -> Dict[str, Any]:
+        with self.lock:
+            state = self.project(account, project)
+            return {kind: list(state[kind].values()) for kind in KINDS}
+
+    def injected_fault(self) -> Optional[Tuple[int, Dict[str, str]]]:
+        """Return ``(status, headers)`` if this request should fail."""
+        faults = self.faults
+        with self.lock:
+            if faults.rate_limit > 0:
+                now = time.monotonic()
+                if now - self._window_start >= 1.0:
+                    self._window_start, self._window_count = now, 0
+                self._window_count += 1
+                if self._window_count > faults.rate_limit:
+                    wait = max(0.0, 1.0 - (now - self._window_start))
+                    return 429, {"Retry-After": f"{wait:.3f}"}
+            if faults.error_rate > 0 and self.random.random() < faults.error_rate:
+                return 503, {}
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: KumuStandIn
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _read_chunked(self) -> bytes:
+        parts = []
+        while True:
+            size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                    pass  # trailers
+                return b"".join(parts)
+            parts.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def _read_body(self) -> bytes:
+        """Read the request body; chunked and gzip-encoded bodies are decoded."""
+        if "chunked" in (self.headers.get("Transfer-Encoding") or "").lower():
+            body = self._read_chunked()
+        else:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+        if not self.path.startswith("/_"):
+            with self.server.lock:
+                self.server.stats.requests += 1
+                self.server.stats.bytes_in += len(body)
+        if (self.headers.get("Content-Encoding") or "").lower() == "gzip":
+            try:
+                body = gzip.decompress(body)
+            except (OSError, EOFError):
+                body = b"\0"  # reported as invalid JSON
+        return body
+
+    def _reply(self, status: int, payload: Any = None, headers: Optional[Dict[str, str]] = None) -> None:
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path.startswith("/_"):
+            return
+        with self.server.lock:
+            self.server.stats.bytes_out += len(body)
+            self.server.stats.statuses[status] += 1
+
+    def _route(self) -> Optional[re.Match]:
+        if self.server.faults.latency:
+            time.sleep(self.server.faults.latency)
+        fault = self.server.injected_fault()
+        if fault is not None:
+            status, headers = fault
+            self._reply(status, {"error": "injected"}, headers)
+            return None
+        key = self.server.faults.api_key
+        if key is not None and self.headers.get("Authorization") != f"Bearer {key}":
+            self._reply(401, {"error": "unauthorized"})
+            return None
+        match = PROJECT_PATH.match(self.path)
+        if match is None:
+            self._reply(404, {"error": "not found"})
+        return match
+
+    def do_GET(self) -> None:
+        self._read_body()
+        if self.path == "/_stats":
+            with self.server.lock:
+                stats = self.server.stats.to_dict()
+            self._reply(200, stats)
+            return
+        match = self._route()
+        if match is None:
+            return
+        if match.group("action"):
+            self._reply(405, {"error": "method not allowed"})
+            return
+        self._reply(200, self.server.blueprint(match.group("account"), match.group("project")))
+
+    def do_POST(self) -> None:
+        body = self._read_body()
+        if self.path == "/_reset":
+            self.server.reset()
+            self._reply(204)
+            return
+        match = self._route()
+        if match is None:
+            return
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self._reply(400, {"error": "invalid JSON"})
+            return
+        if not isinstance(payload, dict):
+            self._reply(400, {"error": "body must be an object"})
+            return
+
+        for kind in KINDS:
+            if not isinstance(payload.get(kind) or [], list):
+                self._reply(400, {"error": f"'{kind}' must be an array"})
+                return
+
+        action = match.group("action")
+        counts = {}
+        with self.server.lock:
+            state = self.server.project(match.group("account"), match.group("project"))
+            for kind in KINDS:
+                items = payload.get(kind) or []
+                if action is None:
+                    # A full upload replaces the map; nothing of the old state survives.
+                    state[kind] = {}
+                store = state[kind]
+                if action == "delete":
+                    counts[kind] = sum(store.pop(item, None) is not None for item in items if isinstance(item, str))
+                else:
+                    for item in items:
+                        if isinstance(item, dict) and isinstance(item.get("_id"), str):
+                            store[item["_id"]] = item
+                    counts[kind] = len(items)
+        self._reply(200, {{None: "replaced", "upsert": "upserted", "delete": "deleted"}[action]: counts})
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, faults: Optional[Faults] = None) -> KumuStandIn:
+    """Start a stand-in server on a background thread; stop it with ``shutdown()``."""
+    server = KumuStandIn((host, port), faults)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the KUMU API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second before 429 (0 = off)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--api-key", help="Require this bearer token")
+    parser.add_argument("--seed", type=int, help="Seed for the error injection")
+    args = parser.parse_args()
+
+    faults = Faults(args.latency_ms / 1000.0, args.rate_limit, args.error_rate, args.api_key, args.seed)
+    server = KumuStandIn((args.host, args.port), faults)
+    print(f"KUMU stand-in listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,208 @@
+"""
+Streamed request bodies for uploading a blueprint to KUMU.
+
+:func:`iter_blueprint_json` re-serializes a blueprint file member by member
+while it is read with :func:`blueprint_stream.iter_blueprint`, so neither the
+parsed blueprint nor the encoded request body is ever held in memory as a
+whole. :func:`gzip_chunks` compresses such a chunk stream on the fly. Passing
+the resulting generator as ``data=`` makes ``requests`` send it with chunked
+transfer encoding.
+
+Because a generator body cannot be rewound, callers that retry must build a
+new body per attempt (see :func:`blueprint_body`). :func:`post_with_retry`
+does that: it sends through a pooled session (:func:`make_session`) and
+repeats the request on connection errors, timeouts and 429/5xx responses
+with exponential backoff, honouring ``Retry-After``. Repeating is safe
+because every upload carries the whole blueprint and replaces the map: an
+upload that timed out after KUMU applied it, or a re-run of the sync, leaves
+the same state, and a body cut off half-way is invalid JSON that KUMU
+rejects without touching the map.
+"""
+from __future__ import annotations
+
+import json
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from blueprint_stream import ARRAY, CONNECTION, ELEMENT, FIELD, START, BlueprintStreamError, iter_blueprint
+
+# Pieces are coalesced into chunks of about this size before they are sent.
+DEFAULT_CHUNK_BYTES = 64 * 1024
+GZIP_LEVEL = 6
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+# Longest wait between two attempts, also for a large Retry-After.
+MAX_BACKOFF = 60.0
+# Connect and read timeout; the read timeout applies per socket operation,
+# not to the whole upload.
+DEFAULT_TIMEOUT = (10, 30)
+
+Body = Union[bytes, Iterator[bytes]]
+
+
+def _encode(value: object) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def iter_blueprint_json(path: Path) -> Iterator[bytes]:
+    """Yield the compact JSON encoding of the blueprint at ``path`` in pieces.
+
+    Top-level members keep their order; ``elements``/``connections`` are
+    re-encoded one item at a time. Raises BlueprintStreamError on malformed
+    input (the partially sent body is then invalid as well).
+    """
+    first_member = True
+    in_array = False
+    first_item = True
+    for event in iter_blueprint(path):
+        if event.kind == START:
+            if event.value != "object":
+                raise BlueprintStreamError("Blueprint is not a JSON object", event.offset)
+            yield b"{"
+            continue
+        if event.kind in (ELEMENT, CONNECTION):
+            yield _encode(event.value) if first_item else b"," + _encode(event.value)
+            first_item = False
+            continue
+        if in_array:
+            yield b"]"
+            in_array = False
+        prefix = b"" if first_member else b","
+        first_member = False
+        if event.kind == ARRAY:
+            yield prefix + _encode(event.key) + b":["
+            in_array, first_item = True, True
+        elif event.kind == FIELD:
+            yield prefix + _encode(event.key) + b":" + _encode(event.value)
+    if in_array:
+        yield b"]"
+    yield b"}"
+
+
+def coalesce(pieces: Iterable[bytes], chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[bytes]:
+    """Join small pieces into chunks of roughly ``chunk_bytes``."""
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= chunk_bytes:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = GZIP_LEVEL) -> Iterator[bytes]:
+    """Compress a chunk stream into a gzip stream."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def blueprint_body(path: Path, gzip: bool = False, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Tuple[Iterator[bytes], Dict[str, str]]:
+    """Return a fresh streamed body for ``path`` and the headers describing it."""
+    chunks = coalesce(iter_blueprint_json(path), chunk_bytes)
+    headers = {"Content-Type": "application/json"}
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return chunks, headers
+
+
+def count_members(path: Path) -> Tuple[int, int]:
+    """Validate ``path`` in one streaming pass; return (elements, connections).
+
+    Raises ValueError with the same messages as ``load_blueprint`` in
+    sync_blueprint_to_kumu.py when the structure is unusable.
+    """
+    counts = {ELEMENT: 0, CONNECTION: 0}
+    arrays = set()
+    for event in iter_blueprint(path):
+        if event.kind == START and event.value != "object":
+            raise ValueError("Blueprint is not a JSON object")
+        elif event.kind == ARRAY:
+            arrays.add(event.key)
+        elif event.kind in counts:
+            counts[event.kind] += 1
+    if not {"elements", "connections"} <= arrays:
+        raise ValueError("Blueprint must contain 'elements' and 'connections' arrays")
+    return counts[ELEMENT], counts[CONNECTION]
+
+
+# ------------------------------------------------------------ sending
+def make_session(api_key: str, pool_size: int = 4) -> requests.Session:
+    """Pooled session sending the KUMU bearer token.
+
+    Retries are left to :func:`post_with_retry`, which can rebuild a
+    streamed body; urllib3 would resend an exhausted generator.
+    """
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+    return session
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """Seconds requested by a ``Retry-After`` header (delay or HTTP date)."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def post_with_retry(
+    session: requests.Session,
+    url: str,
+    body: Callable[[], Tuple[Body, Dict[str, str]]],
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    timeout: object = DEFAULT_TIMEOUT,
+    on_retry: Optional[Callable[[int, str, float], None]] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> requests.Response:
+    """POST a fresh ``body()`` (data and headers) until it is not retryable.
+
+    Connection errors, timeouts and :data:`RETRY_STATUSES` are retried up to
+    ``retries`` times, waiting ``backoff * 2**attempt`` seconds or what
+    ``Retry-After`` asks for (at most :data:`MAX_BACKOFF`). The last response
+    is returned; the last exception is raised. ``on_retry(attempt, reason,
+    wait)`` is called before every wait.
+    """
+    attempt = 0
+    while True:
+        data, headers = body()
+        try:
+            response = session.post(url, data=data, headers=headers, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+            if attempt >= retries:
+                raise
+            reason, wait = type(exc).__name__, None
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                return response
+            reason, wait = f"HTTP {response.status_code}", retry_after(response)
+            response.close()
+        wait = min(MAX_BACKOFF, backoff * 2 ** attempt if wait is None else wait)
+        attempt += 1
+        if on_retry is not None:
+            on_retry(attempt, reason, wait)
+        sleep(wait)
@@ -0,0 +1,141 @@
+"""
+Label lookup for importing tables into a blueprint.
+
+:class:`LabelIndex` resolves element labels in O(1) after normalization
+(:func:`normalize_label`: lowercased, accents and every non-alphanumeric
+character removed, so spacing and punctuation differences do not matter).
+For labels without an exact match it proposes the closest labels from a
+character trigram index:
+
+1. the distinct trigrams of the query select the labels sharing any of them,
+   ranked by Dice overlap; only the ``shortlist`` best are kept,
+2. the shortlist is re-scored with ``difflib.SequenceMatcher`` and returned
+   as :class:`Candidate` objects with a score in ``[0, 1]``.
+
+:meth:`LabelIndex.resolve` accepts the best candidate automatically when it
+scores at least ``min_score`` and leads the runner-up by ``margin``, so near
+misses (typos, a missing plural ending) map without manual re-runs while
+ambiguous rows are left for review together with their suggestions.
+"""
+from __future__ import annotations
+
+import heapq
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from blueprint_graph import BlueprintGraph
+
+DEFAULT_MIN_SCORE = 0.9
+DEFAULT_MARGIN = 0.05
+DEFAULT_SHORTLIST = 10
+NGRAM = 3
+
+
+def normalize_label(s: Optional[str]) -> str:
+    s = s or ''
+    s = s.strip().lower()
+    s = unicodedata.normalize('NFKD', s)
+    s = ''.join(ch for ch in s if not unicodedata.combining(ch))
+    # remove non-alnum
+    s = ''.join(ch for ch in s if ch.isalnum())
+    return s
+
+
+def ngrams(key: str, n: int = NGRAM) -> Set[str]:
+    padded = f"^{key}$"
+    if len(padded) < n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+@dataclass(frozen=True)
+class Candidate:
+    element_id: str
+    label: str
+    score: float
+
+
+@dataclass
+class Resolution:
+    """Outcome of :meth:`LabelIndex.resolve` for one table label."""
+
+    label: str
+    element_id: Optional[str] = None
+    # "exact", "fuzzy" or None when unresolved.
+    match: Optional[str] = None
+    candidates: List[Candidate] = field(default_factory=list)
+
+
+class LabelIndex:
+    def __init__(self, labels: Iterable[Tuple[str, Optional[str]]]) -> None:
+        """Index ``(element id, label)`` pairs; for duplicate labels the last element wins."""
+        self._by_key: Dict[str, str] = {}
+        self._labels: Dict[str, str] = {}
+        for elem_id, label in labels:
+            key = normalize_label(label if isinstance(label, str) else '')
+            if key:
+                self._by_key[key] = elem_id
+                self._labels[key] = label
+        self._keys = list(self._by_key)
+        self._sizes: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        for position, key in enumerate(self._keys):
+            grams = ngrams(key)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(position)
+
+    @classmethod
+    def from_graph(cls, graph: BlueprintGraph) -> "LabelIndex":
+        return cls(zip(graph.element_ids, graph.element_column('label')))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def lookup(self, label: Optional[str]) -> Optional[str]:
+        """Element id whose normalized label equals that of ``label``."""
+        return self._by_key.get(normalize_label(label))
+
+    def candidates(self, label: Optional[str], limit: int = 3, shortlist: int = DEFAULT_SHORTLIST) -> List[Candidate]:
+        """The ``limit`` closest labels to ``label``, best first."""
+        key = normalize_label(label)
+        if not key:
+            return []
+        grams = ngrams(key)
+        size = len(grams)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        sizes = self._sizes
+        ranked = heapq.nlargest(shortlist, shared.items(), key=lambda item: item[1] / (size + sizes[item[0]]))
+        matcher = SequenceMatcher(None, b=key, autojunk=False)
+        scored = []
+        for position, _count in ranked:
+            other = self._keys[position]
+            matcher.set_seq1(other)
+            scored.append(Candidate(self._by_key[other], self._labels[other], round(matcher.ratio(), 4)))
+        scored.sort(key=lambda c: (-c.score, c.label))
+        return scored[:limit]
+
+    def resolve(
+        self,
+        label: Optional[str],
+        min_score: float = DEFAULT_MIN_SCORE,
+        margin: float = DEFAULT_MARGIN,
+        limit: int = 3,
+    ) -> Resolution:
+        """Exact lookup, else an unambiguous fuzzy match, else suggestions."""
+        elem_id = self.lookup(label)
+        if elem_id is not None:
+            return Resolution(label or '', elem_id, 'exact')
+        candidates = self.candidates(label, limit=max(limit, 2))
+        result = Resolution(label or '', candidates=candidates[:limit])
+        if candidates and candidates[0].score >= min_score:
+            runner_up = candidates[1].score if len(candidates) > 1 else 0.0
+            if candidates[0].score - runner_up >= margin:
+                result.element_id = candidates[0].element_id
+                result.match = 'fuzzy'
+        return result
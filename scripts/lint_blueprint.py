@@ -12,19 +12,33 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Sequence, Set, Optional
-import subprocess
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Set, Optional
 
-SUPPORTED_DIRECTIONS = {"directed", "undirected", "mutual"}
+from blueprint_stream import BlueprintStreamError
+from blueprint_validation import (
+    SUPPORTED_DIRECTIONS,  # noqa: F401 - re-exported; defined here before the checks moved
+    ValidationResult,
+    validate_blueprint_data,
+    validate_blueprint_stream,
+)
+from git_base import UNCHANGED, BaseVersion, BaseVersionProvider
+from lint_cache import LintCache
+
+# Files at least this large are linted with the streaming reader by default.
+STREAM_THRESHOLD_BYTES = 32 * 1024 * 1024
 
 
 @dataclass
 class LintResult:
     path: Path
     errors: List[str]
+    validation: Optional[ValidationResult] = None
 
     @property
     def ok(self) -> bool:
@@ -47,150 +61,159 @@ def ensure_dict(value: Any, context: str) -> Dict[str, Any]:
 
 def get_base_element_ids(path: Path) -> Optional[Set[str]]:
     """Return set of element ids from origin/main for the given file, or None if unavailable."""
-    repo_root = Path(__file__).resolve().parents[1]
-    try:
-        rel = path.resolve().relative_to(repo_root)
-    except Exception:
-        rel = path
-    git_arg = f"origin/main:{rel.as_posix()}"
-    try:
-        # Ensure subprocess output is decoded as UTF-8 to avoid platform-specific
-        # decoding errors when reading git output on Windows (cp1252 default).
-        proc = subprocess.run(
-            ["git", "show", git_arg],
-            check=True,
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-        )
-        try:
-            data = json.loads(proc.stdout)
-        except json.JSONDecodeError:
-            # If decoding produced replacement characters and JSON fails,
-            # fall back to returning None to allow lint to continue.
-            return None
-        elements = data.get("elements", [])
+    version = BaseVersionProvider().lookup([path])[path]
+    if version.status == UNCHANGED:
+        # Unchanged file: every current element exists on origin/main.
+        data = load_json(path)
+        elements = data.get("elements", []) if isinstance(data, dict) else []
         return {e.get("_id") for e in elements if isinstance(e, dict) and isinstance(e.get("_id"), str)}
-    except Exception:
+    if version.element_ids is None:
         return None
+    return set(version.element_ids)
+
+
+def lint_blueprint(
+    path: Path,
+    require_metrics_for_new: bool = False,
+    stream: Optional[bool] = None,
+    base_version: Optional[BaseVersion] = None,
+) -> LintResult:
+    """Lint one blueprint file.
+
+    With ``stream`` left at ``None`` the streaming reader is used for files of
+    at least ``STREAM_THRESHOLD_BYTES``; ``True``/``False`` force either path.
+    ``base_version`` is the origin/main state used by
+    ``require_metrics_for_new``; it is looked up on demand when omitted.
+    """
+    if stream is None:
+        try:
+            stream = path.stat().st_size >= STREAM_THRESHOLD_BYTES
+        except OSError:
+            stream = False
 
+    data: Any = None
+    if not stream:
+        try:
+            data = load_json(path)
+        except ValueError as exc:
+            return LintResult(path, [str(exc)])
 
-def lint_blueprint(path: Path, require_metrics_for_new: bool = False) -> LintResult:
-    errors: List[str] = []
-
-    try:
-        data = load_json(path)
-    except ValueError as exc:
-        return LintResult(path, [str(exc)])
-
-    if not isinstance(data, dict):
-        return LintResult(path, [f"Top-level JSON must be an object, got {type(data).__name__}"])
-
-    elements = data.get("elements")
-    if not isinstance(elements, list):
-        errors.append("Missing or invalid `elements` array.")
-        elements = []
-
-    connections = data.get("connections")
-    if not isinstance(connections, list):
-        errors.append("Missing or invalid `connections` array.")
-        connections = []
-
-    element_ids: Set[str] = set()
-    for index, raw_element in enumerate(elements):
-        prefix = f"elements[{index}]"
-        if not isinstance(raw_element, dict):
-            errors.append(f"{prefix}: must be an object.")
-            continue
-
-        elem_id = raw_element.get("_id")
-        if not isinstance(elem_id, str) or not elem_id.strip():
-            errors.append(f"{prefix}._id must be a non-empty string.")
-            continue
-        if elem_id in element_ids:
-            errors.append(f"{prefix}._id '{elem_id}' is duplicated.")
-        element_ids.add(elem_id)
-
-        attributes = raw_element.get("attributes")
-        if not isinstance(attributes, dict):
-            errors.append(f"{prefix}.attributes must be an object.")
-        else:
-            label = attributes.get("label")
-            if not isinstance(label, str) or not label.strip():
-                errors.append(f"{prefix}.attributes.label must be a non-empty string.")
+        if not isinstance(data, dict):
+            return LintResult(path, [f"Top-level JSON must be an object, got {type(data).__name__}"])
 
     # If requested, determine base element ids to detect newly added elements
     base_ids: Optional[Set[str]] = None
+    check_new = require_metrics_for_new
     if require_metrics_for_new:
-        base_ids = get_base_element_ids(path)
-        if base_ids is None:
-            errors.append("Warning: could not fetch origin/main version to determine new elements; skipping new-element metric checks.")
-    # If base_ids is available, check newly added elements for required metrics
-    if base_ids is not None:
-        for index, raw_element in enumerate(elements):
-            if not isinstance(raw_element, dict):
-                continue
-            elem_id = raw_element.get("_id")
-            if not isinstance(elem_id, str):
-                continue
-            if elem_id in base_ids:
-                continue
-            attributes = raw_element.get("attributes")
-            if not isinstance(attributes, dict):
-                continue
-            meas = attributes.get("measurability")
-            infl = attributes.get("influenceability")
-            missing = []
-            if meas is None:
-                missing.append("measurability")
-            if infl is None:
-                missing.append("influenceability")
-            if missing:
-                errors.append(
-                    f"New element '{elem_id}' missing fields: {', '.join(missing)}. "
-                    + "Add values (0/0.5/1) or include 'MISSING_METRICS: measurability=<value_or_NULL>, influenceability=<value_or_NULL>' in the PR description."
-                )
-
-    connection_ids: Set[str] = set()
-    for index, raw_connection in enumerate(connections):
-        prefix = f"connections[{index}]"
-        if not isinstance(raw_connection, dict):
-            errors.append(f"{prefix}: must be an object.")
-            continue
-
-        conn_id = raw_connection.get("_id")
-        if not isinstance(conn_id, str) or not conn_id.strip():
-            errors.append(f"{prefix}._id must be a non-empty string.")
-            continue
-        if conn_id in connection_ids:
-            errors.append(f"{prefix}._id '{conn_id}' is duplicated.")
-        connection_ids.add(conn_id)
-
-        for field in ("from", "to"):
-            value = raw_connection.get(field)
-            if not isinstance(value, str) or not value.strip():
-                errors.append(f"{prefix}.{field} must be a non-empty string.")
-            elif value not in element_ids:
-                errors.append(f"{prefix}.{field} references unknown element id '{value}'.")
-
-        direction = raw_connection.get("direction")
-        if direction is not None:
-            if direction not in SUPPORTED_DIRECTIONS:
-                errors.append(
-                    f"{prefix}.direction must be one of {sorted(SUPPORTED_DIRECTIONS)}, got '{direction}'."
-                )
-
-        for flag in ("delayed", "reversed"):
-            value = raw_connection.get(flag)
-            if value is not None and not isinstance(value, bool):
-                errors.append(f"{prefix}.{flag} must be boolean if provided.")
-
-        attributes = raw_connection.get("attributes")
-        if attributes is not None and not isinstance(attributes, dict):
-            errors.append(f"{prefix}.attributes must be an object when present.")
-
-    return LintResult(path, errors)
+        if base_version is None:
+            base_version = BaseVersionProvider().lookup([path])[path]
+        if base_version.status == UNCHANGED:
+            # Identical to origin/main, so there are no new elements to check.
+            check_new = False
+        elif base_version.element_ids is not None:
+            base_ids = set(base_version.element_ids)
+
+    # All structural checks run in one pass through the shared validation engine.
+    if stream:
+        try:
+            validation = validate_blueprint_stream(path, base_element_ids=base_ids, allow_bare_list=False)
+        except (BlueprintStreamError, OSError) as exc:
+            return LintResult(path, [f"Invalid JSON: {exc}"])
+        if validation.structure_errors and validation.structure_errors[0].startswith("Top-level"):
+            return LintResult(path, validation.structure_errors, validation)
+    else:
+        validation = validate_blueprint_data(data, base_element_ids=base_ids)
+
+    errors: List[str] = validation.structure_errors + validation.element_errors
+    if check_new and base_ids is None:
+        errors.append("Warning: could not fetch origin/main version to determine new elements; skipping new-element metric checks.")
+    errors.extend(validation.new_element_errors)
+    errors.extend(validation.connection_errors)
+
+    return LintResult(path, errors, validation)
+
+
+def _lint_with_base(path: Path, base_version: Optional[BaseVersion], **options: Any) -> LintResult:
+    return lint_blueprint(path, base_version=base_version, **options)
+
+
+def _run_lints(lint_one: Any, paths: List[Path], bases: List[Optional[BaseVersion]], jobs: int) -> Iterator[LintResult]:
+    workers = min(jobs, len(paths))
+    if workers > 1:
+        try:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError):
+            # No process support on this platform/sandbox; lint sequentially.
+            executor = None
+        if executor is not None:
+            with executor:
+                yield from executor.map(lint_one, paths, bases)
+            return
+    for path, base in zip(paths, bases):
+        yield lint_one(path, base)
+
+
+def _cache_payload(result: LintResult) -> Dict[str, Any]:
+    validation = result.validation.to_dict() if result.validation is not None else None
+    return {"errors": result.errors, "validation": validation}
+
+
+def _from_cache_payload(path: Path, payload: Dict[str, Any]) -> LintResult:
+    validation = payload.get("validation")
+    return LintResult(
+        path,
+        list(payload.get("errors", [])),
+        ValidationResult.from_dict(validation) if validation is not None else None,
+    )
+
+
+def lint_many(
+    paths: Sequence[Path],
+    jobs: int = 1,
+    require_metrics_for_new: bool = False,
+    stream: Optional[bool] = None,
+    cache: Optional[LintCache] = None,
+) -> Iterator[LintResult]:
+    """Lint ``paths`` with up to ``jobs`` worker processes.
+
+    Results are yielded in input order as soon as they (and all results
+    before them) are available, so output and exit codes are identical to a
+    sequential run. With a ``cache``, files whose content, options and linter
+    version match a stored entry are answered without being parsed.
+    """
+    paths = list(paths)
+    lint_one = partial(_lint_with_base, require_metrics_for_new=require_metrics_for_new, stream=stream)
+    # Base versions of all files come from one batched git lookup up front.
+    bases: List[Optional[BaseVersion]] = [None] * len(paths)
+    if require_metrics_for_new:
+        versions = BaseVersionProvider().lookup(paths)
+        bases = [versions[path] for path in paths]
+
+    if cache is None:
+        yield from _run_lints(lint_one, paths, bases, jobs)
+        return
+
+    keys: List[Optional[str]] = []
+    cached: List[Optional[Dict[str, Any]]] = []
+    for path, base in zip(paths, bases):
+        options: Dict[str, Any] = {"stream": stream, "require_metrics_for_new": require_metrics_for_new}
+        if require_metrics_for_new and base is not None:
+            options["base"] = [base.status, base.blob]
+        key = cache.key(path, options)
+        keys.append(key)
+        cached.append(cache.get(key))
+
+    misses = [i for i, payload in enumerate(cached) if payload is None]
+    fresh = _run_lints(lint_one, [paths[i] for i in misses], [bases[i] for i in misses], jobs)
+    for index, path in enumerate(paths):
+        payload = cached[index]
+        if payload is None:
+            result = next(fresh)
+            cache.put(keys[index], _cache_payload(result))
+            yield result
+        else:
+            yield _from_cache_payload(path, payload)
+    cache.prune()
 
 
 def collect_blueprint_files(paths: Sequence[str]) -> List[Path]:
@@ -233,6 +256,23 @@ def parse_args(argv: Iterable[str]) -> argparse.Namespace:
         nargs="*",
         help="Blueprint JSON files or directories to lint (defaults to ./models).",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of files to lint in parallel (defaults to the number of CPU cores).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the lint result cache in .blueprint_cache/.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read blueprints incrementally with bounded memory (automatic for files over 32 MiB).",
+    )
     parser.add_argument(
         "--require-metrics-for-new",
         action="store_true",
@@ -249,17 +289,29 @@ def main(argv: Iterable[str] | None = None) -> int:
         print(f"Error: {exc}", file=sys.stderr)
         return 2
 
-    results = [lint_blueprint(path, require_metrics_for_new=args.require_metrics_for_new) for path in blueprint_files]
+    if args.jobs < 1:
+        print("Error: --jobs must be at least 1", file=sys.stderr)
+        return 2
+
+    stream = True if args.stream else None
+    results = lint_many(
+        blueprint_files,
+        jobs=args.jobs,
+        require_metrics_for_new=args.require_metrics_for_new,
+        stream=stream,
+        cache=None if args.no_cache else LintCache(),
+    )
 
     had_error = False
     for result in results:
         if result.ok:
-            print(f"OK   {result.path}")
+            print(f"OK   {result.path}", flush=True)
         else:
             had_error = True
             print(f"FAIL {result.path}")
             for msg in result.errors:
                 print(f"  - {msg}")
+            sys.stdout.flush()
 
     return 1 if had_error else 0
 
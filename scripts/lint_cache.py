@@ -0,0 +1,109 @@
+"""
+Persistent lint/validation result cache keyed by file content.
+
+An entry is addressed by the SHA-256 of the blueprint bytes, a fingerprint of
+the linter itself (``LINT_RULES_VERSION`` plus the source of the modules that
+implement the checks) and the lint options. Unchanged files are therefore
+answered from the cache after hashing, without being parsed, and any edit to
+the rules invalidates every entry automatically.
+
+Entries live in ``.blueprint_cache/lint/``. :meth:`LintCache.prune` keeps the
+directory below ``max_entries`` files and ``max_bytes`` bytes by evicting the
+least recently used entries (hits refresh an entry's mtime).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from blueprint_cache import cache_dir, file_digest, load_json_cache, store_json_cache
+
+# Bump when lint semantics change in a way the module sources do not reflect.
+LINT_RULES_VERSION = 1
+
+# Modules whose source defines the lint/validation results.
+_RULE_MODULES = ("lint_blueprint.py", "blueprint_validation.py", "blueprint_stream.py")
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def linter_fingerprint() -> str:
+    digest = hashlib.sha256(f"rules-v{LINT_RULES_VERSION}".encode("ascii"))
+    scripts_dir = Path(__file__).resolve().parent
+    for name in _RULE_MODULES:
+        try:
+            digest.update((scripts_dir / name).read_bytes())
+        except OSError:
+            digest.update(name.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LintCache:
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.directory = directory or cache_dir("lint")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._fingerprint = linter_fingerprint()
+
+    def key(self, path: Path, options: Dict[str, Any]) -> Optional[str]:
+        """Cache key for ``path`` linted with ``options``; None if unreadable."""
+        try:
+            content = file_digest(path)
+        except OSError:
+            return None
+        material = json.dumps([self._fingerprint, content, options], sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        entry = self._entry(key)
+        payload = load_json_cache(entry)
+        if not isinstance(payload, dict):
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return payload
+
+    def put(self, key: Optional[str], payload: Dict[str, Any]) -> None:
+        if key is not None:
+            store_json_cache(self._entry(key), payload)
+
+    def prune(self) -> int:
+        """Evict least recently used entries beyond the size bounds; return count."""
+        entries: List[tuple] = []
+        try:
+            for entry in self.directory.glob("*/*.json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+        except OSError:
+            return 0
+        entries.sort(key=lambda item: item[0], reverse=True)
+        total = 0
+        removed = 0
+        for index, (_mtime, size, entry) in enumerate(entries):
+            total += size
+            if index >= self.max_entries or total > self.max_bytes:
+                try:
+                    entry.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
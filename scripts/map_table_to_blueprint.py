@@ -1,7 +1,18 @@
+import argparse
 import json
 import sys
 from pathlib import Path
-import unicodedata
+
+from blueprint_graph import load_blueprint
+from label_index import DEFAULT_MARGIN, DEFAULT_MIN_SCORE, LabelIndex
+from xlsx_reader import XlsxError, read_rows
+
+parser = argparse.ArgumentParser(description='Map measurability/influenceability proposals from Excel to blueprint elements.')
+parser.add_argument('--min-score', type=float, default=DEFAULT_MIN_SCORE,
+                    help='Accept a fuzzy label match at or above this score (1.0 = exact matches only)')
+parser.add_argument('--margin', type=float, default=DEFAULT_MARGIN,
+                    help='Required lead of the best fuzzy match over the runner-up')
+args = parser.parse_args()
 
 repo = Path(__file__).resolve().parents[1]
 excel = repo / 'scripts' / 'factors_measurability_proposals_RO_green.xlsx'
@@ -14,66 +25,19 @@ if not blueprint.exists():
     print('MISSING_BLUEPRINT')
     sys.exit(2)
 
-# simple xlsx reader using zip/xml
-import zipfile
-import xml.etree.ElementTree as ET
-z = zipfile.ZipFile(str(excel))
-shared = []
-if 'xl/sharedStrings.xml' in z.namelist():
-    with z.open('xl/sharedStrings.xml') as fh:
-        tree = ET.parse(fh)
-        root = tree.getroot()
-        for si in root.findall('.//{http://schemas.openxmlformats.org/spreadsheetml/2006/main}si'):
-            texts = []
-            for t in si.findall('.//{http://schemas.openxmlformats.org/spreadsheetml/2006/main}t'):
-                texts.append(t.text or '')
-            shared.append(''.join(texts))
+def checked_rows(path):
+    # A broken workbook can fail on any row, not only when the sheet is opened.
+    try:
+        yield from read_rows(path)
+    except XlsxError as exc:
+        print('EXCEL_ERROR', exc)
+        sys.exit(3)
 
-candidates = [n for n in z.namelist() if n.startswith('xl/worksheets/sheet') and n.endswith('.xml')]
-if not candidates:
-    print('NO_SHEET')
-    sys.exit(3)
-sheet = sorted(candidates)[0]
-with z.open(sheet) as fh:
-    tree = ET.parse(fh)
-    root = tree.getroot()
-    ns = {'d': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
-    rows = []
-    for row in root.findall('.//d:sheetData/d:row', ns):
-        cells = {}
-        max_col = 0
-        for c in row.findall('d:c', ns):
-            ref = c.get('r')
-            col = ''.join([ch for ch in ref if ch.isalpha()])
-            idx = 0
-            for ch in col:
-                idx = idx * 26 + (ord(ch.upper()) - ord('A') + 1)
-            if idx > max_col:
-                max_col = idx
-            cell_type = c.get('t')
-            v = c.find('d:v', ns)
-            value = ''
-            if v is not None and v.text is not None:
-                if cell_type == 's':
-                    try:
-                        si = int(v.text)
-                        value = shared[si] if si < len(shared) else ''
-                    except Exception:
-                        value = v.text
-                else:
-                    value = v.text
-            else:
-                is_node = c.find('d:is', ns)
-                if is_node is not None:
-                    t = is_node.find('.//d:t', ns)
-                    if t is not None and t.text:
-                        value = t.text
-            cells[idx - 1] = value
-        row_list = [cells.get(i, '') for i in range(max_col)]
-        rows.append(row_list)
+rows = checked_rows(excel)
+header = next(rows, None)
 
 # Expect header in first row, columns label;measurability;influenceability or similar
-headers = [h.strip() for h in rows[0]] if rows else []
+headers = [str(h).strip() if h is not None else '' for h in header] if header else []
 # find indices
 def find_col(name):
     name = name.lower()
@@ -89,68 +53,64 @@ if col_label is None or col_meas is None or col_infl is None:
     print('COLUMNS_NOT_FOUND', headers)
     sys.exit(4)
 
+def cell_text(r, idx):
+    v = r[idx] if idx < len(r) else None
+    return '' if v is None else str(v).strip()
+
 entries = []
-for r in rows[1:]:
-    label = r[col_label].strip() if col_label < len(r) else ''
-    meas = r[col_meas].strip() if col_meas < len(r) else ''
-    infl = r[col_infl].strip() if col_infl < len(r) else ''
+for r in rows:
+    label = cell_text(r, col_label)
+    meas = cell_text(r, col_meas)
+    infl = cell_text(r, col_infl)
     if label:
         entries.append((label, meas, infl))
 
 # load blueprint
-with blueprint.open('r', encoding='utf-8') as fh:
-    data = json.load(fh)
+graph = load_blueprint(blueprint)
 
-# build mapping from normalized label to element id
-def normalize(s):
-    s = s or ''
-    s = s.strip().lower()
-    s = unicodedata.normalize('NFKD', s)
-    s = ''.join(ch for ch in s if not unicodedata.combining(ch))
-    # remove non-alnum
-    s = ''.join(ch for ch in s if ch.isalnum())
-    return s
-
-label_to_id = {}
-for e in data.get('elements', []):
-    attrs = e.get('attributes', {})
-    lab = attrs.get('label', '')
-    n = normalize(lab)
-    if n:
-        label_to_id[n] = e.get('_id')
+index = LabelIndex.from_graph(graph)
 
 updates = []
 not_found = []
+suggestions = {}
 for label, meas, infl in entries:
-    n = normalize(label)
-    if n in label_to_id:
-        eid = label_to_id[n]
-        # find element
-        elem = next((x for x in data['elements'] if x.get('_id') == eid), None)
-        if elem is None:
-            not_found.append(label)
-            continue
-        attrs = elem.get('attributes', {})
-        cur_meas = attrs.get('measurability')
-        cur_infl = attrs.get('influenceability')
-        # convert meas/infl to float if possible
-        try:
-            new_meas = float(meas) if meas not in ('', None) else None
-        except:
-            new_meas = None
-        try:
-            new_infl = float(infl) if infl not in ('', None) else None
-        except:
-            new_infl = None
-        change = {}
-        if (cur_meas is None or cur_meas == '') and new_meas is not None:
-            change['measurability'] = new_meas
-        if (cur_infl is None or cur_infl == '') and new_infl is not None:
-            change['influenceability'] = new_infl
-        if change:
-            updates.append({'_id': eid, 'label': label, **change})
-    else:
+    res = index.resolve(label, min_score=args.min_score, margin=args.margin)
+    if res.element_id is None:
+        not_found.append(label)
+        if res.candidates:
+            suggestions[label] = [{'_id': c.element_id, 'label': c.label, 'score': c.score} for c in res.candidates]
+        continue
+    eid = res.element_id
+    elem = graph.element(eid)
+    if elem is None:
         not_found.append(label)
+        continue
+    attrs = elem.get('attributes', {})
+    cur_meas = attrs.get('measurability')
+    cur_infl = attrs.get('influenceability')
+    # convert meas/infl to float if possible
+    try:
+        new_meas = float(meas) if meas not in ('', None) else None
+    except:
+        new_meas = None
+    try:
+        new_infl = float(infl) if infl not in ('', None) else None
+    except:
+        new_infl = None
+    change = {}
+    if (cur_meas is None or cur_meas == '') and new_meas is not None:
+        change['measurability'] = new_meas
+    if (cur_infl is None or cur_infl == '') and new_infl is not None:
+        change['influenceability'] = new_infl
+    if change:
+        upd = {'_id': eid, 'label': label, **change}
+        if res.match == 'fuzzy':
+            upd['matched_label'] = res.candidates[0].label
+            upd['match_score'] = res.candidates[0].score
+        updates.append(upd)
 
 # output results as JSON
-print(json.dumps({'updates': updates, 'not_found': not_found}, ensure_ascii=False, indent=2))
+result = {'updates': updates, 'not_found': not_found}
+if suggestions:
+    result['suggestions'] = suggestions
+print(json.dumps(result, ensure_ascii=False, indent=2))
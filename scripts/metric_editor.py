@@ -0,0 +1,342 @@
+"""
+Incremental metric maintenance for blueprint edits.
+
+:class:`MetricEditor` wraps a blueprint and offers ``add_element``,
+``remove_element``, ``add_connection`` and ``remove_connection``. Every edit
+updates ``degree``/``indegree``/``outdegree``/``size`` of the touched
+elements immediately (O(1)); path-based metrics are brought up to date by
+:meth:`MetricEditor.flush`, which only recomputes the affected region:
+
+* an edit of connection ``u -> v`` can only change the shortest paths of
+  elements that reach ``u``, so closeness and betweenness are re-run for
+  those sources (Brandes contributions are per source: the stale
+  contribution is subtracted before the edit and the fresh one added at
+  flush),
+* two-step reach only changes for ``u`` and its direct predecessors,
+* eigenvector and MICMAC scores are global and recomputed with the cheap
+  power iterations whenever the structure changed.
+
+Once the affected sources exceed ``full_recompute_ratio`` of the model the
+editor stops tracking and the next flush recomputes everything. Edits that
+only add or remove a parallel connection leave the path metrics untouched.
+
+Removed elements and connections stay in ``data`` until the next flush.
+A stored value is only replaced when it differs by more than float noise, and
+:meth:`MetricEditor.save` writes through
+:class:`blueprint_writer.BlueprintDocument`, so a save re-emits only the
+elements whose metrics actually changed.
+"""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Union
+
+from blueprint_graph import MISSING, BlueprintGraph
+from blueprint_writer import BlueprintDocument
+from graph_metrics import (
+    betweenness_scale,
+    brandes_accumulate,
+    closeness_scale,
+    eigenvector_scores,
+    harmonic_sum,
+    metric_changed,
+    reach_count,
+    reach_efficiency_value,
+)
+from micmac import matrix_from_edges, run_micmac
+
+FULL_RECOMPUTE_RATIO = 0.5
+
+
+class MetricEditor:
+    def __init__(
+        self,
+        blueprint: Union[BlueprintDocument, BlueprintGraph, Dict[str, Any]],
+        full_recompute_ratio: float = FULL_RECOMPUTE_RATIO,
+        micmac: bool = True,
+        signed_micmac: bool = False,
+    ) -> None:
+        # Saved with a minimal diff against this document, if there is one.
+        self.document = blueprint if isinstance(blueprint, BlueprintDocument) else None
+        if self.document is not None:
+            graph = self.document.graph
+        else:
+            graph = blueprint if isinstance(blueprint, BlueprintGraph) else BlueprintGraph(blueprint)
+        self.data = graph.data
+        self.data.setdefault("elements", [])
+        self.data.setdefault("connections", [])
+        self.full_recompute_ratio = full_recompute_ratio
+        self.micmac = micmac
+        self.signed_micmac = signed_micmac
+
+        # Element slots are never reused; removed elements leave None behind.
+        self._elements: List[Optional[Dict[str, Any]]] = list(graph.elements)
+        self._index: Dict[str, int] = dict(graph.element_index)
+        self._indegree = list(graph.indegree)
+        self._outdegree = list(graph.outdegree)
+        # Multiplicity of every distinct (u, v) pair, self-loops excluded.
+        self._out: List[Dict[int, int]] = [{} for _ in self._elements]
+        self._in: List[Dict[int, int]] = [{} for _ in self._elements]
+        # id(connection dict) -> (connection, source slot, target slot, counts for degree)
+        self._connections: Dict[int, tuple] = {}
+        self._connections_by_id: Dict[str, List[Dict[str, Any]]] = {}
+        self._incident: List[Set[int]] = [set() for _ in self._elements]
+        for index, conn in enumerate(graph.connections):
+            from_id, to_id = conn.get("from"), conn.get("to")
+            self._register(conn, graph.conn_source[index], graph.conn_target[index], bool(from_id and to_id))
+
+        self._removed: Set[int] = set()
+        self._harmonic: List[float] = [0.0] * len(self._elements)
+        self._reach: List[int] = [1] * len(self._elements)
+        self._betweenness = array("d", [0.0]) * len(self._elements)
+        self._dirty_paths: Set[int] = set()
+        self._dirty_reach: Set[int] = set()
+        self._structure_changed = True
+        # Nothing has been computed yet: the first flush is a full recompute.
+        self._full = True
+
+    @classmethod
+    def open(cls, path: Path, **options: Any) -> "MetricEditor":
+        return cls(BlueprintDocument.open(path), **options)
+
+    # ------------------------------------------------------------- helpers
+    @property
+    def element_count(self) -> int:
+        return len(self._index)
+
+    def _register(self, conn: Dict[str, Any], src: int, dst: int, counted: bool) -> None:
+        self._connections[id(conn)] = (conn, src, dst, counted)
+        conn_id = conn.get("_id")
+        if isinstance(conn_id, str):
+            self._connections_by_id.setdefault(conn_id, []).append(conn)
+        for slot in {src, dst} - {MISSING}:
+            self._incident[slot].add(id(conn))
+        if src != MISSING and dst != MISSING and src != dst:
+            self._link(src, dst, 1)
+
+    def _link(self, src: int, dst: int, delta: int) -> None:
+        count = self._out[src].get(dst, 0) + delta
+        if count:
+            self._out[src][dst] = count
+            self._in[dst][src] = count
+        else:
+            del self._out[src][dst]
+            del self._in[dst][src]
+
+    def _set_degree_attributes(self, slot: int) -> None:
+        elem = self._elements[slot]
+        if elem is None:
+            return
+        attrs = elem.setdefault("attributes", {})
+        degree = self._indegree[slot] + self._outdegree[slot]
+        attrs["indegree"] = self._indegree[slot]
+        attrs["outdegree"] = self._outdegree[slot]
+        attrs["degree"] = degree
+        attrs["size"] = degree + 1
+
+    def _ancestors(self, slot: int) -> Set[int]:
+        seen = {slot}
+        queue = deque((slot,))
+        while queue:
+            v = queue.popleft()
+            for u in self._in[v]:
+                if u not in seen:
+                    seen.add(u)
+                    queue.append(u)
+        return seen
+
+    def _before_pair_change(self, src: int) -> None:
+        """Invalidate metrics that depend on the outgoing pairs of ``src``."""
+        self._structure_changed = True
+        if self._full:
+            return
+        affected = self._ancestors(src)
+        fresh = affected - self._dirty_paths
+        if len(self._dirty_paths) + len(fresh) > self.full_recompute_ratio * max(self.element_count, 1):
+            self._full = True
+            self._dirty_paths.clear()
+            self._dirty_reach.clear()
+            return
+        brandes_accumulate(self._out, fresh, self._betweenness, sign=-1.0)
+        self._dirty_paths |= fresh
+        self._dirty_reach.add(src)
+        self._dirty_reach.update(self._in[src])
+
+    # ---------------------------------------------------------------- edits
+    def add_element(self, elem: Dict[str, Any]) -> int:
+        elem_id = elem.get("_id")
+        if not isinstance(elem_id, str):
+            raise ValueError("Element needs a string '_id'")
+        if elem_id in self._index:
+            raise ValueError(f"Duplicate element id: {elem_id}")
+        slot = len(self._elements)
+        self._elements.append(elem)
+        self._index[elem_id] = slot
+        self._indegree.append(0)
+        self._outdegree.append(0)
+        self._out.append({})
+        self._in.append({})
+        self._incident.append(set())
+        self._harmonic.append(0.0)
+        self._reach.append(1)
+        self._betweenness.append(0.0)
+        self.data["elements"].append(elem)
+        self._set_degree_attributes(slot)
+        self._structure_changed = True
+        return slot
+
+    def remove_element(self, elem_id: str) -> Dict[str, Any]:
+        """Remove an element together with all connections that reference it."""
+        slot = self._index.get(elem_id)
+        if slot is None:
+            raise KeyError(elem_id)
+        for key in list(self._incident[slot]):
+            self._remove_connection(self._connections[key][0])
+        elem = self._elements[slot]
+        del self._index[elem_id]
+        self._elements[slot] = None
+        self._removed.add(id(elem))
+        self._dirty_paths.discard(slot)
+        self._dirty_reach.discard(slot)
+        self._structure_changed = True
+        return elem
+
+    def add_connection(self, conn: Dict[str, Any]) -> None:
+        conn_id = conn.get("_id")
+        if not isinstance(conn_id, str):
+            raise ValueError("Connection needs a string '_id'")
+        if self._connections_by_id.get(conn_id):
+            raise ValueError(f"Duplicate connection id: {conn_id}")
+        src = self._index.get(conn.get("from"), MISSING)
+        dst = self._index.get(conn.get("to"), MISSING)
+        if src == MISSING or dst == MISSING:
+            raise ValueError(f"Connection {conn_id} references unknown element(s)")
+        if src != dst and dst not in self._out[src]:
+            self._before_pair_change(src)
+        self._register(conn, src, dst, True)
+        self.data["connections"].append(conn)
+        self._outdegree[src] += 1
+        self._indegree[dst] += 1
+        self._set_degree_attributes(src)
+        self._set_degree_attributes(dst)
+
+    def remove_connection(self, conn_id: str) -> Dict[str, Any]:
+        """Remove the first connection with ``conn_id``."""
+        candidates = self._connections_by_id.get(conn_id)
+        if not candidates:
+            raise KeyError(conn_id)
+        conn = candidates[0]
+        self._remove_connection(conn)
+        return conn
+
+    def _remove_connection(self, conn: Dict[str, Any]) -> None:
+        _conn, src, dst, counted = self._connections.pop(id(conn))
+        conn_id = conn.get("_id")
+        if isinstance(conn_id, str):
+            candidates = self._connections_by_id[conn_id]
+            candidates.remove(conn)
+            if not candidates:
+                del self._connections_by_id[conn_id]
+        for slot in {src, dst} - {MISSING}:
+            self._incident[slot].discard(id(conn))
+        if src != MISSING and dst != MISSING and src != dst:
+            if self._out[src][dst] == 1:
+                self._before_pair_change(src)
+            self._link(src, dst, -1)
+        if counted:
+            for slot, degrees in ((src, self._outdegree), (dst, self._indegree)):
+                if slot != MISSING:
+                    degrees[slot] -= 1
+                    self._set_degree_attributes(slot)
+        self._removed.add(id(conn))
+
+    # ---------------------------------------------------------------- flush
+    def _compact(self) -> None:
+        if not self._removed:
+            return
+        removed = self._removed
+        for name in ("elements", "connections"):
+            items = self.data[name]
+            items[:] = [item for item in items if id(item) not in removed]
+        self._removed = set()
+
+    def flush(self) -> int:
+        """Recompute stale metrics into the attributes; return the number of elements changed."""
+        self._compact()
+        if not (self._full or self._structure_changed or self._dirty_paths or self._dirty_reach):
+            return 0
+        alive = [slot for slot, elem in enumerate(self._elements) if elem is not None]
+        n = len(alive)
+
+        if self._full:
+            paths, reach_sources = alive, alive
+            self._betweenness = array("d", [0.0]) * len(self._elements)
+        else:
+            paths = sorted(self._dirty_paths)
+            reach_sources = sorted(self._dirty_reach)
+        for slot in paths:
+            self._harmonic[slot] = harmonic_sum(self._out, slot)
+        for slot in reach_sources:
+            self._reach[slot] = reach_count(self._out, slot)
+        brandes_accumulate(self._out, paths, self._betweenness)
+
+        eigenvector = eigenvector_scores(self._in, alive)
+        micmac = None
+        if self.micmac:
+            edges = (
+                (src, dst, (conn.get("attributes") or {}).get("connection type"))
+                for conn, src, dst, _counted in self._connections.values()
+                if src != MISSING and dst != MISSING
+            )
+            micmac = run_micmac(matrix_from_edges(len(self._elements), edges, self.signed_micmac), self.signed_micmac)
+
+        closeness_factor = closeness_scale(n)
+        betweenness_factor = betweenness_scale(n)
+        changed = 0
+        for slot in alive:
+            reach_value = self._reach[slot] / n
+            degree = self._indegree[slot] + self._outdegree[slot]
+            values = {
+                "indegree": self._indegree[slot],
+                "outdegree": self._outdegree[slot],
+                "degree": degree,
+                "size": degree + 1,
+                "closeness": self._harmonic[slot] * closeness_factor,
+                "betweenness": self._betweenness[slot] * betweenness_factor,
+                "eigenvector": eigenvector[slot],
+                "reach": reach_value,
+                "reach-efficiency": reach_efficiency_value(reach_value, degree),
+            }
+            if micmac is not None:
+                values.update(micmac.attributes(slot))
+            attrs = self._elements[slot].setdefault("attributes", {})
+            stale = {name: value for name, value in values.items() if metric_changed(attrs.get(name), value)}
+            if stale:
+                attrs.update(stale)
+                changed += 1
+
+        self._dirty_paths.clear()
+        self._dirty_reach.clear()
+        self._structure_changed = False
+        self._full = False
+        return changed
+
+    def save(self, path: Optional[Path] = None, force: bool = False) -> bool:
+        """Flush and write the blueprint; return False if the file is unchanged.
+
+        An editor opened from a file saves back to it (or to ``path``) as a
+        minimal diff. Otherwise ``path`` is required, and an existing file
+        there is the baseline of the diff.
+        """
+        self.flush()
+        document = self.document
+        if document is None:
+            if path is None:
+                raise ValueError("No path to save the blueprint to")
+            path = Path(path)
+            document = BlueprintDocument(path.read_bytes(), path) if path.exists() else BlueprintDocument(b"{}")
+            document.data = self.data
+            self.document = document
+        return document.save(path, force=force)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+MICMAC influence/exposure analysis for Kumu blueprints.
+
+The MICMAC matrix ``M`` has ``M[u][v] != 0`` when element ``u`` has a
+connection to element ``v``. Direct influence and exposure are the row and
+column sums of ``M``; indirect influence and exposure are the row and column
+sums of ``M^k``, where ``k`` is raised until the ranking of the elements no
+longer changes.
+
+``M^k`` is never materialized: ``M^k * 1`` and ``1^T * M^k`` are advanced by
+one sparse product over the CSR adjacency per power, rescaling by the maximum
+after every step (this leaves the ranking unchanged and avoids overflow).
+On an acyclic graph the powers eventually vanish: once ``M^k`` is zero the
+iteration stops and reports ``M^(k-1)``, the last power that still ranks the
+elements (see :attr:`MicmacResult.zero_power`).
+
+In the unsigned variant every connected pair counts 1. The signed variant
+weighs each connection by its polarity (``++``/``--`` = +1, ``+-``/``-+`` = -1,
+untyped = +1) and sums parallel connections. Results are normalized by the
+largest absolute value, so the strongest element has 1.
+
+The scores do not reproduce the ``micmac influence``/``micmac exposure``
+values Kumu stores, so they are written to separate ``local micmac
+influence``/``local micmac exposure`` attributes and Kumu's own attributes
+(including ``metrics::last``) are left alone.
+"""
+from __future__ import annotations
+
+import argparse
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from blueprint_graph import BlueprintGraph, load_blueprint
+from graph_metrics import metric_changed
+
+DEFAULT_MAX_ITER = 100
+# Number of consecutive powers with an unchanged ranking required to stop.
+DEFAULT_STABLE_STEPS = 2
+# Scores are rounded to this many digits before ranking, so float noise
+# between equal elements does not count as a ranking change.
+RANK_DIGITS = 12
+# A rescaled power whose largest absolute entry is below this counts as zero.
+ZERO_TOLERANCE = 1e-12
+
+INFLUENCE = "local micmac influence"
+EXPOSURE = "local micmac exposure"
+# Written by Kumu's own MICMAC; never touched here.
+KUMU_ATTRIBUTES = ("micmac influence", "micmac exposure", "metrics::last")
+
+# CSR (offsets, targets, weights)
+Matrix = Tuple[array, array, array]
+
+
+@dataclass
+class MicmacResult:
+    influence: array
+    exposure: array
+    direct_influence: array
+    direct_exposure: array
+    iterations: int
+    converged: bool
+    signed: bool = False
+    # First power k with a zero M^k (row or column sums); the scores are then
+    # those of M^(k-1). None while the powers stay non-zero.
+    zero_power: Optional[int] = None
+
+    @property
+    def complete(self) -> bool:
+        """Whether the scores are final: the ranking converged, or the powers
+        ended after at least one non-zero power."""
+        return self.converged or (self.zero_power is not None and self.zero_power > 1)
+
+    def attributes(self, index: int) -> Dict[str, float]:
+        """Attribute values written for element ``index``."""
+        return {INFLUENCE: self.influence[index], EXPOSURE: self.exposure[index]}
+
+
+def connection_sign(connection_type: object) -> int:
+    if isinstance(connection_type, str) and len(connection_type) == 2 and connection_type[0] != connection_type[1]:
+        return -1
+    return 1
+
+
+def matrix_from_edges(n: int, edges: Iterable[Tuple[int, int, object]], signed: bool = False) -> Matrix:
+    """Build the MICMAC matrix as CSR ``(offsets, targets, weights)`` from
+    ``(source, target, connection type)`` triples; self-loops are dropped."""
+    rows: List[Dict[int, float]] = [{} for _ in range(n)]
+    for u, v, connection_type in edges:
+        if u == v:
+            continue
+        row = rows[u]
+        if signed:
+            row[v] = row.get(v, 0) + connection_sign(connection_type)
+        else:
+            row[v] = 1
+    offsets = array("l", [0]) * (n + 1)
+    targets = array("l")
+    weights = array("d")
+    for u, row in enumerate(rows):
+        for v, weight in row.items():
+            if weight:
+                targets.append(v)
+                weights.append(weight)
+        offsets[u + 1] = len(targets)
+    return offsets, targets, weights
+
+
+def micmac_matrix(graph: BlueprintGraph, signed: bool = False) -> Matrix:
+    types = graph.connection_column("connection type")
+    edges = (
+        (graph.conn_source[edge], graph.conn_target[edge], types[edge])
+        for edge in graph.out_edges
+    )
+    return matrix_from_edges(graph.element_count, edges, signed)
+
+
+def _peak(values: Sequence[float]) -> float:
+    return max((abs(v) for v in values), default=0.0)
+
+
+def _normalized(values: List[float], peak: float) -> array:
+    if peak:
+        values = [v / peak for v in values]
+    return array("d", values)
+
+
+def _ranking(values: Sequence[float]) -> List[int]:
+    return sorted(range(len(values)), key=lambda i: (-round(values[i], RANK_DIGITS), i))
+
+
+def compute_micmac(
+    graph: BlueprintGraph,
+    signed: bool = False,
+    max_iter: int = DEFAULT_MAX_ITER,
+    stable_steps: int = DEFAULT_STABLE_STEPS,
+) -> MicmacResult:
+    return run_micmac(micmac_matrix(graph, signed), signed, max_iter, stable_steps)
+
+
+def run_micmac(
+    matrix: Matrix,
+    signed: bool = False,
+    max_iter: int = DEFAULT_MAX_ITER,
+    stable_steps: int = DEFAULT_STABLE_STEPS,
+) -> MicmacResult:
+    offsets, targets, weights = matrix
+    n = len(offsets) - 1
+
+    influence = array("d", [1.0]) * n
+    exposure = array("d", [1.0]) * n
+    direct_influence = direct_exposure = None
+    previous: Tuple[List[int], List[int]] = ([], [])
+    stable = 0
+    iterations = 0
+    converged = False
+    zero_power = None
+    while iterations < max_iter:
+        next_influence = [0.0] * n
+        next_exposure = [0.0] * n
+        for u in range(n):
+            acc = 0.0
+            exposure_u = exposure[u]
+            for slot in range(offsets[u], offsets[u + 1]):
+                v = targets[slot]
+                weight = weights[slot]
+                acc += weight * influence[v]
+                next_exposure[v] += weight * exposure_u
+            next_influence[u] = acc
+        influence_peak = _peak(next_influence)
+        exposure_peak = _peak(next_exposure)
+        if n and (influence_peak < ZERO_TOLERANCE or exposure_peak < ZERO_TOLERANCE):
+            # M^k vanished (acyclic graph, or signed weights cancelling out):
+            # keep M^(k-1), or zeros when there is no non-zero power at all.
+            zero_power = iterations + 1
+            if direct_influence is None:
+                influence = exposure = array("d", [0.0]) * n
+            break
+        iterations += 1
+        influence = _normalized(next_influence, influence_peak)
+        exposure = _normalized(next_exposure, exposure_peak)
+        if direct_influence is None:
+            direct_influence, direct_exposure = influence, exposure
+
+        ranking = (_ranking(influence), _ranking(exposure))
+        stable = stable + 1 if ranking == previous else 0
+        previous = ranking
+        if stable >= stable_steps:
+            converged = True
+            break
+
+    if direct_influence is None:
+        direct_influence, direct_exposure = influence, exposure
+    return MicmacResult(influence, exposure, direct_influence, direct_exposure, iterations, converged, signed, zero_power)
+
+
+def apply_micmac(graph: BlueprintGraph, result: MicmacResult) -> int:
+    """Write the result into the element attributes; return the number of changed elements."""
+    changed = 0
+    for index, elem in enumerate(graph.elements):
+        attrs = elem.setdefault("attributes", {})
+        stale = {name: value for name, value in result.attributes(index).items()
+                 if metric_changed(attrs.get(name), value)}
+        if stale:
+            attrs.update(stale)
+            changed += 1
+    return changed
+
+
+def describe(result: MicmacResult) -> str:
+    mode = "signed" if result.signed else "unsigned"
+    if result.zero_power == 1:
+        return f"MICMAC ({mode}) matrix is zero, all scores are 0"
+    if result.zero_power is not None:
+        return f"MICMAC ({mode}) M^{result.zero_power} is zero, using M^{result.iterations}"
+    state = "converged" if result.converged else "did not converge"
+    return f"MICMAC ({mode}) {state} after {result.iterations} iterations"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Print MICMAC influence/exposure of a blueprint.")
+    parser.add_argument(
+        "blueprint",
+        nargs="?",
+        type=Path,
+        default=Path(__file__).resolve().parents[1] / "models" / "main_model" / "wirkmechanismen-main-model-blueprint.json",
+    )
+    parser.add_argument("--signed", action="store_true", help="Weigh connections by polarity")
+    parser.add_argument("--max-iter", type=int, default=DEFAULT_MAX_ITER)
+    parser.add_argument("--top", type=int, default=15, help="Number of elements to list")
+    args = parser.parse_args()
+
+    graph = load_blueprint(args.blueprint)
+    result = compute_micmac(graph, signed=args.signed, max_iter=args.max_iter)
+    print(describe(result))
+    print(f"{'influence':>10} {'exposure':>10} {'direct':>8}  element")
+    for index in _ranking(result.influence)[:args.top]:
+        print(
+            f"{result.influence[index]:10.4f} {result.exposure[index]:10.4f} "
+            f"{result.direct_influence[index]:8.4f}  {graph.label(index) or graph.element_ids[index]}"
+        )
+    return 0 if result.complete else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Structural metrics of a blueprint across its git history.
+
+Walks the commits that touched a blueprint (default: the main model; renames
+are followed) and writes one row per revision: element and connection counts,
+element-type counts, the source-label mix of the connections (``[A]``, ``[X]``,
+``[E]``, ...), the degree distribution and the centrality of the key factors
+(elements of type ``Schlüsselfaktor``). With ``--key-factors`` a second, long
+table lists every key factor per revision.
+
+The history is read without checking anything out:
+
+1. one ``git log --raw`` call yields the commits and the blob id of the file
+   in each of them,
+2. blobs analyzed before are answered from ``.blueprint_cache/history/``
+   (keyed by blob id, so reverts and cherry-picks cost nothing either),
+3. the remaining blobs are streamed through a single ``git cat-file --batch``
+   process and analyzed in a process pool (``-j``).
+
+A rerun after new commits therefore only analyzes the new revisions. The
+output is CSV, or Parquet when the file name ends in ``.parquet`` (needs
+``pyarrow``).
+
+Example::
+
+    python scripts/model_history.py -o reports/main-model-history.csv -j 4
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import statistics
+import subprocess
+import sys
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from blueprint_cache import REPO_ROOT, cache_dir, load_json_cache, store_json_cache
+from blueprint_graph import BlueprintGraph
+from blueprint_validation import STANDARD_SOURCE_LABELS
+from git_base import GitCatFileBatch
+from graph_metrics import CENTRALITY_METRICS, compute_centrality
+
+DEFAULT_BLUEPRINT = Path("models") / "main_model" / "wirkmechanismen-main-model-blueprint.json"
+# Bump when the analysis changes, so cached rows are recomputed.
+ANALYSIS_VERSION = 1
+KEY_FACTOR_TYPE = "Schlüsselfaktor"
+ELEMENT_TYPES = {
+    "key_factors": ("Schlüsselfaktor",),
+    "success_factors": ("Erfolgsfaktor", "Messbarer Erfolgsfaktor"),
+    "influence_factors": ("Einflussfaktoren",),
+    "problems": ("Problem",),
+}
+SOURCE_LABELS = tuple(sorted(STANDARD_SOURCE_LABELS))
+KEY_METRICS = ("betweenness", "eigenvector", "closeness")
+NULL_BLOB = "0" * 40
+
+COMMIT_COLUMNS = ("commit", "date", "subject", "blob")
+SUMMARY_COLUMNS = (
+    "elements", "connections", *ELEMENT_TYPES,
+    *(f"label {label}" for label in SOURCE_LABELS), "label other", "label missing",
+    "degree_mean", "degree_median", "degree_max", "isolated",
+    *(f"key_{metric}_{stat}" for metric in KEY_METRICS for stat in ("mean", "max")),
+)
+KEY_FACTOR_COLUMNS = ("commit", "date", "id", "label", "degree", *CENTRALITY_METRICS)
+
+
+@dataclass(frozen=True)
+class Revision:
+    commit: str
+    date: str
+    subject: str
+    blob: str
+
+
+# ------------------------------------------------------------ analysis
+def analyze_blueprint(raw: bytes) -> Dict[str, Any]:
+    """Summary row and key-factor rows for one blueprint version."""
+    graph = BlueprintGraph(json.loads(raw.decode("utf-8-sig")))
+    n = graph.element_count
+    summary: Dict[str, Any] = {"elements": n, "connections": graph.connection_count}
+
+    types = Counter(graph.element_column("element type"))
+    for column, names in ELEMENT_TYPES.items():
+        summary[column] = sum(types[name] for name in names)
+
+    labels = Counter(graph.connection_column("label"))
+    for label in SOURCE_LABELS:
+        summary[f"label {label}"] = labels.pop(label, 0)
+    missing = sum(count for label, count in labels.items() if not label)
+    summary["label other"] = sum(labels.values()) - missing
+    summary["label missing"] = missing
+
+    degrees = [graph.indegree[i] + graph.outdegree[i] for i in range(n)]
+    summary["degree_mean"] = statistics.fmean(degrees) if degrees else 0.0
+    summary["degree_median"] = statistics.median(degrees) if degrees else 0
+    summary["degree_max"] = max(degrees, default=0)
+    summary["isolated"] = degrees.count(0)
+
+    key_indices = graph.elements_of_type(KEY_FACTOR_TYPE)
+    metrics = compute_centrality(graph) if n else {name: [] for name in CENTRALITY_METRICS}
+    for metric in KEY_METRICS:
+        values = [metrics[metric][i] for i in key_indices]
+        summary[f"key_{metric}_mean"] = statistics.fmean(values) if values else None
+        summary[f"key_{metric}_max"] = max(values) if values else None
+
+    key_factors = [
+        {"id": graph.element_ids[i], "label": graph.label(i), "degree": degrees[i],
+         **{name: metrics[name][i] for name in CENTRALITY_METRICS}}
+        for i in key_indices
+    ]
+    return {"version": ANALYSIS_VERSION, "summary": summary, "key_factors": key_factors}
+
+
+def _analyze_or_error(raw: bytes) -> Dict[str, Any]:
+    try:
+        return analyze_blueprint(raw)
+    except ValueError as exc:
+        return {"version": ANALYSIS_VERSION, "error": str(exc)}
+
+
+# ------------------------------------------------------------ history
+def list_revisions(path: Path, ref: str = "HEAD", repo_root: Path = REPO_ROOT) -> List[Revision]:
+    """Commits touching ``path`` (oldest first) with the file's blob in each."""
+    # Paths that do not exist relative to the working directory are taken as repository paths.
+    rel = path.resolve().relative_to(repo_root).as_posix() if path.is_absolute() or path.exists() else path.as_posix()
+    output = subprocess.run(
+        ["git", "log", "--follow", "--no-abbrev", "--raw", "--format=%x00%H%x09%cI%x09%s", ref, "--", rel],
+        cwd=str(repo_root), check=True, capture_output=True,
+    ).stdout.decode("utf-8", "replace")
+    revisions: List[Revision] = []
+    for record in output.split("\0"):
+        lines = record.strip("\n").split("\n")
+        if not lines or not lines[0]:
+            continue
+        commit, date, subject = (lines[0].split("\t", 2) + ["", ""])[:3]
+        for line in lines[1:]:
+            if line.startswith(":"):
+                blob = line.split("\t", 1)[0].split()[3]
+                if blob != NULL_BLOB:
+                    revisions.append(Revision(commit, date, subject, blob))
+                break
+    revisions.reverse()
+    return revisions
+
+
+class HistoryAnalyzer:
+    def __init__(self, repo_root: Path = REPO_ROOT, jobs: int = 1, use_cache: bool = True) -> None:
+        self.repo_root = repo_root
+        self.jobs = max(1, jobs)
+        self.cache_dir = cache_dir("history") if use_cache else None
+        self.analyzed = 0
+
+    def _cached(self, blob: str) -> Optional[Dict[str, Any]]:
+        if self.cache_dir is None:
+            return None
+        entry = load_json_cache(self.cache_dir / f"{blob}.json")
+        if isinstance(entry, dict) and entry.get("version") == ANALYSIS_VERSION:
+            return entry
+        return None
+
+    def _store(self, blob: str, entry: Dict[str, Any]) -> None:
+        if self.cache_dir is not None:
+            store_json_cache(self.cache_dir / f"{blob}.json", entry)
+
+    def _blobs(self, batch: GitCatFileBatch, blobs: Sequence[str]) -> Iterator[Tuple[str, Optional[bytes]]]:
+        for blob in blobs:
+            yield blob, batch.read(blob)
+
+    def analyze(self, revisions: Sequence[Revision]) -> Dict[str, Dict[str, Any]]:
+        """Analysis entry per blob of ``revisions``, from cache or computed."""
+        results: Dict[str, Dict[str, Any]] = {}
+        todo: List[str] = []
+        for blob in dict.fromkeys(revision.blob for revision in revisions):
+            cached = self._cached(blob)
+            if cached is not None:
+                results[blob] = cached
+            else:
+                todo.append(blob)
+        if not todo:
+            return results
+
+        with GitCatFileBatch(self.repo_root) as batch:
+            if self.jobs == 1 or len(todo) == 1:
+                for blob, raw in self._blobs(batch, todo):
+                    results[blob] = self._finish(blob, raw, None)
+                return results
+            # Keep a bounded window of blobs in flight, so memory stays flat.
+            with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                pending: Deque[Tuple[str, Optional[Future]]] = deque()
+                for blob, raw in self._blobs(batch, todo):
+                    pending.append((blob, executor.submit(_analyze_or_error, raw) if raw is not None else None))
+                    if len(pending) >= 2 * self.jobs:
+                        done_blob, future = pending.popleft()
+                        results[done_blob] = self._finish(done_blob, None, future)
+                while pending:
+                    done_blob, future = pending.popleft()
+                    results[done_blob] = self._finish(done_blob, None, future)
+        return results
+
+    def _finish(self, blob: str, raw: Optional[bytes], future: Optional[Future]) -> Dict[str, Any]:
+        if future is not None:
+            entry = future.result()
+        elif raw is not None:
+            entry = _analyze_or_error(raw)
+        else:
+            return {"version": ANALYSIS_VERSION, "error": "blob not found"}
+        self.analyzed += 1
+        # Unparseable blobs are cached too: their content never changes.
+        self._store(blob, entry)
+        return entry
+
+
+def history_rows(
+    revisions: Sequence[Revision], results: Dict[str, Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Summary rows and key-factor rows in commit order (revisions with errors are skipped)."""
+    rows: List[Dict[str, Any]] = []
+    key_rows: List[Dict[str, Any]] = []
+    for revision in revisions:
+        entry = results.get(revision.blob) or {}
+        if "summary" not in entry:
+            continue
+        rows.append({"commit": revision.commit, "date": revision.date, "subject": revision.subject,
+                     "blob": revision.blob, **entry["summary"]})
+        for factor in entry.get("key_factors", []):
+            key_rows.append({"commit": revision.commit, "date": revision.date, **factor})
+    return rows, key_rows
+
+
+def write_table(rows: Sequence[Dict[str, Any]], columns: Sequence[str], path: Path) -> None:
+    """Write ``rows`` as CSV, or as Parquet if ``path`` ends in ``.parquet``."""
+    if path.suffix == ".parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow. Install with: pip install pyarrow") from None
+        table = pa.table({name: [row.get(name) for row in rows] for name in columns})
+        pq.write_table(table, str(path))
+        return
+    with path.open("w", encoding="utf-8", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(columns), extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Structural metrics of a blueprint for every commit that changed it.")
+    parser.add_argument("blueprint", nargs="?", type=Path, default=DEFAULT_BLUEPRINT,
+                        help="Blueprint path relative to the repository (default: main model)")
+    parser.add_argument("-o", "--output", type=Path, help="CSV or .parquet file (default: CSV on stdout)")
+    parser.add_argument("--key-factors", type=Path, help="Also write one row per key factor and revision")
+    parser.add_argument("--ref", default="HEAD", help="Revision whose history is walked (default: HEAD)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes for uncached revisions")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not write the per-blob cache")
+    args = parser.parse_args(argv)
+
+    try:
+        revisions = list_revisions(args.blueprint, args.ref)
+    except (subprocess.CalledProcessError, ValueError) as exc:
+        print(f"❌ Cannot read the history of {args.blueprint}: {exc}", file=sys.stderr)
+        return 2
+    if not revisions:
+        print(f"❌ No commits touch {args.blueprint}", file=sys.stderr)
+        return 1
+
+    analyzer = HistoryAnalyzer(jobs=args.jobs, use_cache=not args.no_cache)
+    results = analyzer.analyze(revisions)
+    rows, key_rows = history_rows(revisions, results)
+    columns = (*COMMIT_COLUMNS, *SUMMARY_COLUMNS)
+    try:
+        if args.output is None:
+            writer = csv.DictWriter(sys.stdout, fieldnames=list(columns), extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            write_table(rows, columns, args.output)
+        if args.key_factors is not None:
+            write_table(key_rows, KEY_FACTOR_COLUMNS, args.key_factors)
+    except (OSError, RuntimeError) as exc:
+        print(f"❌ {exc}", file=sys.stderr)
+        return 2
+
+    skipped = len(revisions) - len(rows)
+    print(f"✅ {len(rows)} revisions, {analyzer.analyzed} analyzed, {len(results) - analyzer.analyzed} from cache"
+          + (f", {skipped} unreadable" if skipped else ""), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
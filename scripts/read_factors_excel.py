@@ -40,72 +40,11 @@ try:
     sys.exit(0)
 except Exception as e:
     err_openpyxl = str(e)
-# Final fallback: parse .xlsx as zip with XML
+# Final fallback: stdlib streaming reader
 try:
-    import zipfile
-    import xml.etree.ElementTree as ET
+    from itertools import islice
 
-    z = zipfile.ZipFile(str(p))
-    # load shared strings if present
-    shared = []
-    if 'xl/sharedStrings.xml' in z.namelist():
-        with z.open('xl/sharedStrings.xml') as fh:
-            tree = ET.parse(fh)
-            root = tree.getroot()
-            for si in root.findall('.//{http://schemas.openxmlformats.org/spreadsheetml/2006/main}si'):
-                # concatenate text nodes
-                texts = []
-                for t in si.findall('.//{http://schemas.openxmlformats.org/spreadsheetml/2006/main}t'):
-                    texts.append(t.text or '')
-                shared.append(''.join(texts))
-
-    # Attempt to read first worksheet file
-    sheet_name = None
-    # prefer sheet1.xml
-    candidates = [n for n in z.namelist() if n.startswith('xl/worksheets/sheet') and n.endswith('.xml')]
-    if not candidates:
-        raise RuntimeError('No sheet XML found in workbook')
-    sheet_name = sorted(candidates)[0]
-    with z.open(sheet_name) as fh:
-        tree = ET.parse(fh)
-        root = tree.getroot()
-        ns = {'d': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
-        rows = []
-        for row in root.findall('.//d:sheetData/d:row', ns):
-            cells = {}
-            max_col = 0
-            for c in row.findall('d:c', ns):
-                ref = c.get('r')  # e.g., A1
-                col = ''.join([ch for ch in ref if ch.isalpha()])
-                # convert col to index
-                idx = 0
-                for ch in col:
-                    idx = idx * 26 + (ord(ch.upper()) - ord('A') + 1)
-                if idx > max_col:
-                    max_col = idx
-                cell_type = c.get('t')
-                v = c.find('d:v', ns)
-                value = ''
-                if v is not None and v.text is not None:
-                    if cell_type == 's':
-                        try:
-                            si = int(v.text)
-                            value = shared[si] if si < len(shared) else ''
-                        except Exception:
-                            value = v.text
-                    else:
-                        value = v.text
-                else:
-                    # inline string?
-                    is_node = c.find('d:is', ns)
-                    if is_node is not None:
-                        t = is_node.find('.//d:t', ns)
-                        if t is not None and t.text:
-                            value = t.text
-                cells[idx - 1] = value
-            # build row list
-            row_list = [cells.get(i, '') for i in range(max_col)]
-            rows.append(row_list)
+    from xlsx_reader import XlsxReader
 
     def csv_line(vals):
         out = []
@@ -116,9 +55,11 @@ try:
             out.append(s)
         return ';'.join(out)
 
-    print('USING zip-xml-fallback; sheet=', sheet_name)
-    for r in rows[:200]:
-        print(csv_line(r))
+    with XlsxReader(p) as reader:
+        sheet_name = reader.sheet_names[0] if reader.sheet_names else None
+        print('USING xlsx_reader; sheet=', sheet_name)
+        for r in islice(reader.rows(), 200):
+            print(csv_line(r))
     sys.exit(0)
 except Exception as e:
     print('ERROR: could not read Excel')
@@ -2,44 +2,43 @@
 """
 Recompute analytics metrics (degree, indegree, outdegree, size) for all elements
 based on actual connection counts. This ensures KUMU displays all connections correctly.
+
+Centrality metrics (closeness, betweenness, eigenvector, reach, reach-efficiency)
+and MICMAC influence/exposure are computed locally as well, with the
+definitions in graph_metrics.py and micmac.py. These are not the numbers Kumu
+computes for its metrics of the same name; MICMAC goes to the separate
+``local micmac influence``/``local micmac exposure`` attributes, so Kumu's
+stored values stay untouched. Use --degree-only to skip them.
+
+The blueprint is written back with blueprint_writer, so only elements whose
+metrics actually changed are re-emitted and BOM and formatting are kept.
 """
 
-import json
+import argparse
+import os
 from pathlib import Path
-from collections import defaultdict
 
+from blueprint_writer import BlueprintDocument
+from graph_metrics import CENTRALITY_METRICS, compute_centrality, metric_changed
+from micmac import apply_micmac, compute_micmac, describe
 
-def recompute_metrics(blueprint_path):
-    """Load blueprint, calculate metrics, and save."""
-    
-    # Load blueprint
-    with open(blueprint_path, 'r', encoding='utf-8-sig') as f:
-        blueprint = json.load(f)
-    
-    elements = {elem['_id']: elem for elem in blueprint['elements']}
-    connections = blueprint['connections']
-    
-    # Calculate actual degrees
-    indegree = defaultdict(int)
-    outdegree = defaultdict(int)
-    
-    for conn in connections:
-        from_id = conn.get('from')
-        to_id = conn.get('to')
-        if from_id and to_id:
-            outdegree[from_id] += 1
-            indegree[to_id] += 1
-    
+
+def refresh_metrics(graph, centrality=True, jobs=1, micmac=True, signed_micmac=False):
+    """Update the metric attributes of all elements of ``graph`` in place.
+
+    Returns the number of elements whose degree counts changed.
+    """
     # Update metrics in elements
     updated_count = 0
-    for elem_id, elem in elements.items():
+    for index, elem in enumerate(graph.elements):
+        elem_id = graph.element_ids[index]
         if 'attributes' not in elem:
             elem['attributes'] = {}
         
         attrs = elem['attributes']
         
-        actual_in = indegree.get(elem_id, 0)
-        actual_out = outdegree.get(elem_id, 0)
+        actual_in = graph.indegree[index]
+        actual_out = graph.outdegree[index]
         actual_degree = actual_in + actual_out
         
         old_indegree = attrs.get('indegree', 0)
@@ -57,21 +56,66 @@ def recompute_metrics(blueprint_path):
                 print(f"  ✓ {elem_id}: in({old_indegree}→{actual_in}) out({old_outdegree}→{actual_out}) deg({old_degree}→{actual_degree})")
                 updated_count += 1
     
-    # Save blueprint
-    with open(blueprint_path, 'w', encoding='utf-8') as f:
-        json.dump(blueprint, f, indent=2, ensure_ascii=False)
+    if centrality:
+        metrics = compute_centrality(graph, jobs=jobs)
+        refreshed = 0
+        for index, elem in enumerate(graph.elements):
+            attrs = elem['attributes']
+            changed = False
+            for name in CENTRALITY_METRICS:
+                value = metrics[name][index]
+                if metric_changed(attrs.get(name), value):
+                    attrs[name] = value
+                    changed = True
+            if changed:
+                refreshed += 1
+        print(f"  ✓ Centrality metrics refreshed for {refreshed}/{graph.element_count} elements")
+    
+    if micmac:
+        result = compute_micmac(graph, signed=signed_micmac)
+        refreshed = apply_micmac(graph, result)
+        marker = "✓" if result.complete else "⚠️"
+        print(f"  {marker} {describe(result)}; refreshed {refreshed}/{graph.element_count} elements")
+    
+    return updated_count
+
+
+def recompute_metrics(blueprint_path, centrality=True, jobs=1, micmac=True, signed_micmac=False):
+    """Load blueprint, calculate metrics, and save."""
+    
+    # Load blueprint
+    document = BlueprintDocument.open(blueprint_path)
+    graph = document.graph
+    updated_count = refresh_metrics(graph, centrality, jobs, micmac, signed_micmac)
+    
+    # Save blueprint (only changed elements are rewritten)
+    document.save()
     
-    return updated_count, len(elements)
+    return updated_count, graph.element_count
 
 
 if __name__ == '__main__':
-    blueprint_path = Path(__file__).parent.parent / 'models' / 'main_model' / 'wirkmechanismen-main-model-blueprint.json'
+    default_path = Path(__file__).parent.parent / 'models' / 'main_model' / 'wirkmechanismen-main-model-blueprint.json'
+    parser = argparse.ArgumentParser(description="Recompute element metrics of a Kumu blueprint.")
+    parser.add_argument('blueprint', nargs='?', type=Path, default=default_path, help="Blueprint JSON (default: main model)")
+    parser.add_argument('--degree-only', action='store_true', help="Only refresh degree/indegree/outdegree/size")
+    parser.add_argument('--no-micmac', action='store_true', help="Skip local MICMAC influence/exposure")
+    parser.add_argument('--signed-micmac', action='store_true', help="Weigh MICMAC connections by polarity")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help="Worker processes for betweenness")
+    args = parser.parse_args()
+    blueprint_path = args.blueprint
     
     if not blueprint_path.exists():
         print(f"❌ Blueprint not found: {blueprint_path}")
         exit(1)
     
     print(f"🔄 Recomputing metrics for: {blueprint_path}\n")
-    updated, total = recompute_metrics(blueprint_path)
+    updated, total = recompute_metrics(
+        blueprint_path,
+        centrality=not args.degree_only,
+        jobs=args.jobs,
+        micmac=not (args.degree_only or args.no_micmac),
+        signed_micmac=args.signed_micmac,
+    )
     print(f"\n✅ Updated {updated}/{total} elements with correct metrics")
     print(f"📊 Blueprint saved successfully")
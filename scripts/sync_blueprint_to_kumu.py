@@ -5,12 +5,25 @@ Sync KUMU Blueprint to KUMU API
 This script synchronizes the Main Model Blueprint JSON to KUMU.io
 by uploading it via the KUMU API.
 
+The blueprint is always uploaded as a whole: a POST to the project's
+``elements`` endpoint replaces the map. A delta upload is not offered because
+the KUMU API documents no endpoints for upserting or deleting single items.
+Requests go through a pooled session and are retried with exponential
+backoff on connection errors, timeouts and 429/5xx (see kumu_upload.py).
+Since each upload replaces the whole map, a retry or a re-run after a
+failed or timed-out sync is always safe.
+
 Environment variables required:
 - KUMU_API_KEY: Your KUMU API token
 - KUMU_ACCOUNT: Your KUMU account slug
 - KUMU_PROJECT: Your KUMU project slug
+
+Optional:
+- KUMU_API_URL: API base URL (default: https://kumu.io/api/v2), e.g. a local
+  stand-in server for testing
 """
 
+import argparse
 import json
 import os
 import sys
@@ -22,6 +35,17 @@ except ImportError:
     print("ERROR: requests library not installed. Install with: pip install requests")
     sys.exit(1)
 
+from blueprint_stream import BlueprintStreamError
+from kumu_upload import DEFAULT_RETRIES, blueprint_body, count_members, make_session, post_with_retry
+
+DEFAULT_API_URL = "https://kumu.io/api/v2"
+
+
+def project_url(account, project):
+    """Base URL of the project in the KUMU API."""
+    api_url = os.getenv("KUMU_API_URL") or DEFAULT_API_URL
+    return f"{api_url.rstrip('/')}/projects/{account}/{project}"
+
 
 def get_credentials():
     """Get KUMU API credentials from environment variables."""
@@ -77,64 +101,48 @@ def load_blueprint(blueprint_path):
         sys.exit(1)
 
 
-def sync_to_kumu(api_key, account, project, blueprint):
-    """Upload blueprint to KUMU via API."""
+def _report_response(response, account, project):
+    """Print the outcome of an upload request; return True on success."""
+    if response.status_code == 200:
+        print("✅ Successfully synced blueprint to KUMU")
+        print(f"   Response: {response.status_code}")
+        return True
     
-    # KUMU API endpoint for updating a project's blueprint
-    url = f"https://kumu.io/api/v2/projects/{account}/{project}/elements"
+    elif response.status_code == 201:
+        print("✅ Successfully created/updated blueprint in KUMU")
+        print(f"   Response: {response.status_code}")
+        return True
     
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    elif response.status_code == 401:
+        print("❌ Authentication failed: Invalid KUMU_API_KEY")
+        print(f"   Response: {response.status_code}")
+        print(f"   Details: {response.text}")
+        return False
     
-    print(f"\n📤 Syncing to KUMU...")
-    print(f"   Account: {account}")
-    print(f"   Project: {project}")
-    print(f"   API Endpoint: {url}")
+    elif response.status_code == 404:
+        print("❌ Project not found in KUMU")
+        print(f"   Account: {account}")
+        print(f"   Project: {project}")
+        print(f"   Response: {response.status_code}")
+        print(f"   Details: {response.text}")
+        return False
     
+    else:
+        print(f"❌ Failed to sync blueprint to KUMU")
+        print(f"   Status Code: {response.status_code}")
+        print(f"   Response: {response.text}")
+        return False
+
+
+def _upload(account, project, send):
+    """Run ``send()`` and report the response or the request error."""
     try:
-        # Method 1: Upload entire blueprint as replacement
-        # This is the most reliable method
-        response = requests.post(
-            url,
-            headers=headers,
-            json=blueprint,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            print("✅ Successfully synced blueprint to KUMU")
-            print(f"   Response: {response.status_code}")
-            return True
-        
-        elif response.status_code == 201:
-            print("✅ Successfully created/updated blueprint in KUMU")
-            print(f"   Response: {response.status_code}")
-            return True
-        
-        elif response.status_code == 401:
-            print("❌ Authentication failed: Invalid KUMU_API_KEY")
-            print(f"   Response: {response.status_code}")
-            print(f"   Details: {response.text}")
-            return False
-        
-        elif response.status_code == 404:
-            print("❌ Project not found in KUMU")
-            print(f"   Account: {account}")
-            print(f"   Project: {project}")
-            print(f"   Response: {response.status_code}")
-            print(f"   Details: {response.text}")
-            return False
-        
-        else:
-            print(f"❌ Failed to sync blueprint to KUMU")
-            print(f"   Status Code: {response.status_code}")
-            print(f"   Response: {response.text}")
-            return False
+        response = send()
+        return _report_response(response, account, project)
     
     except requests.exceptions.Timeout:
         print("❌ Request timeout: KUMU API took too long to respond")
+        print("   Re-running the sync is safe: the upload replaces the whole map")
         return False
     
     except requests.exceptions.ConnectionError:
@@ -142,13 +150,98 @@ def sync_to_kumu(api_key, account, project, blueprint):
         print("   Check your internet connection and KUMU_ACCOUNT/KUMU_PROJECT values")
         return False
     
+    except BlueprintStreamError as e:
+        print(f"❌ Blueprint became unreadable during upload: {e}")
+        return False
+    
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
         return False
 
 
+def _print_target(account, project, url):
+    print(f"   Account: {account}")
+    print(f"   Project: {project}")
+    print(f"   API Endpoint: {url}")
+
+
+def check_blueprint_file(blueprint_path):
+    """Validate the blueprint in one streaming pass without keeping it in memory."""
+    if not blueprint_path.exists():
+        print(f"ERROR: Blueprint file not found: {blueprint_path}")
+        sys.exit(1)
+    
+    try:
+        elements, connections = count_members(blueprint_path)
+    except BlueprintStreamError as e:
+        print(f"ERROR: Invalid JSON in blueprint: {e}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    
+    print(f"✓ Checked blueprint: {elements} elements, {connections} connections")
+
+
+def _print_retry(attempt, reason, wait):
+    print(f"   ⏳ {reason}, retry {attempt} in {wait:.1f} s")
+
+
+def _send(api_key, url, body, session=None, retries=DEFAULT_RETRIES):
+    """POST ``body()`` to ``url`` with retries, through ``session`` or a new one."""
+    if session is not None:
+        return post_with_retry(session, url, body, retries=retries, on_retry=_print_retry)
+    with make_session(api_key) as own:
+        return post_with_retry(own, url, body, retries=retries, on_retry=_print_retry)
+
+
+def sync_to_kumu(api_key, account, project, blueprint, session=None, retries=DEFAULT_RETRIES):
+    """Upload blueprint to KUMU via API."""
+    
+    # KUMU API endpoint for updating a project's blueprint
+    url = f"{project_url(account, project)}/elements"
+    
+    print(f"\n📤 Syncing to KUMU...")
+    _print_target(account, project, url)
+    
+    # Upload entire blueprint as replacement; encoded once, resent as is on retries
+    payload = json.dumps(blueprint, ensure_ascii=False).encode("utf-8")
+    return _upload(account, project, lambda: _send(
+        api_key, url, lambda: (payload, {"Content-Type": "application/json"}), session, retries
+    ))
+
+
+def stream_to_kumu(api_key, account, project, blueprint_path, gzip=False, session=None, retries=DEFAULT_RETRIES):
+    """Upload the blueprint file as a streamed (optionally gzip-compressed) body.
+    
+    The file is re-serialized while it is read, so memory use does not grow
+    with the model size. Every attempt reads the file anew.
+    """
+    url = f"{project_url(account, project)}/elements"
+    
+    print(f"\n📤 Streaming blueprint to KUMU{' (gzip)' if gzip else ''}...")
+    _print_target(account, project, url)
+    
+    return _upload(account, project, lambda: _send(
+        api_key, url, lambda: blueprint_body(blueprint_path, gzip=gzip), session, retries
+    ))
+
+
 def main():
     """Main synchronization workflow."""
+    parser = argparse.ArgumentParser(description="Sync the main model blueprint to KUMU.")
+    parser.add_argument("--blueprint", type=Path, help="Blueprint JSON (default: main model)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream the upload from disk instead of loading the blueprint into memory")
+    parser.add_argument("--gzip", action="store_true", help="With --stream: send a gzip-compressed request body")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"Retries on connection errors, timeouts and 429/5xx (default: {DEFAULT_RETRIES})")
+    args = parser.parse_args()
+    if args.gzip and not args.stream:
+        parser.error("--gzip requires --stream")
+    if args.retries < 0:
+        parser.error("--retries must not be negative")
+
     print("🔄 KUMU Blueprint Synchronization")
     print("=" * 50)
     
@@ -157,13 +250,23 @@ def main():
     
     # Load blueprint
     repo_root = Path(__file__).resolve().parents[1]
-    blueprint_path = repo_root / "models" / "main_model" / "wirkmechanismen-main-model-blueprint.json"
+    blueprint_path = args.blueprint or repo_root / "models" / "main_model" / "wirkmechanismen-main-model-blueprint.json"
+    
+    if args.stream:
+        print(f"\n📂 Checking blueprint: {blueprint_path}")
+        check_blueprint_file(blueprint_path)
+        success = stream_to_kumu(api_key, account, project, blueprint_path, gzip=args.gzip, retries=args.retries)
+        if not success:
+            sys.exit(1)
+        print("\n" + "=" * 50)
+        print("✅ Synchronization complete!")
+        return
     
     print(f"\n📂 Loading blueprint from: {blueprint_path}")
     blueprint = load_blueprint(blueprint_path)
     
     # Sync to KUMU
-    success = sync_to_kumu(api_key, account, project, blueprint)
+    success = sync_to_kumu(api_key, account, project, blueprint, retries=args.retries)
     
     if not success:
         sys.exit(1)
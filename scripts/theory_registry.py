@@ -0,0 +1,349 @@
+"""
+Theory registry and inverted element index.
+
+Theory definitions live in ``general/theories/*.json``, one file per theory::
+
+    {
+      "id": "KT",
+      "name": "Koordinationstheorie",
+      "slug": "koordination",
+      "keywords": ["koordin", "okhuysen", ...],
+      "literature": ["Okhuysen & Bechky (2009)", ...],
+      "coverage_docs": ["KOORDINATIONSTHEORIE_COVERAGE_ANALYSIS.md"],
+      "coverage_element_ids": []
+    }
+
+``keywords`` are regular expressions (see theory_classifier.py). The element
+ids of a theory's coverage come from ``coverage_element_ids`` plus every
+``elem-...`` id mentioned in its ``coverage_docs``. These are paths relative
+to the repository root, and missing docs are skipped.
+
+:class:`TheoryIndex` maps element ids to theories across all blueprints
+below ``models/``. It records the keyword matches of every element per model
+together with the coverage ids. The index is persisted in
+``.blueprint_cache/theory-index/index.json``. An entry is rebuilt only when
+the content of its model changes, and the whole index is rebuilt when a
+definition or coverage doc changes. Exports, coverage reports and subset
+extraction query the index instead of re-scanning the models.
+
+Usage::
+
+    python scripts/theory_registry.py                      # coverage per model and theory
+    python scripts/theory_registry.py --theory KT --elements --model models/main_model/wirkmechanismen-main-model-blueprint.json
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from blueprint_cache import REPO_ROOT, cache_dir, file_digest, load_json_cache, store_json_cache
+from blueprint_stream import ELEMENT, BlueprintStreamError, iter_blueprint
+from theory_classifier import CLASSIFIER_VERSION, TheoryClassifier
+
+THEORIES_DIR = REPO_ROOT / "general" / "theories"
+MODELS_DIR = REPO_ROOT / "models"
+INDEX_VERSION = 1
+
+ELEM_ID_PATTERN = re.compile(r"elem-[A-Za-z0-9]+")
+
+
+@dataclass(frozen=True)
+class TheoryDefinition:
+    id: str
+    name: str
+    slug: str
+    keywords: tuple
+    literature: tuple
+    coverage_docs: tuple
+    coverage_element_ids: tuple
+    path: Path
+
+    @classmethod
+    def from_file(cls, path: Path) -> "TheoryDefinition":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if not isinstance(data, dict) or not isinstance(data.get("id"), str) or not data["id"]:
+            raise ValueError(f"{path}: theory definition needs a non-empty string 'id'")
+        fields = {}
+        for name in ("keywords", "literature", "coverage_docs", "coverage_element_ids"):
+            values = data.get(name) or []
+            if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+                raise ValueError(f"{path}: '{name}' must be a list of strings")
+            fields[name] = tuple(values)
+        for pattern in fields["keywords"]:
+            try:
+                re.compile(pattern)
+            except re.error as exc:
+                raise ValueError(f"{path}: invalid keyword pattern {pattern!r}: {exc}") from None
+        theory_id = data["id"]
+        return cls(
+            id=theory_id,
+            name=str(data.get("name") or theory_id),
+            slug=str(data.get("slug") or theory_id.lower()),
+            path=path,
+            **fields,
+        )
+
+
+class TheoryRegistry:
+    def __init__(self, definitions: Sequence[TheoryDefinition], root: Path = REPO_ROOT) -> None:
+        self.definitions = sorted(definitions, key=lambda d: d.id)
+        self.root = root
+        self._by_id: Dict[str, TheoryDefinition] = {}
+        for definition in self.definitions:
+            if definition.id in self._by_id:
+                raise ValueError(f"Duplicate theory id {definition.id!r} in {definition.path}")
+            self._by_id[definition.id] = definition
+        self._coverage: Optional[Dict[str, Set[str]]] = None
+        self._fingerprint: Optional[str] = None
+
+    @classmethod
+    def load(cls, directory: Path = THEORIES_DIR, root: Path = REPO_ROOT) -> "TheoryRegistry":
+        """Load every ``*.json`` definition in ``directory``; other files are ignored."""
+        return cls([TheoryDefinition.from_file(path) for path in sorted(directory.glob("*.json"))], root)
+
+    def __iter__(self) -> Iterator[TheoryDefinition]:
+        return iter(self.definitions)
+
+    def __len__(self) -> int:
+        return len(self.definitions)
+
+    @property
+    def ids(self) -> List[str]:
+        return [definition.id for definition in self.definitions]
+
+    def get(self, theory_id: str) -> TheoryDefinition:
+        try:
+            return self._by_id[theory_id]
+        except KeyError:
+            raise KeyError(f"Unknown theory {theory_id!r} (known: {', '.join(self.ids)})") from None
+
+    def select(self, theory_ids: Iterable[str]) -> "TheoryRegistry":
+        return TheoryRegistry([self.get(theory_id) for theory_id in theory_ids], self.root)
+
+    def _doc_texts(self, definition: TheoryDefinition) -> Iterator[tuple]:
+        for doc in definition.coverage_docs:
+            try:
+                yield doc, (self.root / doc).read_text(encoding="utf-8", errors="replace")
+            except OSError:
+                yield doc, None
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash over the definitions and the content of their coverage docs."""
+        if self._fingerprint is None:
+            digest = hashlib.sha256(f"registry-v{INDEX_VERSION}-classifier-v{CLASSIFIER_VERSION}".encode("ascii"))
+            coverage: Dict[str, Set[str]] = {}
+            for definition in self.definitions:
+                payload = [definition.id, definition.keywords, definition.coverage_element_ids]
+                digest.update(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+                ids = set(definition.coverage_element_ids)
+                for doc, text in self._doc_texts(definition):
+                    digest.update(doc.encode("utf-8"))
+                    if text is not None:
+                        digest.update(hashlib.sha256(text.encode("utf-8")).digest())
+                        ids.update(ELEM_ID_PATTERN.findall(text))
+                coverage[definition.id] = ids
+            self._coverage = coverage
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def coverage_ids(self, theory_id: str) -> Set[str]:
+        self.fingerprint  # reads the coverage docs once
+        assert self._coverage is not None
+        return self._coverage[self.get(theory_id).id]
+
+    def classifier(self) -> TheoryClassifier:
+        return TheoryClassifier.cached({definition.id: definition.keywords for definition in self.definitions})
+
+
+_default_registry: Optional[TheoryRegistry] = None
+
+
+def default_registry() -> TheoryRegistry:
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = TheoryRegistry.load()
+    return _default_registry
+
+
+def discover_models(directory: Path = MODELS_DIR) -> List[Path]:
+    return sorted(path for path in directory.rglob("*.json") if path.is_file())
+
+
+class TheoryIndex:
+    def __init__(self, registry: TheoryRegistry, path: Optional[Path] = None) -> None:
+        self.registry = registry
+        self.path = path or cache_dir("theory-index") / "index.json"
+        # model key -> {"digest": ..., "elements": {elem_id: {theory: [patterns]}},
+        #               "coverage": {theory: [covered elem ids present in the model]}}
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._classifier: Optional[TheoryClassifier] = None
+        self._by_element: Optional[Dict[str, Set[str]]] = None
+        stored = load_json_cache(self.path)
+        if (
+            isinstance(stored, dict)
+            and stored.get("version") == INDEX_VERSION
+            and stored.get("registry") == registry.fingerprint
+            and isinstance(stored.get("models"), dict)
+        ):
+            self.models = stored["models"]
+
+    @classmethod
+    def open(cls, registry: Optional[TheoryRegistry] = None, models: Optional[Iterable[Path]] = None,
+             path: Optional[Path] = None) -> "TheoryIndex":
+        """Load the persisted index, bring ``models`` (default: all) up to date and save it."""
+        index = cls(registry or default_registry(), path)
+        index.refresh(discover_models() if models is None else models)
+        index.save()
+        return index
+
+    def model_key(self, model: Path) -> str:
+        resolved = Path(model).resolve()
+        try:
+            return resolved.relative_to(self.registry.root.resolve()).as_posix()
+        except ValueError:
+            return resolved.as_posix()
+
+    def _scan(self, model: Path) -> Dict[str, Any]:
+        if self._classifier is None:
+            self._classifier = self.registry.classifier()
+        coverage = {theory_id: self.registry.coverage_ids(theory_id) for theory_id in self.registry.ids}
+        elements: Dict[str, Dict[str, List[str]]] = {}
+        covered: Dict[str, Set[str]] = {}
+        for event in iter_blueprint(model):
+            if event.kind != ELEMENT or not isinstance(event.value, dict):
+                continue
+            elem_id = event.value.get("_id")
+            if not isinstance(elem_id, str):
+                continue
+            for theory_id, ids in coverage.items():
+                if elem_id in ids:
+                    covered.setdefault(theory_id, set()).add(elem_id)
+            found = {k: v for k, v in self._classifier.classify_element(event.value).matches.items() if v}
+            if found:
+                merged = elements.setdefault(elem_id, {})
+                for theory, patterns in found.items():
+                    merged[theory] = sorted(set(merged.get(theory, [])) | set(patterns))
+        return {"elements": elements, "coverage": {t: sorted(ids) for t, ids in covered.items()}}
+
+    def refresh(self, models: Iterable[Path]) -> int:
+        """Re-index the given models whose content changed; return how many were scanned.
+
+        Entries of models that no longer exist are dropped. Unreadable or
+        malformed models are indexed as empty with an ``error``.
+        """
+        scanned = 0
+        for key in [key for key in self.models if not (self.registry.root / key).exists() and not Path(key).exists()]:
+            del self.models[key]
+            self._dirty = True
+        for model in models:
+            key = self.model_key(model)
+            try:
+                digest = file_digest(Path(model))
+            except OSError as exc:
+                digest, entry = None, {"digest": None, "elements": {}, "coverage": {}, "error": str(exc)}
+            else:
+                cached = self.models.get(key)
+                if cached is not None and cached.get("digest") == digest:
+                    continue
+                try:
+                    entry = {"digest": digest, **self._scan(Path(model))}
+                except (OSError, BlueprintStreamError) as exc:
+                    entry = {"digest": digest, "elements": {}, "coverage": {}, "error": str(exc)}
+            self.models[key] = entry
+            self._dirty = True
+            self._by_element = None
+            scanned += 1
+        if self._classifier is not None:
+            self._classifier.save()
+        return scanned
+
+    def save(self) -> None:
+        if self._dirty:
+            store_json_cache(self.path, {
+                "version": INDEX_VERSION,
+                "registry": self.registry.fingerprint,
+                "models": self.models,
+            })
+            self._dirty = False
+
+    # ------------------------------------------------------------- queries
+    def matches(self, model: Path, elem_id: str) -> Dict[str, List[str]]:
+        """Keyword matches of ``elem_id`` in ``model`` (theories without matches omitted)."""
+        entry = self.models.get(self.model_key(model)) or {}
+        return entry.get("elements", {}).get(elem_id, {})
+
+    def _inverted(self) -> Dict[str, Set[str]]:
+        if self._by_element is None:
+            by_element: Dict[str, Set[str]] = {}
+            for entry in self.models.values():
+                for elem_id, found in entry.get("elements", {}).items():
+                    by_element.setdefault(elem_id, set()).update(found)
+            for theory_id in self.registry.ids:
+                for elem_id in self.registry.coverage_ids(theory_id):
+                    by_element.setdefault(elem_id, set()).add(theory_id)
+            self._by_element = by_element
+        return self._by_element
+
+    def theories_for(self, elem_id: str, model: Optional[Path] = None) -> Set[str]:
+        """Theories of ``elem_id`` by keyword (in ``model`` or any model) or coverage doc."""
+        if model is None:
+            return set(self._inverted().get(elem_id, ()))
+        theories = set(self.matches(model, elem_id))
+        theories.update(t for t in self.registry.ids if elem_id in self.registry.coverage_ids(t))
+        return theories
+
+    def elements_for(self, theory_id: str, model: Optional[Path] = None) -> Set[str]:
+        """Element ids related to ``theory_id``.
+
+        With ``model`` only elements of that model count, and coverage ids
+        count only if the model contains them.
+        """
+        self.registry.get(theory_id)
+        if model is None:
+            return {elem_id for elem_id, theories in self._inverted().items() if theory_id in theories}
+        entry = self.models.get(self.model_key(model)) or {}
+        found = {elem_id for elem_id, matches in entry.get("elements", {}).items() if theory_id in matches}
+        found.update(entry.get("coverage", {}).get(theory_id, ()))
+        return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Query the theory index across the blueprint models.")
+    parser.add_argument("--theory", action="append", help="Theory id (repeatable; default: all)")
+    parser.add_argument("--model", action="append", type=Path, help="Blueprint to report (repeatable; default: all in models/)")
+    parser.add_argument("--elements", action="store_true", help="List the related element ids instead of counts")
+    args = parser.parse_args()
+
+    registry = default_registry()
+    try:
+        theory_ids = [registry.get(t).id for t in args.theory] if args.theory else registry.ids
+    except KeyError as exc:
+        parser.error(str(exc.args[0]))
+    models = args.model or discover_models()
+    index = TheoryIndex.open(registry, models)
+
+    for model in models:
+        key = index.model_key(model)
+        error = (index.models.get(key) or {}).get("error")
+        if error:
+            print(f"{key}: ERROR {error}")
+            continue
+        if args.elements:
+            for theory_id in theory_ids:
+                for elem_id in sorted(index.elements_for(theory_id, model)):
+                    print(f"{key}\t{theory_id}\t{elem_id}")
+        else:
+            counts = ", ".join(f"{t}={len(index.elements_for(t, model))}" for t in theory_ids)
+            print(f"{key}: {counts}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,240 @@
+"""
+Streaming reader for ``.xlsx`` workbooks using only the standard library.
+
+:class:`XlsxReader` opens the workbook zip once and parses the sheet XML with
+``iterparse``. Each ``<row>`` is cleared as soon as it has been converted, so
+memory stays flat however many rows a sheet has. Shared strings are decoded
+lazily: ``sharedStrings.xml`` is only parsed as far as the highest index
+requested so far. Sheets are selected by name (resolved through
+``workbook.xml`` and its relationships) or by position.
+
+Rows are yielded as lists of typed values from column A up to the last cell
+present in that row; missing cells are ``None``. Numbers become ``int`` when
+written as integers, else ``float``; booleans are ``bool``; strings (shared,
+inline and formula results) are ``str``; error cells keep their code
+(``"#N/A"``).
+Date-formatted numbers are returned as serial numbers because number formats
+are not evaluated.
+
+Example::
+
+    with XlsxReader(path) as reader:
+        for row in reader.dict_rows("Einflussfaktoren"):
+            ...
+"""
+from __future__ import annotations
+
+import posixpath
+import re
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+from xml.etree.ElementTree import iterparse
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_ROW = MAIN_NS + "row"
+_CELL = MAIN_NS + "c"
+_VALUE = MAIN_NS + "v"
+_INLINE = MAIN_NS + "is"
+_TEXT = MAIN_NS + "t"
+_RUN = MAIN_NS + "r"
+_SHARED_ITEM = MAIN_NS + "si"
+_SHEET_DATA = MAIN_NS + "sheetData"
+
+_COLUMN_LETTERS = re.compile(r"[A-Za-z]+")
+_column_cache: Dict[str, int] = {}
+
+SheetRef = Union[str, int, None]
+
+
+class XlsxError(ValueError):
+    """The file is not a readable workbook or lacks the requested sheet."""
+
+
+def column_index(ref: str) -> int:
+    """0-based column of a cell reference such as ``"AB12"``."""
+    match = _COLUMN_LETTERS.match(ref)
+    if match is None:
+        raise XlsxError(f"Invalid cell reference {ref!r}")
+    letters = match.group()
+    index = _column_cache.get(letters)
+    if index is None:
+        index = 0
+        for char in letters.upper():
+            index = index * 26 + ord(char) - 64
+        index -= 1
+        _column_cache[letters] = index
+    return index
+
+
+def _item_text(item: Any) -> str:
+    """Text of an ``<si>``/``<is>`` item: plain ``<t>`` or rich-text runs (phonetic runs skipped)."""
+    text = item.find(_TEXT)
+    if text is not None:
+        return text.text or ""
+    return "".join(run.findtext(_TEXT) or "" for run in item.iter(_RUN))
+
+
+def _number(text: str) -> Union[int, float]:
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class _SharedStrings:
+    def __init__(self, archive: zipfile.ZipFile, name: Optional[str]) -> None:
+        self._strings: List[str] = []
+        self._handle = archive.open(name) if name else None
+        self._events = iterparse(self._handle, events=("end",)) if self._handle else None
+
+    def __getitem__(self, index: int) -> str:
+        while index >= len(self._strings) and self._events is not None:
+            try:
+                _event, elem = next(self._events)
+            except StopIteration:
+                self.close()
+                break
+            if elem.tag == _SHARED_ITEM:
+                self._strings.append(_item_text(elem))
+                elem.clear()
+        return self._strings[index] if 0 <= index < len(self._strings) else ""
+
+    def close(self) -> None:
+        self._events = None
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+class XlsxReader:
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        try:
+            self._archive = zipfile.ZipFile(self.path)
+        except (OSError, zipfile.BadZipFile) as exc:
+            raise XlsxError(f"Cannot open workbook {self.path}: {exc}") from None
+        names = set(self._archive.namelist())
+        self._sheets = self._read_sheet_index(names)
+        self._shared = _SharedStrings(self._archive, "xl/sharedStrings.xml" if "xl/sharedStrings.xml" in names else None)
+
+    def __enter__(self) -> "XlsxReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._shared.close()
+        self._archive.close()
+
+    def _read_sheet_index(self, names: set) -> List[tuple]:
+        """(name, part) of every worksheet in workbook order."""
+        targets: Dict[str, str] = {}
+        if "xl/_rels/workbook.xml.rels" in names:
+            with self._archive.open("xl/_rels/workbook.xml.rels") as handle:
+                for _event, elem in iterparse(handle):
+                    if elem.tag == PACKAGE_REL_NS + "Relationship":
+                        target = elem.get("Target") or ""
+                        part = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+                        targets[elem.get("Id") or ""] = part
+        sheets = []
+        if "xl/workbook.xml" in names:
+            with self._archive.open("xl/workbook.xml") as handle:
+                for _event, elem in iterparse(handle):
+                    if elem.tag == MAIN_NS + "sheet":
+                        part = targets.get(elem.get(REL_NS + "id") or "")
+                        if part in names:
+                            sheets.append((elem.get("name") or part, part))
+        if not sheets:
+            parts = sorted(
+                (n for n in names if n.startswith("xl/worksheets/sheet") and n.endswith(".xml")),
+                key=lambda n: (len(n), n),
+            )
+            sheets = [(posixpath.basename(part)[:-4], part) for part in parts]
+        return sheets
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return [name for name, _part in self._sheets]
+
+    def _sheet_part(self, sheet: SheetRef) -> str:
+        if not self._sheets:
+            raise XlsxError(f"No worksheet found in {self.path}")
+        if sheet is None:
+            return self._sheets[0][1]
+        if isinstance(sheet, int):
+            try:
+                return self._sheets[sheet][1]
+            except IndexError:
+                raise XlsxError(f"{self.path} has no sheet #{sheet}") from None
+        for name, part in self._sheets:
+            if name == sheet:
+                return part
+        raise XlsxError(f"{self.path} has no sheet {sheet!r} (sheets: {', '.join(self.sheet_names)})")
+
+    def _cell_value(self, cell: Any) -> Any:
+        cell_type = cell.get("t")
+        if cell_type == "inlineStr":
+            inline = cell.find(_INLINE)
+            return _item_text(inline) if inline is not None else None
+        text = cell.findtext(_VALUE)
+        if text is None:
+            return None
+        if cell_type == "s":
+            try:
+                return self._shared[int(text)]
+            except ValueError:
+                return text
+        if cell_type in ("str", "e", "d"):
+            return text
+        if cell_type == "b":
+            return text.strip() in ("1", "true")
+        try:
+            return _number(text)
+        except ValueError:
+            return text
+
+    def rows(self, sheet: SheetRef = None) -> Iterator[List[Any]]:
+        """Yield the rows present in ``sheet`` (name, 0-based position or first)."""
+        part = self._sheet_part(sheet)
+        with self._archive.open(part) as handle:
+            sheet_data = None
+            for event, elem in iterparse(handle, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == _SHEET_DATA:
+                        sheet_data = elem
+                    continue
+                if elem.tag != _ROW:
+                    continue
+                values: List[Any] = []
+                for cell in elem.iterfind(_CELL):
+                    ref = cell.get("r")
+                    col = column_index(ref) if ref else len(values)
+                    if col >= len(values):
+                        values.extend([None] * (col + 1 - len(values)))
+                    values[col] = self._cell_value(cell)
+                if sheet_data is not None:
+                    sheet_data.clear()
+                else:
+                    elem.clear()
+                yield values
+
+    def dict_rows(self, sheet: SheetRef = None) -> Iterator[Dict[str, Any]]:
+        """Yield rows as dicts keyed by the (stripped) header row; unnamed columns are skipped."""
+        rows = self.rows(sheet)
+        header = next(rows, None)
+        if header is None:
+            return
+        names = [str(h).strip() if h is not None else "" for h in header]
+        for values in rows:
+            yield {name: (values[i] if i < len(values) else None) for i, name in enumerate(names) if name}
+
+
+def read_rows(path: Union[str, Path], sheet: SheetRef = None) -> Iterator[List[Any]]:
+    """Convenience generator over the rows of one sheet; closes the file when exhausted."""
+    with XlsxReader(path) as reader:
+        yield from reader.rows(sheet)
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The scripts import each other as top-level modules.
+SCRIPTS_DIR = Path(__file__).resolve().parents[1] / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
@@ -0,0 +1,55 @@
+import copy
+
+import pytest
+
+from blueprint_merge import merge_blueprints
+
+
+def _element(elem_id, label):
+    return {"_id": elem_id, "attributes": {"label": label}}
+
+
+def _connection(conn_id, source, target):
+    return {"_id": conn_id, "from": source, "to": target, "attributes": {"connection type": "++"}}
+
+
+BASE = {
+    "elements": [_element("elem-a", "A"), _element("elem-b", "B"), _element("elem-c", "C")],
+    "connections": [_connection("conn-ab", "elem-a", "elem-b")],
+}
+
+
+@pytest.mark.parametrize("prefer, expected", [
+    ("ours", ["elem-a", "elem-b", "elem-c"]),
+    ("theirs", ["elem-a", "elem-c"]),
+    ("base", ["elem-a", "elem-b", "elem-c"]),
+])
+def test_delete_modify_follows_prefer(prefer, expected):
+    ours = copy.deepcopy(BASE)
+    ours["elements"][1]["attributes"]["label"] = "B2"
+    theirs = copy.deepcopy(BASE)
+    del theirs["elements"][1]
+    theirs["connections"] = []
+    result = merge_blueprints(BASE, ours, theirs, prefer)
+    assert [elem["_id"] for elem in result.data["elements"]] == expected
+    assert [conflict.resolution for conflict in result.conflicts] == [prefer]
+    if prefer == "base":
+        assert result.data["elements"][1]["attributes"]["label"] == "B"
+
+
+def test_dangling_endpoints_are_reported():
+    ours = copy.deepcopy(BASE)
+    ours["connections"].append(_connection("conn-ac", "elem-a", "elem-c"))
+    theirs = copy.deepcopy(BASE)
+    del theirs["elements"][2]
+    result = merge_blueprints(BASE, ours, theirs)
+    assert [elem["_id"] for elem in result.data["elements"]] == ["elem-a", "elem-b"]
+    assert not result.conflicts
+    assert [(d.id, d.field, d.element) for d in result.dangling] == [("conn-ac", "to", "elem-c")]
+
+
+def test_existing_dangling_endpoints_are_ignored():
+    ours = copy.deepcopy(BASE)
+    ours["connections"].append(_connection("conn-ax", "elem-a", "elem-x"))
+    result = merge_blueprints(BASE, ours, copy.deepcopy(BASE))
+    assert result.dangling == []
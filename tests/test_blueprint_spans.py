@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from blueprint_spans import BlueprintPatch, BlueprintSpanIndex
+
+
+def _blueprint(attributes, indent=2):
+    data = {
+        "elements": [
+            {"_id": "elem-a", "attributes": dict(attributes)},
+            {"_id": "elem-b", "attributes": {"label": "B"}},
+        ],
+        "connections": [],
+    }
+    return json.dumps(data, indent=indent, ensure_ascii=False).encode("utf-8")
+
+
+ATTRIBUTES = {"label": "A", "x": 1, "y": [1, 2], "z": {"k": "v"}, "w": None}
+
+
+@pytest.mark.parametrize("indent", [2, None])
+@pytest.mark.parametrize("names", [
+    ["x"], ["x", "y"], ["x", "y", "z"], ["y", "x"], ["label", "x"],
+    ["z", "w"], ["x", "z"], ["label", "w"], list(ATTRIBUTES),
+])
+def test_remove_attributes(names, indent):
+    patch = BlueprintPatch(BlueprintSpanIndex(_blueprint(ATTRIBUTES, indent)))
+    for name in names:
+        assert patch.remove_attribute("elem-a", name)
+    assert not patch.remove_attribute("elem-a", names[0])
+    result = json.loads(patch.apply())
+    expected = {name: value for name, value in ATTRIBUTES.items() if name not in names}
+    assert result["elements"][0]["attributes"] == expected
+    assert result["elements"][1]["attributes"] == {"label": "B"}
+
+
+@pytest.mark.parametrize("names", [["x", "y"], ["w"], list(ATTRIBUTES)])
+def test_remove_and_add_attributes(names):
+    patch = BlueprintPatch(BlueprintSpanIndex(_blueprint(ATTRIBUTES)))
+    for name in names:
+        patch.remove_attribute("elem-a", name)
+    patch.set_attribute("elem-a", "new", "value")
+    result = json.loads(patch.apply())
+    expected = {name: value for name, value in ATTRIBUTES.items() if name not in names}
+    expected["new"] = "value"
+    assert result["elements"][0]["attributes"] == expected
+
+
+def test_set_after_remove_keeps_member():
+    patch = BlueprintPatch(BlueprintSpanIndex(_blueprint(ATTRIBUTES)))
+    patch.remove_attribute("elem-a", "x")
+    patch.remove_attribute("elem-a", "y")
+    patch.set_attribute("elem-a", "x", 2)
+    result = json.loads(patch.apply())
+    assert result["elements"][0]["attributes"] == {"label": "A", "x": 2, "z": {"k": "v"}, "w": None}
+
+
+def test_removal_keeps_formatting():
+    raw = _blueprint(ATTRIBUTES)
+    patch = BlueprintPatch(BlueprintSpanIndex(raw))
+    patch.remove_attribute("elem-a", "x")
+    patch.remove_attribute("elem-a", "y")
+    expected = _blueprint({name: value for name, value in ATTRIBUTES.items() if name not in ("x", "y")})
+    assert patch.apply() == expected
@@ -0,0 +1,87 @@
+import copy
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from blueprint_writer import BlueprintDocument
+
+MAIN_MODEL = Path(__file__).resolve().parents[1] / "models" / "main_model" / "wirkmechanismen-main-model-blueprint.json"
+VALUES = ["text", "Ümlaut", 0, 1.5, True, None, [1, "a"], {"nested": {"k": 1}}, ""]
+
+
+def _synthetic(rng):
+    elements = [
+        {
+            "_id": f"elem-{i}",
+            "attributes": {f"attr{k}": rng.choice(VALUES) for k in range(rng.randint(0, 6))},
+            **({"extra": i} if i % 3 == 0 else {}),
+        }
+        for i in range(30)
+    ]
+    connections = [
+        {"_id": f"conn-{i}", "from": f"elem-{rng.randrange(30)}", "to": f"elem-{rng.randrange(30)}",
+         "attributes": {"connection type": rng.choice(["++", "+-", None])}}
+        for i in range(40)
+    ]
+    return {"elements": elements, "connections": connections}
+
+
+def _edit_item(rng, item):
+    attrs = item.get("attributes")
+    for _ in range(rng.randint(1, 4)):
+        action = rng.random()
+        if isinstance(attrs, dict) and attrs and action < 0.4:
+            # Often several neighbouring attributes in a row.
+            names = list(attrs)
+            start = rng.randrange(len(names))
+            for name in names[start:start + rng.randint(1, 3)]:
+                del attrs[name]
+        elif isinstance(attrs, dict) and action < 0.7:
+            attrs[rng.choice([*attrs, "new", "other"])] = rng.choice(VALUES)
+        elif item and action < 0.85:
+            names = list(item)
+            start = rng.randrange(len(names))
+            for name in names[start:start + rng.randint(1, 2)]:
+                del item[name]
+            attrs = item.get("attributes")
+        else:
+            item[rng.choice(["extra", "added"])] = rng.choice(VALUES)
+
+
+def _random_edits(rng, data):
+    for kind in ("elements", "connections"):
+        items = data[kind]
+        for item in rng.sample(items, min(len(items), rng.randint(1, 8))):
+            _edit_item(rng, item)
+        if items and rng.random() < 0.3:
+            del items[rng.randrange(len(items))]
+        if rng.random() < 0.3:
+            items.insert(rng.randrange(len(items) + 1), {"_id": f"{kind}-new-{rng.random()}", "attributes": {"label": "N"}})
+
+
+@pytest.mark.parametrize("indent", [2, 4])
+@pytest.mark.parametrize("seed", range(100))
+def test_random_edits_round_trip(seed, indent):
+    rng = random.Random(seed)
+    raw = json.dumps(_synthetic(rng), indent=indent, ensure_ascii=False).encode("utf-8")
+    document = BlueprintDocument(raw)
+    _random_edits(rng, document.data)
+    expected = copy.deepcopy(document.data)
+    assert json.loads(document.render()) == expected
+
+
+@pytest.mark.skipif(not MAIN_MODEL.exists(), reason="main model not available")
+def test_random_edits_round_trip_main_model():
+    raw = MAIN_MODEL.read_bytes()
+    for seed in range(50):
+        rng = random.Random(seed)
+        document = BlueprintDocument(raw)
+        _random_edits(rng, document.data)
+        assert json.loads(document.render().decode("utf-8-sig")) == document.data, seed
+
+
+def test_unchanged_document_renders_original_bytes():
+    raw = json.dumps(_synthetic(random.Random(0)), indent=2).encode("utf-8")
+    assert BlueprintDocument(raw).render() == raw
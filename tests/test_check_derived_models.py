@@ -0,0 +1,47 @@
+import json
+
+from check_derived_models import DRIFT, check_many, main
+
+
+def _element(elem_id, label, element_type):
+    return {"_id": elem_id, "attributes": {"label": label, "element type": element_type}}
+
+
+def _write(path, elements):
+    path.write_text(json.dumps({"elements": elements, "connections": []}, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def _models(tmp_path):
+    main_path = _write(tmp_path / "main.json", [_element("a", "A", "Einflussfaktoren"), _element("b", "B", "Problem")])
+    derived = _write(tmp_path / "derived.json", [_element("a", "A old", "Einflussfaktoren"),
+                                                 _element("b", "B", "Schlüsselfaktor")])
+    return main_path, derived
+
+
+def test_element_type_is_not_compared_by_default(tmp_path):
+    main_path, derived = _models(tmp_path)
+    [report] = check_many([derived], main_path)
+    assert [(f.id, f.field) for f in report.findings] == [("a", "label")]
+
+
+def test_requested_element_type_is_reported_but_not_refreshed(tmp_path):
+    main_path, derived = _models(tmp_path)
+    [report] = check_many([derived], main_path, element_fields=("label", "element type"))
+    by_field = {finding.field: finding for finding in report.findings}
+    assert by_field["element type"].kind == DRIFT
+    assert not by_field["element type"].refreshable
+    assert by_field["label"].refreshable
+
+
+def test_json_is_printed_after_refresh(tmp_path, capsys):
+    main_path, derived = _models(tmp_path)
+    code = main([str(derived), "--main", str(main_path), "--refresh", "--json", "--no-cache", "-j", "1",
+                 "--element-fields", "label,element type"])
+    [report] = json.loads(capsys.readouterr().out)
+    refreshed = {finding["field"]: finding["refreshed"] for finding in report["findings"]}
+    assert refreshed == {"label": True, "element type": False}
+    assert code == 1  # the element type drift remains
+
+    labels = [elem["attributes"]["label"] for elem in json.loads(derived.read_text(encoding="utf-8"))["elements"]]
+    assert labels == ["A", "B"]
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+import graph_metrics
+from blueprint_graph import BlueprintGraph
+from graph_metrics import CENTRALITY_METRICS, compute_centrality
+
+
+def _graph(ids, edges):
+    return BlueprintGraph({
+        "elements": [{"_id": elem_id} for elem_id in ids],
+        "connections": [{"_id": f"c{i}", "from": source, "to": target} for i, (source, target) in enumerate(edges)],
+    })
+
+
+def _by_id(graph, values):
+    return dict(zip(graph.element_ids, values))
+
+
+# a => b (twice), a -> c, b -> d, c -> d, d -> e, e -> e
+DAG = _graph("abcde", [("a", "b"), ("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"), ("d", "e"), ("e", "e")])
+
+
+def test_closeness_is_harmonic_and_ignores_parallel_edges_and_self_loops():
+    values = _by_id(DAG, compute_centrality(DAG)["closeness"])
+    # a reaches b, c at 1, d at 2, e at 3; divided by n - 1 = 4.
+    assert values == pytest.approx({"a": (1 + 1 + 1 / 2 + 1 / 3) / 4, "b": 1.5 / 4, "c": 1.5 / 4,
+                                    "d": 1 / 4, "e": 0.0})
+
+
+def test_betweenness_splits_over_equal_shortest_paths():
+    values = _by_id(DAG, compute_centrality(DAG)["betweenness"])
+    # a -> d and a -> e each have two shortest paths, via b and via c;
+    # d lies on a -> e, b -> e and c -> e. Normalized by (n - 1)(n - 2) = 12.
+    assert values == pytest.approx({"a": 0.0, "b": 1 / 12, "c": 1 / 12, "d": 3 / 12, "e": 0.0})
+
+
+def test_reach_and_reach_efficiency():
+    metrics = compute_centrality(DAG)
+    reach = _by_id(DAG, metrics["reach"])
+    assert reach == pytest.approx({"a": 4 / 5, "b": 3 / 5, "c": 3 / 5, "d": 2 / 5, "e": 1 / 5})
+    # Degrees count every connection, the parallel one and the self-loop included.
+    efficiency = _by_id(DAG, metrics["reach-efficiency"])
+    assert efficiency == pytest.approx({"a": 0.8 / 3, "b": 0.6 / 3, "c": 0.6 / 2, "d": 0.4 / 3, "e": 0.2 / 3})
+
+
+def test_eigenvector_on_undirected_path():
+    # a <-> b <-> c: (A^T + I) has the dominant eigenvector (1, sqrt 2, 1).
+    # The parallel b -> c and the self-loop on a must not change it.
+    graph = _graph("abc", [("a", "b"), ("b", "a"), ("b", "c"), ("b", "c"), ("c", "b"), ("a", "a")])
+    values = _by_id(graph, compute_centrality(graph)["eigenvector"])
+    total = 2 + 2 ** 0.5
+    assert values == pytest.approx({"a": 1 / total, "b": 2 ** 0.5 / total, "c": 1 / total})
+
+
+def test_parallel_betweenness_matches_serial(monkeypatch):
+    rng = random.Random(7)
+    ids = [f"e{i}" for i in range(60)]
+    graph = _graph(ids, [(rng.choice(ids), rng.choice(ids)) for _ in range(180)])
+    serial = compute_centrality(graph, jobs=1)
+    monkeypatch.setattr(graph_metrics, "PARALLEL_MIN_ELEMENTS", 0)
+    parallel = compute_centrality(graph, jobs=3)
+    for name in CENTRALITY_METRICS:
+        assert list(parallel[name]) == pytest.approx(list(serial[name]), abs=1e-12)
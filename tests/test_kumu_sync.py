@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from kumu_standin import Faults, start_server
+from kumu_upload import blueprint_body, make_session, post_with_retry
+
+
+@pytest.fixture
+def server():
+    server = start_server(faults=Faults(error_rate=0.5, seed=1))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _upload(server, body, retries=20):
+    waits = []
+    with make_session("test") as session:
+        response = post_with_retry(session, f"{server.url}/projects/a/b/elements", body, retries=retries,
+                                   backoff=0.0, on_retry=lambda attempt, reason, wait: waits.append(reason))
+    return response, waits
+
+
+def test_streamed_upload_is_rebuilt_on_retry(server, tmp_path):
+    path = tmp_path / "blueprint.json"
+    blueprint = {"elements": [{"_id": f"elem-{i}"} for i in range(50)], "connections": []}
+    path.write_text(json.dumps(blueprint), encoding="utf-8")
+    response, waits = _upload(server, lambda: blueprint_body(path, gzip=True))
+    assert response.status_code == 200
+    assert waits and set(waits) == {"HTTP 503"}
+    assert server.blueprint("a", "b") == blueprint
+
+
+def test_full_upload_replaces_the_project(server):
+    first = {"elements": [{"_id": "elem-a"}, {"_id": "elem-b"}], "connections": []}
+    second = {"elements": [{"_id": "elem-c"}], "connections": []}
+    for blueprint in (first, second):
+        payload = json.dumps(blueprint).encode("utf-8")
+        response, _waits = _upload(server, lambda: (payload, {}))
+        assert response.status_code == 200
+    assert server.blueprint("a", "b") == second
+
+
+def test_last_response_is_returned_when_retries_run_out():
+    server = start_server(faults=Faults(error_rate=1.0))
+    try:
+        response, waits = _upload(server, lambda: (b"{}", {}), retries=2)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert response.status_code == 503
+    assert len(waits) == 2
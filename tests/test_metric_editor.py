@@ -0,0 +1,130 @@
+import copy
+import json
+import random
+
+import pytest
+
+from blueprint_stream import UTF8_BOM
+from blueprint_writer import BlueprintDocument
+from metric_editor import MetricEditor
+from micmac import EXPOSURE, INFLUENCE
+from recompute_metrics import recompute_metrics, refresh_metrics
+
+METRICS = ("indegree", "outdegree", "degree", "size", "closeness", "betweenness", "eigenvector", "reach",
+           "reach-efficiency", INFLUENCE, EXPOSURE)
+
+
+def _write_base(path, rng):
+    elements = [{"_id": f"elem-{i}", "attributes": {"label": f"Element {i}"}} for i in range(25)]
+    connections = [
+        {"_id": f"conn-{i}", "from": f"elem-{rng.randrange(25)}", "to": f"elem-{rng.randrange(25)}",
+         "attributes": {"connection type": rng.choice(["++", "+-"])}}
+        for i in range(60)
+    ]
+    # Four-space indent and a BOM, which a plain json.dump would not keep.
+    text = json.dumps({"elements": elements, "connections": connections}, indent=4, ensure_ascii=False)
+    path.write_bytes(UTF8_BOM + text.encode("utf-8") + b"\n")
+    recompute_metrics(path)
+
+
+def _random_edits(rng, elements, count, tag):
+    """Edits as ``(method, argument)``; ``elements`` lists the live element ids."""
+    edits = []
+    for step in (f"{tag}-{i}" for i in range(count)):
+        action = rng.random()
+        if action < 0.15:
+            elem_id = f"new-{step}"
+            elements.append(elem_id)
+            edits.append(("add_element", {"_id": elem_id, "attributes": {"label": elem_id}}))
+        elif action < 0.25 and len(elements) > 5:
+            edits.append(("remove_element", elements.pop(rng.randrange(len(elements)))))
+        elif action < 0.7:
+            edits.append(("add_connection", {"_id": f"added-{step}", "from": rng.choice(elements),
+                                             "to": rng.choice(elements), "attributes": {}}))
+        else:
+            edits.append(("remove_connection", None))
+    return edits
+
+
+def _apply_to_editor(editor, edits, rng):
+    for method, argument in edits:
+        if method == "remove_connection":
+            connections = editor.data["connections"]
+            alive = [conn["_id"] for conn in connections if id(conn) not in editor._removed]
+            if not alive:
+                continue
+            argument = rng.choice(alive)
+        getattr(editor, method)(copy.deepcopy(argument))
+        yield method, argument
+
+
+def _apply_to_data(data, applied):
+    for method, argument in applied:
+        if method == "add_element":
+            data["elements"].append(copy.deepcopy(argument))
+        elif method == "add_connection":
+            data["connections"].append(copy.deepcopy(argument))
+        elif method == "remove_connection":
+            position = next(i for i, conn in enumerate(data["connections"]) if conn["_id"] == argument)
+            del data["connections"][position]
+        else:
+            data["elements"] = [elem for elem in data["elements"] if elem["_id"] != argument]
+            data["connections"] = [conn for conn in data["connections"]
+                                   if argument not in (conn.get("from"), conn.get("to"))]
+
+
+# refresh_metrics leaves the degree attributes of an isolated new element
+# unset (they default to 0 there); the editor writes them out.
+DEFAULTS = {"indegree": 0, "outdegree": 0, "degree": 0, "size": 1}
+
+
+def _metrics(path):
+    data = json.loads(path.read_bytes().decode("utf-8-sig"))
+    return {elem["_id"]: {name: elem["attributes"].get(name, DEFAULTS.get(name)) for name in METRICS}
+            for elem in data["elements"]}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_save_matches_full_refresh(tmp_path, seed):
+    rng = random.Random(seed)
+    base = tmp_path / "base.json"
+    _write_base(base, rng)
+    edited, full = tmp_path / "edited.json", tmp_path / "full.json"
+    edited.write_bytes(base.read_bytes())
+    full.write_bytes(base.read_bytes())
+
+    editor = MetricEditor.open(edited)
+    applied = []
+    elements = [f"elem-{i}" for i in range(25)]
+    for batch in range(3):
+        applied.extend(_apply_to_editor(editor, _random_edits(rng, elements, 8, batch), rng))
+        editor.flush()
+    assert editor.save()
+    assert not editor.save()  # nothing left to write
+
+    document = BlueprintDocument.open(full)
+    _apply_to_data(document.data, applied)
+    document.invalidate_graph()
+    refresh_metrics(document.graph)
+    document.save()
+
+    expected = _metrics(full)
+    actual = _metrics(edited)
+    assert list(actual) == list(expected)
+    for elem_id, values in expected.items():
+        assert actual[elem_id] == pytest.approx(values, abs=1e-9), elem_id
+
+    raw = edited.read_bytes()
+    assert raw.startswith(UTF8_BOM)
+    assert b'\n    "elements": [' in raw
+
+
+def test_save_without_document_uses_existing_file_as_baseline(tmp_path):
+    path = tmp_path / "model.json"
+    _write_base(path, random.Random(1))
+    before = path.read_bytes()
+    data = json.loads(before.decode("utf-8-sig"))
+    editor = MetricEditor(data)
+    # Metrics are already current: nothing changes, so nothing is written.
+    assert not editor.save(path)
+    assert path.read_bytes() == before
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import pytest
+
+from blueprint_graph import load_blueprint
+from micmac import EXPOSURE, INFLUENCE, KUMU_ATTRIBUTES, apply_micmac, compute_micmac, describe, matrix_from_edges, run_micmac
+
+MAIN_MODEL = Path(__file__).resolve().parents[1] / "models" / "main_model" / "wirkmechanismen-main-model-blueprint.json"
+
+
+def test_chain_keeps_last_nonzero_power():
+    # a -> b -> c: M^2 has the single entry a -> c, M^3 is zero.
+    result = run_micmac(matrix_from_edges(3, [(0, 1, None), (1, 2, None)]))
+    assert list(result.influence) == [1.0, 0.0, 0.0]
+    assert list(result.exposure) == [0.0, 0.0, 1.0]
+    assert list(result.direct_influence) == [1.0, 1.0, 0.0]
+    assert list(result.direct_exposure) == [0.0, 1.0, 1.0]
+    assert result.iterations == 2
+    assert result.zero_power == 3
+    assert not result.converged
+    assert result.complete
+    assert "M^3 is zero" in describe(result)
+
+
+def test_graph_without_connections_is_not_complete():
+    result = run_micmac(matrix_from_edges(2, []))
+    assert list(result.influence) == [0.0, 0.0]
+    assert list(result.direct_exposure) == [0.0, 0.0]
+    assert result.zero_power == 1
+    assert not result.converged
+    assert not result.complete
+
+
+def test_signed_cancellation_counts_as_zero_power():
+    # a -+ b, a ++ b collapse into a zero weight; only b -> c remains.
+    edges = [(0, 1, "+-"), (0, 1, "++"), (1, 2, "++")]
+    result = run_micmac(matrix_from_edges(3, edges, signed=True), signed=True)
+    assert list(result.influence) == [0.0, 1.0, 0.0]
+    assert result.zero_power == 2
+
+
+def test_cycle_converges():
+    # Cycles of length 2 and 3 make the graph aperiodic, so the ranking settles.
+    edges = [(0, 1, None), (1, 0, None), (1, 2, None), (2, 0, None), (2, 3, None)]
+    result = run_micmac(matrix_from_edges(4, edges))
+    assert result.converged
+    assert result.zero_power is None
+    assert result.complete
+    assert max(result.influence) == 1.0
+
+
+def test_apply_writes_local_attributes_only():
+    graph = load_blueprint(MAIN_MODEL)
+    stored = [{name: elem["attributes"].get(name) for name in KUMU_ATTRIBUTES} for elem in graph.elements]
+    apply_micmac(graph, compute_micmac(graph))
+    assert [{name: elem["attributes"].get(name) for name in KUMU_ATTRIBUTES} for elem in graph.elements] == stored
+    assert all(INFLUENCE in elem["attributes"] and EXPOSURE in elem["attributes"] for elem in graph.elements)
+
+
+@pytest.mark.xfail(strict=True, reason="local MICMAC does not reproduce Kumu's stored values yet; once it does, "
+                                       "write Kumu's attributes instead of the local ones")
+def test_matches_values_stored_by_kumu():
+    graph = load_blueprint(MAIN_MODEL)
+    result = compute_micmac(graph)
+    # Elements Kumu ranks highest (influence 1.0) and a few from the middle.
+    for elem_id in ("elem-ivDOaa1S", "elem-1L5rJCH1", "elem-0er3OquT", "elem-1oLVNA94"):
+        index = graph.index_of(elem_id)
+        attrs = graph.elements[index]["attributes"]
+        assert result.influence[index] == pytest.approx(attrs["micmac influence"], abs=0.05), elem_id
+        assert result.exposure[index] == pytest.approx(attrs["micmac exposure"], abs=0.05), elem_id
@@ -1,8 +1,13 @@
-import json
+import sys
+from pathlib import Path
 
-# Load blueprint
-with open("models/main_model/wirkmechanismen-main-model-blueprint.json", encoding="utf-8") as f:
-    data = json.load(f)
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from blueprint_graph import read_blueprint_data
+from blueprint_validation import validate_blueprint_data
+
+# Load blueprint and run all checks in a single pass
+data = read_blueprint_data(Path("models/main_model/wirkmechanismen-main-model-blueprint.json"))
+result = validate_blueprint_data(data)
 
 elements = data.get("elements", [])
 connections = data.get("connections", [])
@@ -12,46 +17,34 @@ print("JSON BLUEPRINT VALIDIERUNG")
 print("=" * 60)
 
 # Check for duplicate element IDs
-element_ids = [e["_id"] for e in elements]
-duplicates = [id for id in element_ids if element_ids.count(id) > 1]
+duplicates = result.duplicate_element_ids
 if duplicates:
     print("\n❌ DUPLIKAT ELEMENT IDs gefunden:")
-    for dup in set(duplicates):
-        print(f"  - {dup}: {element_ids.count(dup)}x")
+    for dup, count in duplicates.items():
+        print(f"  - {dup}: {count}x")
 else:
     print("\n✓ Keine duplizierten Element-IDs")
 
 # Check for invalid connections
-valid_ids = set(element_ids)
-invalid_connections = []
-for conn in connections:
-    if conn.get("from") not in valid_ids or conn.get("to") not in valid_ids:
-        invalid_connections.append({
-            "_id": conn.get("_id"),
-            "from": conn.get("from"),
-            "to": conn.get("to"),
-            "valid_from": conn.get("from") in valid_ids,
-            "valid_to": conn.get("to") in valid_ids
-        })
+invalid_connections = result.reference_issues
 
 if invalid_connections:
     print(f"\n❌ Ungültige Verbindungen gefunden: {len(invalid_connections)}")
     for conn in invalid_connections[:20]:  # Show first 20
-        from_status = "✓" if conn['valid_from'] else "✗"
-        to_status = "✓" if conn['valid_to'] else "✗"
-        print(f"  - {conn['_id']}")
-        print(f"    from: {conn['from']} [{from_status}]")
-        print(f"    to:   {conn['to']} [{to_status}]")
+        from_status = "✓" if conn.from_ok else "✗"
+        to_status = "✓" if conn.to_ok else "✗"
+        print(f"  - {conn.connection_id}")
+        print(f"    from: {conn.from_id} [{from_status}]")
+        print(f"    to:   {conn.to_id} [{to_status}]")
 else:
     print("\n✓ Alle Verbindungen sind gültig")
 
 # Check for duplicate connection IDs
-connection_ids = [c["_id"] for c in connections]
-dup_connections = [id for id in connection_ids if connection_ids.count(id) > 1]
+dup_connections = result.duplicate_connection_ids
 if dup_connections:
-    print(f"\n❌ Duplikat Verbindungs-IDs gefunden: {len(set(dup_connections))}")
-    for dup in set(dup_connections):
-        print(f"  - {dup}: {connection_ids.count(dup)}x")
+    print(f"\n❌ Duplikat Verbindungs-IDs gefunden: {len(dup_connections)}")
+    for dup, count in dup_connections.items():
+        print(f"  - {dup}: {count}x")
 else:
     print("\n✓ Keine duplizierten Verbindungs-IDs")
 
@@ -60,21 +53,12 @@ print("\n" + "=" * 60)
 print("STRUKTURELLE PRÜFUNG (Pro Element)")
 print("=" * 60)
 
-required_attrs = ["label", "element type"]
-missing_attrs = []
-for elem in elements:
-    for attr in required_attrs:
-        if attr not in elem.get("attributes", {}):
-            missing_attrs.append({
-                "element": elem["_id"],
-                "label": elem.get("attributes", {}).get("label", "N/A"),
-                "missing_attr": attr
-            })
+missing_attrs = result.missing_attributes
 
 if missing_attrs:
     print(f"\n⚠️  {len(missing_attrs)} Elemente mit fehlenden Attributen:")
     for item in missing_attrs[:10]:
-        print(f"  - {item['element']} ({item['label']}): fehlt '{item['missing_attr']}'")
+        print(f"  - {item.element_id} ({item.label}): fehlt '{item.attribute}'")
 else:
     print("\n✓ Alle Elemente haben erforderliche Attribute")
 
@@ -83,5 +67,5 @@ print("ZUSAMMENFASSUNG")
 print("=" * 60)
 print(f"Elemente: {len(elements)}")
 print(f"Verbindungen: {len(connections)}")
-print(f"Fehler gefunden: {len(duplicates) + len(invalid_connections) + len(dup_connections)}")
+print(f"Fehler gefunden: {sum(duplicates.values()) + len(invalid_connections) + sum(dup_connections.values())}")
 print("=" * 60)